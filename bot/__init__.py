@@ -27,5 +27,7 @@ class CMD(object):
     BAN = ["ban", f"ban@{bot}"]
     AUTH = ["auth", f"auth@{bot}"]
     LOG = ["log", f"log@{bot}"]
+    CACHE = ["cache", f"cache@{bot}"]
+    BATCH = ["batch", f"batch@{bot}"]
 
 cmd = CMD()
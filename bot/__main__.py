@@ -40,7 +40,14 @@ if __name__ == "__main__":
             LOGGER.info(f"Set execute permissions on: {downloader_path}")
         except Exception as e:
             LOGGER.error(f"Failed to set permissions: {str(e)}")
-    
+
+        # Warm the downloader binary cache so the first job does not pay for the build
+        try:
+            subprocess.run([downloader_path, "--build-only"], check=True)
+            LOGGER.info("Apple Music downloader binary is up to date")
+        except Exception as e:
+            LOGGER.error(f"Downloader pre-build failed: {str(e)}")
+
     # Start the bot
     LOGGER.info("Starting Apple Music Downloader Bot...")
     aio.run()
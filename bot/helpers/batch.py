@@ -0,0 +1,188 @@
+import re
+import time
+import asyncio
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import List, Optional, Tuple
+
+from config import Config
+from bot.logger import LOGGER
+from .download_cache import request_identity
+from .message import send_message, edit_message
+
+
+LINK_RE = re.compile(r'https?://[^\s<>"\']+', re.IGNORECASE)
+CONTENT_RE = re.compile(r'/(album|song|playlist|music-video)/(?:[^/]+/)?(\d+|pl\.[\w-]+)')
+PERCENT_RE = re.compile(r'(\d{1,3})%')
+# Query parameters that change what a link points at; everything else is tracking noise
+KEEP_QUERY = ('i',)
+
+
+def extract_links(text: str) -> List[str]:
+    """Every http(s) link in a message or text file, in order."""
+    return [m.group(0).rstrip('.,;:!?)]}') for m in LINK_RE.finditer(text or '')]
+
+
+def normalize_link(url: str) -> Optional[str]:
+    """
+    Canonical form of an Apple Music link, or None if it is not one.
+
+    Lower-cases the host (geo.music.apple.com becomes music.apple.com),
+    drops fragments, trailing slashes and tracking parameters, keeping only
+    the ?i= track selector.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    host = parts.netloc.lower()
+    if host in ('geo.music.apple.com', 'www.music.apple.com'):
+        host = 'music.apple.com'
+    if host != 'music.apple.com':
+        return None
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k in KEEP_QUERY])
+    return urlunsplit(('https', host, parts.path.rstrip('/'), query, ''))
+
+
+def content_key(url: str) -> str:
+    """Dedup key of a normalized link: the catalog item it downloads."""
+    match = CONTENT_RE.search(url)
+    identity = request_identity(url, match.group(2)) if match else None
+    return identity[0] if identity else url
+
+
+def plan_batch(links: List[str]) -> Tuple[List[str], int, List[str]]:
+    """
+    (unique links, duplicates dropped, unsupported links).
+
+    Links are normalized and deduplicated by content, first occurrence
+    wins so the user's order is kept.
+    """
+    unique, seen, unsupported = [], set(), []
+    duplicates = 0
+    for raw in links:
+        url = normalize_link(raw)
+        if not url:
+            unsupported.append(raw)
+            continue
+        key = content_key(url)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        unique.append(url)
+    return unique, duplicates, unsupported
+
+
+def batch_concurrency() -> int:
+    """Links downloaded at once: BATCH_CONCURRENCY, else the downloader pool size."""
+    return max(1, Config.BATCH_CONCURRENCY or Config.DOWNLOADER_WORKERS or Config.QUEUE_WORKERS)
+
+
+class BatchItem:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, index: int, link: str):
+        self.index = index
+        self.link = link
+        self.state = self.PENDING
+        self.stage = ''
+        self.percent: Optional[int] = None
+        self.error: Optional[str] = None
+        self.task_id: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        match = CONTENT_RE.search(self.link)
+        return f"{match.group(1)} {match.group(2)}" if match else self.link
+
+
+class BatchStatusMessage:
+    """
+    Stand-in for a task's bot_msg inside a batch.
+
+    Progress reporters and the provider edit their status message; here
+    those edits only update the item's line in the shared batch view.
+    Posts that carry links or buttons (rclone/index results) are the
+    deliverable itself, so they are sent to the chat instead.
+    """
+
+    def __init__(self, batch: "BatchProgress", item: BatchItem):
+        self.batch = batch
+        self.item = item
+        self.id = None
+
+    async def edit_text(self, text: str = '', reply_markup=None, **kwargs):
+        text = text or ''
+        first = text.strip().split('\n', 1)[0]
+        if reply_markup is not None or ('http' in text and not first.startswith(('❌', '⏹'))):
+            return await send_message(self.batch.user, text, markup=reply_markup)
+        self.item.stage = first.rsplit('•', 1)[-1].strip() if '•' in first else first.strip()
+        percent = PERCENT_RE.findall(text)
+        self.item.percent = int(percent[-1]) if percent else None
+        if first.startswith('❌'):
+            self.item.error = first.lstrip('❌ ').strip()
+        await self.batch.refresh()
+        return None
+
+
+class BatchProgress:
+    """One aggregated, rate-limited status message for a whole batch."""
+
+    def __init__(self, user: dict, msg, items: List[BatchItem], batch_id: str, min_interval_seconds: float = 5.0):
+        self.user = user
+        self.msg = msg
+        self.items = items
+        self.batch_id = batch_id
+        self.started = time.monotonic()
+        self._min_interval = min_interval_seconds
+        self._last_update = 0.0
+        self._lock = asyncio.Lock()
+
+    def count(self, state: str) -> int:
+        return sum(1 for item in self.items if item.state == state)
+
+    def render(self, final: bool = False) -> str:
+        total = len(self.items)
+        done, failed = self.count(BatchItem.DONE), self.count(BatchItem.FAILED)
+        cancelled, running = self.count(BatchItem.CANCELLED), self.count(BatchItem.RUNNING)
+        elapsed = int(time.monotonic() - self.started)
+        header = "✅ Batch finished" if final else "📦 Batch download"
+        lines = [
+            f"{header} • {done + failed + cancelled}/{total}",
+            f"✔️ {done} done • ⬇️ {running} running • ⏳ {self.count(BatchItem.PENDING)} queued • ❌ {failed} failed"
+            + (f" • ⏹️ {cancelled} cancelled" if cancelled else ""),
+            f"⏱️ {elapsed // 60}m {elapsed % 60}s",
+        ]
+        if not final:
+            lines.append(f"Use /cancel <code>{self.batch_id}</code> to stop the batch.")
+        active = [item for item in self.items if item.state == BatchItem.RUNNING]
+        if active:
+            lines.append("")
+            for item in active:
+                percent = f" {item.percent}%" if item.percent is not None else ""
+                lines.append(f"⬇️ {item.index}. {item.name} • {item.stage or 'Starting'}{percent}")
+        failures = [item for item in self.items if item.state == BatchItem.FAILED]
+        if failures:
+            lines.append("")
+            # Keep the message well under Telegram's 4096 character limit
+            for item in failures[-10:]:
+                reason = f" • {item.error[:80]}" if item.error else ""
+                lines.append(f"❌ {item.index}. {item.link}{reason}")
+            if len(failures) > 10:
+                lines.append(f"… and {len(failures) - 10} more")
+        return "\n".join(lines)
+
+    async def refresh(self, force: bool = False, final: bool = False):
+        async with self._lock:
+            now = time.monotonic()
+            if not force and (now - self._last_update) < self._min_interval:
+                return
+            self._last_update = now
+            try:
+                await edit_message(self.msg, self.render(final))
+            except Exception as e:
+                LOGGER.debug(f"Batch status update skipped: {e}")
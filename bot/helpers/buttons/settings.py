@@ -159,6 +159,16 @@ def core_buttons():
                 callback_data='albArt'
             )
         ],
+        [
+            InlineKeyboardButton(
+                text=f"Zip Compression: {bot_set.zip_compression.capitalize()}",
+                callback_data='zipCompression'
+            ),
+            InlineKeyboardButton(
+                text=f"Deflate Level: {bot_set.zip_level}",
+                callback_data='zipLevel'
+            )
+        ],
         [
             InlineKeyboardButton(
                 text=f"Video Upload: {'Document' if bot_set.video_as_document else 'Media'}",
@@ -170,6 +180,12 @@ def core_buttons():
                 text=f"Extract Embedded Cover: {'True' if bot_set.extract_embedded_cover else 'False'}",
                 callback_data='toggleExtractCover'
             )
+        ],
+        [
+            InlineKeyboardButton(
+                text=f"Pipelined Upload: {'True' if bot_set.pipeline_upload else 'False'}",
+                callback_data='togglePipelineUpload'
+            )
         ]
     ]
     inline_keyboard += main_button + close_button
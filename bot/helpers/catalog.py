@@ -0,0 +1,343 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import ClientTimeout
+
+from config import Config
+from bot.logger import LOGGER
+from .utils import upload_limit
+from .output_watcher import find_watcher, scan_files
+from .zip_plan import plan_zip_parts
+from .zip_stream import MEMBER_OVERHEAD, ARCHIVE_OVERHEAD, stream_enabled
+
+
+AMP_API = "https://amp-api.music.apple.com"
+WEB_PLAYER = "https://music.apple.com"
+URL_RE = re.compile(r'music\.apple\.com/(\w{2})/(album|song|playlist|music-video)/(?:[^/?]+/)?(\d+|pl\.[\w-]+)')
+TOKEN_RE = re.compile(r'eyJh[\w-]+\.[\w-]+\.[\w-]+')
+# Developer tokens scraped from the web player are valid for months; refresh twice a day
+TOKEN_TTL = 12 * 3600
+
+# Estimated stream sizes in bytes per second
+AAC_RATE = 256000 / 8
+ATMOS_RATE = 768000 / 8
+# Typical ALAC size relative to raw PCM
+ALAC_RATIO = 0.6
+# Music video bitrates by mv-max (video + audio), bits per second
+MV_RATES = ((2160, 20000000), (1440, 12000000), (1080, 8000000), (720, 4000000), (0, 2000000))
+# Cover art, lyrics and container overhead per item
+ITEM_OVERHEAD = 512 * 1024
+# Highest ALAC sample rate Apple Music serves
+HI_RES_MAX_RATE = 192000
+
+_token: Optional[str] = None
+_token_time = 0.0
+
+
+def _yaml_value(key: str) -> Optional[str]:
+    """Scalar value of a top-level key in the downloader's config.yaml."""
+    try:
+        with open(Config.APPLE_CONFIG_YAML_PATH, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if line.split(':', 1)[0].strip() == key and ':' in line:
+                    return line.split(':', 1)[1].split('#', 1)[0].strip().strip('"\'') or None
+    except Exception:
+        pass
+    return None
+
+
+def _int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class CatalogTrack:
+    """One catalog item of a request, with its estimated download size."""
+
+    def __init__(self, number: int, title: str, kind: str, duration: float, traits: list, size: int,
+                 artist: str = '', album: str = '', track_number: int = 0):
+        self.number = number
+        self.title = title
+        self.kind = kind
+        self.duration = duration
+        self.traits = traits
+        self.size = size
+        self.artist = artist
+        self.album = album
+        self.track_number = track_number or number
+
+
+class CatalogPlan:
+    """
+    What a link resolves to before anything is downloaded.
+
+    Sizes are estimates for the requested format and quality; they drive
+    admission control, disk reservation, the ETA and the zip split plan.
+    """
+
+    def __init__(self, kind: str, content_id: str, title: str, artist: str, tracks: List[CatalogTrack]):
+        self.kind = kind
+        self.content_id = content_id
+        self.title = title
+        self.artist = artist
+        self.tracks = tracks
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(t.size for t in self.tracks)
+
+    @property
+    def duration(self) -> float:
+        return sum(t.duration for t in self.tracks)
+
+    def zip_parts(self, limit: Optional[float] = None) -> List[List[int]]:
+        """Track numbers per zip part, planned the way split_zip_folder plans the files (one folder per album)."""
+        names = {f"{track.album or self.title}/{track.number}": track.number for track in self.tracks}
+        entries = [(f"{track.album or self.title}/{track.number}", track.size) for track in self.tracks]
+        plan = plan_zip_parts(entries, '', limit or upload_limit(), MEMBER_OVERHEAD, ARCHIVE_OVERHEAD)
+        return [[names[path] for path, _ in part] for part in plan.parts]
+
+    def reserve_bytes(self, zipping: bool) -> int:
+        """Disk needed while the task runs; a zip written to disk holds a second copy of the files."""
+        return self.total_bytes * (2 if zipping and not stream_enabled() else 1)
+
+    def eta(self) -> Optional[float]:
+        rate = throughput.rate
+        return self.total_bytes / rate if rate else None
+
+    def summary(self, zipping: bool = False) -> str:
+        minutes = int(self.duration // 60)
+        line = f"{len(self.tracks)} track(s) • {minutes} min • ~{_human(self.total_bytes)}"
+        if zipping:
+            parts = len(self.zip_parts())
+            line += f" • {parts} zip part(s)"
+        eta = self.eta()
+        if eta:
+            line += f" • ETA ~{_human_time(eta)}"
+        return line
+
+
+def _human(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit in ('MB', 'GB') else f"{int(size)} {unit}"
+        size /= 1024
+
+
+def _human_time(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+
+def estimate_size(kind: str, duration: float, traits: list, options: dict | None = None) -> int:
+    """Expected file size of one item for the requested format and quality."""
+    options = options or {}
+    if kind == 'music-videos':
+        mv_max = _int(options.get('mv-max') or _yaml_value('mv-max'), 2160)
+        rate = next(bps for height, bps in MV_RATES if mv_max >= height) / 8
+    elif options.get('atmos') and 'atmos' in traits:
+        rate = ATMOS_RATE
+    elif options.get('aac') or options.get('atmos') or 'lossless' not in traits:
+        # Atmos requests fall back to AAC where no Atmos mix exists
+        rate = AAC_RATE
+    else:
+        alac_max = _int(options.get('alac-max') or _yaml_value('alac-max'), Config.APPLE_ALAC_QUALITY)
+        sample_rate = min(alac_max, HI_RES_MAX_RATE) if 'hi-res-lossless' in traits else 44100
+        bits = 24 if 'hi-res-lossless' in traits else 16
+        rate = sample_rate * bits * 2 / 8 * ALAC_RATIO
+    return int(duration * rate) + ITEM_OVERHEAD
+
+
+async def _developer_token(session: aiohttp.ClientSession) -> Optional[str]:
+    """Bearer token for the catalog API: config.yaml's, else the web player's."""
+    global _token, _token_time
+    configured = _yaml_value('authorization-token')
+    if configured and configured.startswith('eyJ'):
+        return configured
+    if _token and time.time() - _token_time < TOKEN_TTL:
+        return _token
+    async with session.get(f"{WEB_PLAYER}/us/browse") as response:
+        html = await response.text()
+    script = re.search(r'/assets/index[\w~.-]*\.js', html)
+    if not script:
+        return None
+    async with session.get(WEB_PLAYER + script.group(0)) as response:
+        token = TOKEN_RE.search(await response.text())
+    if token:
+        _token, _token_time = token.group(0), time.time()
+    return _token
+
+
+async def _get(session: aiohttp.ClientSession, path: str, token: str, params: dict | None = None) -> dict:
+    headers = {'Authorization': f"Bearer {token}", 'Origin': WEB_PLAYER}
+    user_token = _yaml_value('media-user-token')
+    if user_token and len(user_token) > 50:
+        # Skip the "your-media-user-token" placeholder
+        headers['Media-User-Token'] = user_token
+    async with session.get(AMP_API + path, headers=headers, params=params) as response:
+        if response.status != 200:
+            raise RuntimeError(f"catalog API returned HTTP {response.status}")
+        return await response.json()
+
+
+async def _paged(session: aiohttp.ClientSession, relation: dict, token: str) -> list:
+    """Every item of a relationship, following its next links."""
+    items = list(relation.get('data', []))
+    next_page = relation.get('next')
+    while next_page:
+        page = await _get(session, next_page, token)
+        items += page.get('data', [])
+        next_page = page.get('next')
+    return items
+
+
+async def resolve_catalog(url: str, options: dict | None = None) -> Optional[CatalogPlan]:
+    """
+    Resolve a link to its track list with size estimates.
+
+    Returns None when the link cannot be resolved (no token, API down,
+    unsupported kind); the caller then just downloads without a plan.
+    """
+    match = URL_RE.search(url)
+    if not match:
+        return None
+    storefront, kind, content_id = match.groups()
+    song_id = re.search(r'[?&]i=(\d+)', url)
+    if song_id:
+        kind, content_id = 'song', song_id.group(1)
+    path = f"/v1/catalog/{storefront}/{kind}s/{content_id}"
+    try:
+        async with aiohttp.ClientSession(timeout=ClientTimeout(total=Config.PREFLIGHT_TIMEOUT)) as session:
+            token = await _developer_token(session)
+            if not token:
+                LOGGER.debug("Pre-flight: no catalog API token available")
+                return None
+            data = (await _get(session, path, token, {'include': 'tracks'}))['data'][0]
+            if kind in ('song', 'music-video'):
+                items = [data]
+            else:
+                items = await _paged(session, data.get('relationships', {}).get('tracks', {}), token)
+            attributes = data.get('attributes', {})
+    except Exception as e:
+        LOGGER.debug(f"Pre-flight lookup failed for {url}: {str(e)}")
+        return None
+
+    tracks = []
+    for number, item in enumerate(items, start=1):
+        item_attributes = item.get('attributes', {})
+        duration = item_attributes.get('durationInMillis', 0) / 1000
+        traits = item_attributes.get('audioTraits', [])
+        tracks.append(CatalogTrack(
+            number, item_attributes.get('name', ''), item.get('type', 'songs'), duration, traits,
+            estimate_size(item.get('type', 'songs'), duration, traits, options),
+            artist=item_attributes.get('artistName', ''),
+            album=item_attributes.get('albumName', ''),
+            track_number=item_attributes.get('trackNumber', 0)
+        ))
+    return CatalogPlan(
+        kind, content_id,
+        attributes.get('name', ''),
+        attributes.get('artistName') or attributes.get('curatorName', ''),
+        tracks
+    )
+
+
+class Throughput:
+    """Smoothed download rate (bytes per second) of finished downloader runs."""
+
+    def __init__(self, weight: float = 0.3):
+        self.weight = weight
+        self.rate: Optional[float] = None
+
+    def record(self, size: int, seconds: float):
+        if size <= 0 or seconds <= 1:
+            return
+        sample = size / seconds
+        self.rate = sample if self.rate is None else self.weight * sample + (1 - self.weight) * self.rate
+
+
+class DiskReservations:
+    """
+    Disk space promised to running tasks.
+
+    A task is admitted once its estimate fits in the free space left after
+    every other reservation and the configured margin. What a running task
+    has already written to its folder is gone from the free space, so only
+    the rest of its reservation is held back. If a task only fails to fit
+    because of other running tasks it waits for them; if it could never
+    fit it is refused.
+    """
+
+    def __init__(self):
+        # task_id -> (reserved bytes, folder the task writes to)
+        self._reserved: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._released = asyncio.Event()
+
+    @property
+    def reserved(self) -> int:
+        return sum(size for size, _ in self._reserved.values())
+
+    @staticmethod
+    async def _written(folder: Optional[str]) -> int:
+        if not folder or not os.path.isdir(folder):
+            return 0
+        if find_watcher(folder):
+            # The watcher's in-memory manifest; cheap and owned by the event loop
+            return sum(size for _, size in scan_files(folder))
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: sum(size for _, size in scan_files(folder))
+        )
+
+    async def _outstanding(self) -> int:
+        """Reserved bytes that running tasks have not written yet."""
+        outstanding = 0
+        for size, folder in list(self._reserved.values()):
+            outstanding += max(0, size - await self._written(folder))
+        return outstanding
+
+    def _free(self) -> int:
+        try:
+            free = shutil.disk_usage(Config.LOCAL_STORAGE).free
+        except OSError:
+            return 0
+        return free - int(Config.DISK_FREE_MARGIN_GB * 1024 ** 3)
+
+    async def admit(self, task_id: str, size: int, cancel_event: asyncio.Event | None = None,
+                    folder: Optional[str] = None) -> bool:
+        """Reserve size bytes for a task writing to folder, waiting for running tasks if needed."""
+        while True:
+            free = self._free()
+            outstanding = await self._outstanding()
+            if free - outstanding >= size:
+                self._reserved[task_id] = (size, folder)
+                return True
+            # Running tasks give back at most what they reserved
+            if free + self.reserved < size:
+                return False
+            if cancel_event and cancel_event.is_set():
+                return False
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, task_id: str):
+        if self._reserved.pop(task_id, None) is not None:
+            self._released.set()
+
+
+# Singletons
+throughput = Throughput()
+disk_reservations = DiskReservations()
@@ -0,0 +1,114 @@
+import os
+import zlib
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config import Config
+
+# Faster hashes are used when installed; blake2b from hashlib otherwise
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Read size per update; hashlib and zlib release the GIL on blocks this large
+CHUNK_SIZE = 1024 * 1024
+# Hashing threads shared by all tasks
+HASH_WORKERS = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def hash_enabled() -> bool:
+    return Config.CONTENT_HASH.lower() == 'true'
+
+
+def hash_algorithm() -> str:
+    """Algorithm in use: CONTENT_HASH_ALGO if available, else the fastest installed."""
+    wanted = Config.CONTENT_HASH_ALGO.lower()
+    available = [name for name, ok in (('blake3', blake3), ('xxh3', xxhash), ('blake2b', True)) if ok]
+    return wanted if wanted in available else available[0]
+
+
+def _hasher(algorithm: str):
+    if algorithm == 'blake3':
+        return blake3.blake3()
+    if algorithm == 'xxh3':
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path: str) -> dict:
+    """
+    Content hash and CRC-32 of a file in one streaming pass
+    Args:
+        path: File to hash
+    Returns:
+        {'algo', 'hash', 'crc32', 'size', 'mtime_ns'}; size and mtime are
+        taken before reading so a later rewrite shows up as a mismatch
+    """
+    st = os.stat(path)
+    algorithm = hash_algorithm()
+    hasher = _hasher(algorithm)
+    crc = 0
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            chunk = view[:read]
+            hasher.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+    return {
+        'algo': algorithm,
+        'hash': hasher.hexdigest(),
+        'crc32': crc & 0xFFFFFFFF,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns
+    }
+
+
+def digest_matches(digest: Optional[dict], path: str) -> bool:
+    """Whether a stored digest still describes the file (a deleted file keeps its last one)."""
+    if not digest:
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True
+    return st.st_size == digest['size'] and st.st_mtime_ns == digest['mtime_ns']
+
+
+def hash_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='hash')
+    return _executor
+
+
+async def file_digest(path: str) -> Optional[dict]:
+    """
+    Digest of a file, reusing the one its task's output watcher computed.
+
+    Files inside a watched task root were hashed as the downloader closed
+    them (while still in the page cache); anything else is hashed now.
+    """
+    if not hash_enabled():
+        return None
+    from .output_watcher import find_watcher
+    watcher = find_watcher(path)
+    if watcher:
+        return await watcher.digest(path)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor(), hash_file, path)
+    except OSError:
+        return None
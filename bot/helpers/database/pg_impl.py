@@ -158,6 +158,99 @@ class DownloadHistory(DataBaseHandle):
                 if attempts >= 2:
                     raise e
 
+class FileIdCache(DataBaseHandle):
+    """Telegram file_ids of everything a request delivered, for re-sending."""
+
+    def __init__(self, dburl=None):
+        if dburl is None:
+            dburl = Config.DATABASE_URL
+        super().__init__(dburl)
+
+        schema = """
+        CREATE TABLE IF NOT EXISTS file_id_cache (
+            id SERIAL PRIMARY KEY,
+            content_key VARCHAR(100) NOT NULL,
+            quality VARCHAR(32) NOT NULL,
+            mode VARCHAR(10) NOT NULL,
+            position INT NOT NULL,
+            track_key VARCHAR(500) NOT NULL,
+            item_type VARCHAR(10) NOT NULL,
+            file_id VARCHAR(255) NOT NULL,
+            caption TEXT,
+            created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (content_key, quality, mode, track_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_file_id_lookup ON file_id_cache(content_key, quality, mode);
+        """
+        cur = self.scur()
+        cur.execute(schema)
+        self._conn.commit()
+        self.ccur(cur)
+
+    def get_delivery(self, content_key, quality, mode):
+        """Rows of a complete delivery in send order (empty if not cached)."""
+        sql = """
+        SELECT track_key, item_type, file_id, caption FROM file_id_cache
+        WHERE content_key = %s AND quality = %s AND mode = %s ORDER BY position
+        """
+        attempts = 0
+        while attempts < 2:
+            cur = self.scur(dictcur=True)
+            try:
+                cur.execute(sql, (content_key, quality, mode))
+                results = cur.fetchall()
+                self.ccur(cur)
+                return results
+            except psycopg2.Error as e:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+                self.re_establish()
+                attempts += 1
+                if attempts >= 2:
+                    raise e
+
+    def store_delivery(self, content_key, quality, mode, entries):
+        """Replace a delivery with entries [(track_key, item_type, file_id, caption)] in one transaction."""
+        delete = "DELETE FROM file_id_cache WHERE content_key = %s AND quality = %s AND mode = %s"
+        insert = """
+        INSERT INTO file_id_cache
+        (content_key, quality, mode, position, track_key, item_type, file_id, caption)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        attempts = 0
+        while attempts < 2:
+            cur = self.scur()
+            try:
+                cur.execute(delete, (content_key, quality, mode))
+                for position, (track_key, item_type, file_id, caption) in enumerate(entries):
+                    cur.execute(insert, (content_key, quality, mode, position, track_key, item_type, file_id, caption))
+                self._conn.commit()
+                self.ccur(cur)
+                return
+            except psycopg2.Error as e:
+                try:
+                    self._conn.rollback()
+                    cur.close()
+                except Exception:
+                    pass
+                self.re_establish()
+                attempts += 1
+                if attempts >= 2:
+                    raise e
+
+    def delete_delivery(self, content_key, quality, mode):
+        sql = "DELETE FROM file_id_cache WHERE content_key = %s AND quality = %s AND mode = %s"
+        cur = self.scur()
+        try:
+            cur.execute(sql, (content_key, quality, mode))
+            self._conn.commit()
+        except psycopg2.Error:
+            self._conn.rollback()
+        self.ccur(cur)
+
 # Initialize database handlers
 set_db = BotSettings()
 download_history = DownloadHistory()
+file_id_cache = FileIdCache()
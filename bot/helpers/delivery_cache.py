@@ -0,0 +1,112 @@
+import os
+from typing import Optional
+
+from config import Config
+from bot.logger import LOGGER
+from .database.pg_impl import file_id_cache
+from .message import send_message
+
+
+def _media_file_id(msg) -> Optional[tuple]:
+    """(item_type, file_id) of the media in a sent message."""
+    for item_type in ('audio', 'video', 'document'):
+        media = getattr(msg, item_type, None) if msg else None
+        if media:
+            return item_type, media.file_id
+    return None
+
+
+class DeliveryRecorder:
+    """
+    Collects the file_ids of one request's uploads.
+
+    Uploaders report every message they send; commit() stores the whole
+    delivery at once, and only if every upload produced a file_id, so a
+    cached delivery is never partial.
+    """
+
+    def __init__(self, content_key: str, quality: str, mode: str, root: str | None = None):
+        self.content_key = content_key
+        self.quality = quality
+        self.mode = mode
+        self.root = root
+        self.entries = []
+        self.failed = False
+        # track_key -> (item_type, file_id, caption) already re-sent from the cache
+        self.replayed = {}
+
+    def _track_key(self, path: str) -> str:
+        if self.root and os.path.abspath(path).startswith(os.path.abspath(self.root) + os.sep):
+            return os.path.relpath(path, self.root)
+        return os.path.basename(path)
+
+    def record(self, msg, path: str, caption: str | None = None):
+        media = _media_file_id(msg)
+        if not media:
+            self.failed = True
+            return
+        self.entries.append((self._track_key(path), media[0], media[1], caption))
+
+    def take_replayed(self, path: str) -> bool:
+        """Whether path was already sent by a replay that failed later on; records it if so."""
+        track_key = self._track_key(path)
+        entry = self.replayed.pop(track_key, None)
+        if entry is None:
+            return False
+        self.entries.append((track_key, *entry))
+        return True
+
+    def commit(self):
+        if self.failed or not self.entries:
+            return
+        try:
+            file_id_cache.store_delivery(self.content_key, self.quality, self.mode, self.entries)
+        except Exception as e:
+            LOGGER.error(f"Could not store file_id cache entry: {str(e)}")
+
+
+def remember_upload(user: dict, msg, path: str, caption: str | None = None):
+    """Report a sent message to the request's recorder, if any."""
+    recorder = user.get('delivery')
+    if recorder:
+        recorder.record(msg, path, caption)
+
+
+def already_delivered(user: dict, path: str) -> bool:
+    """Whether an upload of path should be skipped because a partial replay sent it."""
+    recorder = user.get('delivery')
+    return bool(recorder and recorder.take_replayed(path))
+
+
+async def replay_delivery(user: dict, recorder: DeliveryRecorder) -> bool:
+    """
+    Re-send a cached delivery by file_id. Returns False if nothing usable is cached.
+
+    If a file_id turns out stale partway through, the items sent so far are
+    kept in recorder.replayed: the fresh download that follows uploads only
+    the rest (see already_delivered), so the user gets nothing twice.
+    """
+    if not Config.FILE_ID_CACHE.lower() == 'true':
+        return False
+    content_key, quality, mode = recorder.content_key, recorder.quality, recorder.mode
+    try:
+        rows = file_id_cache.get_delivery(content_key, quality, mode)
+    except Exception as e:
+        LOGGER.error(f"file_id cache lookup failed: {str(e)}")
+        return False
+    if not rows:
+        return False
+    for row in rows:
+        msg = await send_message(user, row['file_id'], 'cached', caption=row['caption'])
+        media = _media_file_id(msg)
+        if media is None:
+            # Stale file_id (bot token changed, file expired); forget it
+            LOGGER.error(
+                f"Cached file_id for {content_key} failed after {len(recorder.replayed)} of {len(rows)} item(s); "
+                f"downloading again for the rest"
+            )
+            file_id_cache.delete_delivery(content_key, quality, mode)
+            return False
+        recorder.replayed[row['track_key']] = (media[0], media[1], row['caption'])
+    LOGGER.info(f"Re-delivered {content_key} from file_id cache ({len(rows)} item(s))")
+    return True
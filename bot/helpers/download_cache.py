@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from typing import Optional
+
+from config import Config
+from bot.logger import LOGGER
+
+
+# config.yaml keys that never change what gets downloaded
+_IGNORED_CONFIG_KEYS = ('media-user-token', 'authorization-token', 'alac-save-folder', 'atmos-save-folder', 'aac-save-folder')
+_META = 'cache.json'
+
+
+def link_file(src: str, dst: str):
+    """Hardlink src to dst, copying when they live on different filesystems."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def config_fingerprint() -> str:
+    """Download-relevant part of config.yaml (format, quality, naming ...)."""
+    try:
+        with open(Config.APPLE_CONFIG_YAML_PATH, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = [
+                line.strip() for line in f
+                if line.strip() and not line.strip().startswith('#')
+                and line.split(':', 1)[0].strip().lower() not in _IGNORED_CONFIG_KEYS
+            ]
+    except Exception:
+        lines = []
+    return "\n".join(lines)
+
+
+def request_identity(url: str, content_id: str, options: dict | None = None) -> Optional[tuple]:
+    """
+    (content_key, quality_key) identifying what a request downloads.
+
+    content_key names the catalog item ("album:123", "album:123:456" for a
+    ?i= song link); quality_key hashes the options and config.yaml settings
+    that change the resulting files. None if the content id is unknown.
+    """
+    if not content_id or content_id == 'unknown':
+        return None
+    kind = next((k for k in ('album', 'playlist', 'song', 'music-video') if f'/{k}/' in url), 'other')
+    content_key = f"{kind}:{content_id}"
+    if '?i=' in url or '&i=' in url:
+        content_key += ":" + url.split('i=', 1)[1].split('&', 1)[0]
+    raw = json.dumps({
+        'options': sorted((str(k), str(v)) for k, v in (options or {}).items()),
+        'config': config_fingerprint()
+    }, sort_keys=True)
+    return content_key, hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _tree_size(folder: str) -> int:
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+class CacheWriter:
+    """Collects the files of one download into a staging entry."""
+
+    def __init__(self, cache: "DownloadCache", key: str, task_dir: str):
+        self.cache = cache
+        self.key = key
+        self.task_dir = os.path.abspath(task_dir)
+        self.staging = os.path.join(cache.root, f".tmp-{key}-{uuid.uuid4().hex[:8]}")
+        self._added = set()
+
+    def add(self, path: str):
+        """Link one finished file (before the uploader deletes it)."""
+        path = os.path.abspath(path)
+        rel = os.path.relpath(path, self.task_dir)
+        if rel in self._added or rel.startswith('..') or rel == 'config.yaml':
+            return
+        try:
+            link_file(path, os.path.join(self.staging, rel))
+            self._added.add(rel)
+        except Exception as e:
+            LOGGER.error(f"Download cache: could not stage {path}: {str(e)}")
+
+    def remove(self, paths):
+        """Unstage files the downloader deleted (half-written ones it will fetch again)."""
+        for path in paths:
+            rel = os.path.relpath(os.path.abspath(path), self.task_dir)
+            if rel not in self._added:
+                continue
+            self._added.discard(rel)
+            try:
+                os.remove(os.path.join(self.staging, rel))
+            except OSError:
+                pass
+
+    def add_tree(self):
+        """Link everything still in the task directory (covers, lyrics, ...)."""
+        for root, _, files in os.walk(self.task_dir):
+            for name in files:
+                self.add(os.path.join(root, name))
+
+    def commit(self, url: str):
+        if not self._added:
+            self.discard()
+            return
+        size = _tree_size(self.staging)
+        if size > self.cache.budget:
+            LOGGER.info(f"Download cache: {url} ({size} bytes) exceeds the cache budget; not cached")
+            self.discard()
+            return
+        with open(os.path.join(self.staging, _META), 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'size': size, 'files': len(self._added), 'created': int(time.time())}, f)
+        try:
+            os.rename(self.staging, self.cache._entry(self.key))
+        except OSError:
+            # Another task cached the same content first
+            self.discard()
+            return
+        LOGGER.info(f"Download cache: stored {url} ({len(self._added)} files, {size} bytes)")
+        self.cache.evict()
+
+    def discard(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+class DownloadCache:
+    """
+    Shared on-disk cache of finished downloads, keyed by content and options.
+
+    Entries mirror a task's output tree (alac/..., atmos/...) and are linked
+    into new task directories on a hit, so nothing is copied. Cached files are
+    shared inodes: anything that edits a downloaded file in place must copy
+    it first. Entries are evicted least recently used first once the total
+    size exceeds the budget.
+    """
+
+    def __init__(self, root: str, budget: int):
+        self.root = os.path.abspath(root)
+        self.budget = max(0, budget)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def key(self, url: str, content_id: str, options: dict | None = None) -> Optional[str]:
+        """Cache key for a request, or None if it cannot be cached."""
+        identity = request_identity(url, content_id, options) if self.enabled else None
+        if not identity:
+            return None
+        return hashlib.sha1(":".join(identity).encode()).hexdigest()
+
+    def restore(self, key: str, task_dir: str) -> bool:
+        """Link a cached entry into task_dir. Counts a hit or a miss."""
+        entry = self._entry(key)
+        meta = os.path.join(entry, _META)
+        if not os.path.exists(meta):
+            self.misses += 1
+            return False
+        try:
+            for root, _, files in os.walk(entry):
+                for name in files:
+                    src = os.path.join(root, name)
+                    if src == meta:
+                        continue
+                    link_file(src, os.path.join(task_dir, os.path.relpath(src, entry)))
+            # Recency for LRU eviction
+            os.utime(meta)
+        except Exception as e:
+            LOGGER.error(f"Download cache: restore failed for {key}: {str(e)}")
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def writer(self, key: str, task_dir: str) -> CacheWriter:
+        os.makedirs(self.root, exist_ok=True)
+        return CacheWriter(self, key, task_dir)
+
+    def _entries(self) -> list:
+        """(last_used, size, path) of every complete entry."""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            meta = os.path.join(self.root, name, _META)
+            try:
+                with open(meta, 'r', encoding='utf-8') as f:
+                    size = int(json.load(f).get('size', 0))
+                entries.append((os.path.getmtime(meta), size, os.path.join(self.root, name)))
+            except Exception:
+                continue
+        return entries
+
+    def evict(self):
+        # Staging dirs left behind by a crash
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.startswith('.tmp-') and time.time() - os.path.getmtime(path) > 6 * 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.budget:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            LOGGER.info(f"Download cache: evicted {os.path.basename(path)} ({size} bytes)")
+
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'entries': len(entries),
+            'size': sum(size for _, size, _ in entries),
+            'budget': self.budget
+        }
+
+
+# Singleton
+download_cache = DownloadCache(Config.DOWNLOAD_CACHE_DIR, int(Config.DOWNLOAD_CACHE_SIZE_GB * 1024 ** 3))
@@ -0,0 +1,186 @@
+import re
+import codecs
+from collections import deque
+from typing import Optional, List, Dict, Tuple
+
+
+class DownloaderEvent:
+    """Typed event parsed from the Apple downloader's output."""
+
+    TRACK_STARTED = 'track_started'
+    TRACK_FINISHED = 'track_finished'
+    PERCENT = 'percent'
+    TOTAL = 'total'
+    ERROR = 'error'
+    LOG = 'log'
+    # Not parsed: run_apple_downloader deleted half-written files before a retry
+    FILES_DISCARDED = 'files_discarded'
+
+    def __init__(self, kind: str, track: Optional[int] = None, total: Optional[int] = None,
+                 percent: Optional[int] = None, text: Optional[str] = None, stream: str = 'stdout',
+                 paths: Optional[List[str]] = None):
+        self.kind = kind
+        self.track = track
+        self.total = total
+        self.percent = percent
+        self.text = text
+        self.stream = stream
+        self.paths = paths or []
+
+    def __repr__(self):
+        return f"DownloaderEvent({self.kind}, track={self.track}, total={self.total}, percent={self.percent})"
+
+
+# "Track 3 of 12" / "Track 3 of 12: Title"
+TRACK_RE = re.compile(r'\bTrack\s+(\d+)\s+of\s+(\d+)', re.IGNORECASE)
+# End of run summary: "Completed: 11/12  |  Warnings: 0  |  Errors: 1"
+SUMMARY_RE = re.compile(r'Completed:\s*(\d+)\s*/\s*(\d+)', re.IGNORECASE)
+PERCENT_RE = re.compile(r'(\d{1,3})%')
+ERROR_RE = re.compile(r'\b(error|failed|panic)\b', re.IGNORECASE)
+
+
+class DownloaderOutputParser:
+    """Incremental, line-oriented parser for downloader stdout/stderr.
+
+    Chunks may split lines (and numbers) anywhere; each stream keeps its own
+    partial-line buffer and lines are only parsed once complete. Carriage
+    returns from progress bars end a line too. Memory is bounded: partial
+    lines are capped at max_line characters and only the last tail_lines
+    lines are kept for error reporting.
+    """
+
+    def __init__(self, tail_lines: int = 50, max_line: int = 4096):
+        self.max_line = max_line
+        self.tail = deque(maxlen=tail_lines)
+        self.error_tail = deque(maxlen=tail_lines)
+        self.current_track: Optional[int] = None
+        self.total: Optional[int] = None
+        self.completed: set[int] = set()
+        self.failed: set[int] = set()
+        self._track_failed = False
+        self._last_percent: Optional[int] = None
+        self._buffers = {}
+        self._decoders = {}
+
+    def feed(self, data: bytes, stream: str = 'stdout') -> List[DownloaderEvent]:
+        """Feed a raw chunk from one stream and return the events it completed."""
+        decoder = self._decoders.setdefault(stream, codecs.getincrementaldecoder('utf-8')(errors='ignore'))
+        buf = self._buffers.get(stream, '') + decoder.decode(data)
+        events: List[DownloaderEvent] = []
+        parts = re.split(r'[\r\n]', buf)
+        buf = parts.pop()
+        for line in parts:
+            events.extend(self._parse_line(line, stream))
+        # Force-split runaway lines so memory stays bounded
+        while len(buf) > self.max_line:
+            events.extend(self._parse_line(buf[:self.max_line], stream))
+            buf = buf[self.max_line:]
+        self._buffers[stream] = buf
+        return events
+
+    def close(self, success: bool = True) -> List[DownloaderEvent]:
+        """Flush partial lines at EOF; on success the last track counts as finished."""
+        events: List[DownloaderEvent] = []
+        for stream, buf in list(self._buffers.items()):
+            if buf:
+                events.extend(self._parse_line(buf, stream))
+            self._buffers[stream] = ''
+        if success:
+            events.extend(self._finish_current())
+        return events
+
+    def error_text(self) -> str:
+        """Best error description from the bounded tails (stderr first)."""
+        lines = list(self.error_tail) or list(self.tail)
+        return "\n".join(lines).strip()
+
+    def _finish_current(self) -> List[DownloaderEvent]:
+        track = self.current_track
+        if track is None:
+            return []
+        self.current_track = None
+        if self._track_failed:
+            self.failed.add(track)
+            return []
+        self.completed.add(track)
+        self.failed.discard(track)
+        return [DownloaderEvent(DownloaderEvent.TRACK_FINISHED, track=track, total=self.total)]
+
+    def _parse_line(self, line: str, stream: str) -> List[DownloaderEvent]:
+        line = line.strip()
+        if not line:
+            return []
+        events: List[DownloaderEvent] = []
+
+        track = TRACK_RE.search(line)
+        if track:
+            number, total = int(track.group(1)), int(track.group(2))
+            if number != self.current_track:
+                events.extend(self._finish_current())
+                self.current_track = number
+                self._track_failed = False
+                self._last_percent = None
+                events.append(DownloaderEvent(DownloaderEvent.TRACK_STARTED, track=number, total=total, stream=stream))
+            if total != self.total:
+                self.total = total
+                events.append(DownloaderEvent(DownloaderEvent.TOTAL, total=total, stream=stream))
+
+            # Titles may contain anything (even "error"); no further matching
+            self.tail.append(line)
+            events.append(DownloaderEvent(DownloaderEvent.LOG, text=line, stream=stream))
+            return events
+
+        summary = SUMMARY_RE.search(line)
+        if summary:
+            events.extend(self._finish_current())
+            total = int(summary.group(2))
+            if total != self.total:
+                self.total = total
+                events.append(DownloaderEvent(DownloaderEvent.TOTAL, total=total, stream=stream))
+            self.tail.append(line)
+            events.append(DownloaderEvent(DownloaderEvent.LOG, text=line, stream=stream))
+            return events
+
+        # Before progress: a failure line may quote a percentage ("failed at 42%")
+        if ERROR_RE.search(line):
+            if self.current_track is not None:
+                self._track_failed = True
+            self.error_tail.append(line)
+            events.append(DownloaderEvent(DownloaderEvent.ERROR, track=self.current_track, text=line, stream=stream))
+            self.tail.append(line)
+            events.append(DownloaderEvent(DownloaderEvent.LOG, text=line, stream=stream))
+            return events
+
+        percent = PERCENT_RE.search(line)
+        if percent:
+            value = min(100, int(percent.group(1)))
+            if value != self._last_percent:
+                self._last_percent = value
+                events.append(DownloaderEvent(DownloaderEvent.PERCENT, track=self.current_track, percent=value, stream=stream))
+            # Progress bar frames are not worth keeping in the tail or the log
+            return events
+
+        if stream == 'stderr':
+            self.error_tail.append(line)
+
+        self.tail.append(line)
+        events.append(DownloaderEvent(DownloaderEvent.LOG, text=line, stream=stream))
+        return events
+
+
+class TrackManifest:
+    """Album/playlist positions of a task's tracks that are already on disk.
+
+    Survives downloader reruns, so a retry only has to fetch what is missing.
+    """
+
+    def __init__(self):
+        self.total: Optional[int] = None
+        self.completed: set[int] = set()
+        # Album position -> [(path, size)] of the files written for it
+        self.files: Dict[int, List[Tuple[str, int]]] = {}
+
+    def missing(self) -> List[int]:
+        if not self.total:
+            return []
+        return [n for n in range(1, self.total + 1) if n not in self.completed]
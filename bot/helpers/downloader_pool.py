@@ -0,0 +1,349 @@
+import os
+import uuid
+import base64
+import signal
+import asyncio
+from typing import Optional, List
+
+from config import Config
+from bot.logger import LOGGER
+
+
+def _partial_marker_len(buf: bytes, marker: bytes) -> int:
+    """Length of the longest tail of buf that is a prefix of marker."""
+    for n in range(min(len(buf), len(marker) - 1), 0, -1):
+        if buf.endswith(marker[:n]):
+            return n
+    return 0
+
+
+# Retries of a signal sent before the job's process group exists
+SIGNAL_RETRIES = 50
+SIGNAL_RETRY_DELAY = 0.05
+
+
+class WorkerJob:
+    """A single downloader run executed by a pooled worker.
+
+    Exposes the subset of asyncio.subprocess.Process that run_apple_downloader
+    and TaskManager rely on: stdout/stderr readers, pid, returncode, wait(),
+    terminate() and kill().
+    """
+
+    def __init__(self, job_id: str, worker: "DownloaderWorker"):
+        self.job_id = job_id
+        self.worker = worker
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self._done = asyncio.Event()
+        self._ended = {True: False, False: False}
+        self._pending_signal: Optional[int] = None
+
+    def _signal(self, sig: int, attempt: int = 0):
+        if self.returncode is not None:
+            return
+        if self.pid is None:
+            # PID not reported yet; deliver as soon as it arrives
+            self._pending_signal = sig
+            return
+        try:
+            os.killpg(self.pid, sig)
+        except ProcessLookupError:
+            # The worker reports the PID before the job has run setsid, so the
+            # group may not exist yet; retry while the process is still there
+            try:
+                os.kill(self.pid, 0)
+            except OSError:
+                return
+            if attempt < SIGNAL_RETRIES:
+                asyncio.get_running_loop().call_later(SIGNAL_RETRY_DELAY, self._signal, sig, attempt + 1)
+            else:
+                try:
+                    os.kill(self.pid, sig)
+                except Exception:
+                    pass
+        except Exception:
+            try:
+                os.kill(self.pid, sig)
+            except Exception:
+                pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode
+
+
+class DownloaderWorker:
+    """One long-lived downloader/am_worker.sh process."""
+
+    def __init__(self, pool: "DownloaderPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.mark = uuid.uuid4().hex.encode()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.jobs_done = 0
+        self.job: Optional[WorkerJob] = None
+        self._ready = asyncio.Event()
+        self._pong = asyncio.Event()
+        self._pumps: List[asyncio.Task] = []
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, timeout: float):
+        env = dict(os.environ, AM_WORKER_MARK=self.mark.decode())
+        self.process = await asyncio.create_subprocess_exec(
+            "bash", Config.DOWNLOADER_WORKER_PATH,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        self._pumps = [
+            asyncio.create_task(self._pump(self.process.stdout, True)),
+            asyncio.create_task(self._pump(self.process.stderr, False)),
+        ]
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except Exception:
+            await self.stop(force=True)
+            raise RuntimeError(f"Downloader worker {self.index} failed to start")
+        LOGGER.info(f"Downloader worker {self.index} ready (pid={self.process.pid})")
+
+    async def _send(self, *fields: str):
+        self.process.stdin.write(("\t".join(fields) + "\n").encode())
+        await self.process.stdin.drain()
+
+    async def run(self, args: List[str], cwd: str | None = None, stdin: str | None = None) -> WorkerJob:
+        job = WorkerJob(uuid.uuid4().hex[:8], self)
+        self.job = job
+        encoded = [base64.b64encode(a.encode()).decode() if a else "-" for a in [cwd or "", stdin or ""] + args]
+        await self._send("JOB", job.job_id, *encoded)
+        return job
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.alive:
+            return False
+        self._pong.clear()
+        try:
+            await self._send("PING")
+            await asyncio.wait_for(self._pong.wait(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    async def stop(self, force: bool = False):
+        if not self.alive:
+            return
+        try:
+            if force:
+                self.process.kill()
+            else:
+                await self._send("QUIT")
+            await asyncio.wait_for(self.process.wait(), timeout=5)
+        except Exception:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+
+    def _feed(self, data: bytes, is_stdout: bool):
+        if data and self.job:
+            (self.job.stdout if is_stdout else self.job.stderr).feed_data(data)
+
+    def _control(self, words: List[str], is_stdout: bool):
+        if not words:
+            return
+        kind = words[0]
+        if kind == "READY":
+            self._ready.set()
+        elif kind == "PONG":
+            self._pong.set()
+        elif kind == "FAILED":
+            LOGGER.error(f"Downloader worker {self.index} could not resolve the downloader binary")
+        elif kind == "PID" and self.job and len(words) >= 3:
+            try:
+                self.job.pid = int(words[2])
+            except ValueError:
+                return
+            if self.job._pending_signal is not None:
+                self.job._signal(self.job._pending_signal)
+        elif kind == "END" and self.job and len(words) >= 3:
+            if is_stdout:
+                try:
+                    self.job.returncode = int(words[2])
+                except ValueError:
+                    self.job.returncode = -1
+            self._end_stream(is_stdout)
+
+    def _end_stream(self, is_stdout: bool):
+        """Close one output stream of the current job; finish it once both are closed."""
+        job = self.job
+        if is_stdout:
+            job.stdout.feed_eof()
+        else:
+            job.stderr.feed_eof()
+        job._ended[is_stdout] = True
+        if all(job._ended.values()):
+            self._finish_job()
+
+    def _finish_job(self):
+        job = self.job
+        self.job = None
+        self.jobs_done += 1
+        job._done.set()
+        self.pool._release(self)
+
+    async def _pump(self, stream: asyncio.StreamReader, is_stdout: bool):
+        """Split a worker pipe into job output and control lines."""
+        marker = self.mark + b" "
+        buf = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            buf += chunk
+            while buf:
+                idx = buf.find(marker)
+                if idx == -1:
+                    # Hold back only a tail that could start a marker
+                    held = _partial_marker_len(buf, marker)
+                    self._feed(buf[:len(buf) - held], is_stdout)
+                    buf = buf[len(buf) - held:]
+                    break
+                eol = buf.find(b"\n", idx)
+                if eol == -1:
+                    self._feed(buf[:idx], is_stdout)
+                    buf = buf[idx:]
+                    break
+                self._feed(buf[:idx], is_stdout)
+                self._control(buf[idx + len(marker):eol].decode(errors="ignore").split(), is_stdout)
+                buf = buf[eol + 1:]
+        # Worker pipe closed: fail any in-flight job
+        self._feed(buf, is_stdout)
+        if self.job:
+            if self.job.returncode is None:
+                self.job.returncode = -1
+            # The worker is gone, so the other stream will not see an END either
+            self._end_stream(is_stdout)
+            if self.job:
+                self._end_stream(not is_stdout)
+
+
+class DownloaderPool:
+    """Fixed-size pool of persistent downloader workers.
+
+    Each slot holds either a live worker or None (spawned on demand). Workers
+    are health-checked while idle and recycled after a number of jobs.
+    """
+
+    def __init__(self, size: int, max_jobs: int):
+        self.size = max(0, size)
+        self.max_jobs = max(1, max_jobs)
+        self._slots: Optional[asyncio.Queue] = None
+        self._workers: List[DownloaderWorker] = []
+        self._health_task: Optional[asyncio.Task] = None
+        self._counter = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and os.path.exists(Config.DOWNLOADER_WORKER_PATH)
+
+    def _ensure_started(self):
+        if self._slots is not None:
+            return
+        self._slots = asyncio.Queue()
+        for _ in range(self.size):
+            self._slots.put_nowait(None)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _spawn(self) -> DownloaderWorker:
+        self._counter += 1
+        worker = DownloaderWorker(self, self._counter)
+        await worker.start(timeout=Config.DOWNLOADER_WORKER_START_TIMEOUT)
+        self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: DownloaderWorker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+        asyncio.create_task(worker.stop())
+
+    def _release(self, worker: DownloaderWorker):
+        if not worker.alive or worker.jobs_done >= self.max_jobs:
+            LOGGER.debug(f"Recycling downloader worker {worker.index} after {worker.jobs_done} job(s)")
+            self._retire(worker)
+            self._slots.put_nowait(None)
+        else:
+            self._slots.put_nowait(worker)
+
+    async def submit(self, args: List[str], cwd: str | None = None, cancel_event: asyncio.Event | None = None, stdin: str | None = None) -> Optional[WorkerJob]:
+        """Wait for a free slot and start a job in cwd (default: the Go project dir).
+
+        stdin, if given, is fed to the downloader (e.g. a --select answer).
+
+        Returns None if cancelled while waiting for a slot.
+        """
+        self._ensure_started()
+        getter = asyncio.ensure_future(self._slots.get())
+        if cancel_event:
+            waiter = asyncio.ensure_future(cancel_event.wait())
+            await asyncio.wait({getter, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if not getter.done():
+                getter.cancel()
+                return None
+        worker = await getter
+        if cancel_event and cancel_event.is_set():
+            self._slots.put_nowait(worker)
+            return None
+        try:
+            if worker is None or not worker.alive:
+                if worker is not None:
+                    self._retire(worker)
+                worker = await self._spawn()
+            return await worker.run(args, cwd=cwd, stdin=stdin)
+        except Exception:
+            if worker is not None:
+                self._retire(worker)
+            self._slots.put_nowait(None)
+            raise
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(Config.DOWNLOADER_WORKER_HEALTH_INTERVAL)
+            # Take exactly the slots queued now; empty ones need no check
+            slots = [self._slots.get_nowait() for _ in range(self._slots.qsize())]
+            idle = [worker for worker in slots if worker is not None]
+            for _ in range(len(slots) - len(idle)):
+                self._slots.put_nowait(None)
+            # Ping concurrently; each worker goes back to its slot as soon as it answers
+            await asyncio.gather(*(self._check(worker) for worker in idle))
+
+    async def _check(self, worker: DownloaderWorker):
+        if await worker.ping(timeout=10):
+            self._slots.put_nowait(worker)
+        else:
+            LOGGER.error(f"Downloader worker {worker.index} failed health check; replacing")
+            self._retire(worker)
+            self._slots.put_nowait(None)
+
+    async def shutdown(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for worker in list(self._workers):
+            await worker.stop()
+        self._workers.clear()
+
+
+# Singleton
+downloader_pool = DownloaderPool(Config.DOWNLOADER_WORKERS, Config.DOWNLOADER_WORKER_MAX_JOBS)
@@ -0,0 +1,95 @@
+from bot.settings import bot_set
+from .metadata_reader import is_shared_cover
+from .utils import extract_apple_metadata_batch
+
+
+# Fields one tag read provides; the cover is a separate, costlier read
+TAG_FIELDS = ('title', 'artist', 'album', 'duration')
+COVER_FIELDS = ('thumbnail',)
+# Always present
+FIXED_FIELDS = ('filepath', 'provider')
+
+
+class LazyMetadata(dict):
+    """
+    Item metadata that is read from the file only when an upload path asks.
+
+    Starts out with the file path (plus any fields already known, e.g. from
+    the run manifest). Upload code calls load_metadata() with the fields it
+    is about to read; everything else is never parsed. Items of one album
+    folder can share a cover_group so only one of them is read for the art.
+    """
+
+    def __init__(self, file_path: str, provider: str, known: dict | None = None, cover_group=None):
+        super().__init__(filepath=file_path, provider=provider)
+        self.loaded = set(FIXED_FIELDS)
+        self.cover_group = cover_group
+        if known:
+            self.update(known)
+            self.loaded.update(known)
+
+    def missing(self, fields) -> set:
+        return set(fields) - self.loaded
+
+    def apply(self, metadata: dict, fields):
+        """Take fields from a parse without overriding what was already known."""
+        for key, value in metadata.items():
+            if key in self.loaded or (key in COVER_FIELDS and key not in fields):
+                continue
+            self[key] = value
+        self.loaded.update(fields)
+
+
+def upload_fields() -> tuple:
+    """Fields the active upload mode reads from a track or video item"""
+    if bot_set.upload_mode == 'Telegram':
+        return TAG_FIELDS + COVER_FIELDS
+    if bot_set.upload_mode == 'RCLONE':
+        # Captions only
+        return ('title', 'artist')
+    return ()
+
+
+async def load_metadata(items: list, fields=None):
+    """
+    Make fields available on items, parsing in the metadata pool only what is missing
+    Args:
+        items: Item metadata; plain dicts are already complete and left alone
+        fields: Fields about to be read (default: upload_fields())
+    """
+    fields = tuple(upload_fields() if fields is None else fields)
+    lazy = [item for item in items if isinstance(item, LazyMetadata) and item.missing(fields)]
+    full, tags_only, followers = [], [], []
+    leaders = {}
+    for item in lazy:
+        if not item.missing(COVER_FIELDS).intersection(fields):
+            tags_only.append(item)
+        elif item.cover_group is not None and item.cover_group in leaders:
+            followers.append(item)
+        else:
+            if item.cover_group is not None:
+                leaders[item.cover_group] = item
+            full.append(item)
+
+    async def _parse(batch, cover: bool):
+        results = await extract_apple_metadata_batch([item['filepath'] for item in batch], extract_cover=cover)
+        for item, metadata in zip(batch, results):
+            item.apply(metadata, TAG_FIELDS + (COVER_FIELDS if cover else ()))
+
+    if full:
+        await _parse(full, True)
+    if tags_only:
+        await _parse(tags_only, False)
+
+    # The rest of an album folder reuses its leader's cover from the cover store
+    rest = []
+    for item in followers:
+        thumbnail = leaders[item.cover_group].get('thumbnail')
+        # No cover at all (or cover extraction off) holds for the whole folder too
+        if thumbnail is None or is_shared_cover(thumbnail):
+            item['thumbnail'] = thumbnail
+            item.loaded.update(COVER_FIELDS)
+        if item.missing(fields):
+            rest.append(item)
+    if rest:
+        await _parse(rest, True)
@@ -104,9 +104,10 @@ async def send_message(user, item, itype='text', caption=None, markup=None, chat
     if progress_reporter and itype in ('doc', 'audio', 'video'):
         try:
             await progress_reporter.set_stage(progress_label or 'Uploading')
-            if isinstance(item, str) and os.path.exists(item):
+            # Paths, or file objects that know their size (streaming zips)
+            if (isinstance(item, str) and os.path.exists(item)) or hasattr(item, 'size'):
                 try:
-                    total_bytes = os.path.getsize(item)
+                    total_bytes = item.size if hasattr(item, 'size') else os.path.getsize(item)
                     await progress_reporter.update_upload(0, total_bytes, file_index=file_index, file_total=total_files, label=progress_label or 'Uploading')
                 except Exception:
                     pass
@@ -154,6 +155,7 @@ async def send_message(user, item, itype='text', caption=None, markup=None, chat
             duration = int(meta.get('duration', 0)) if meta else 0
             width = int(meta.get('width', 1920)) if meta else 1920
             height = int(meta.get('height', 1080)) if meta else 1080
+            streaming = bool(meta.get('supports_streaming', True)) if meta else True
             thumbnail = meta.get('thumbnail') if meta else None
             
             msg = await aio.send_video(
@@ -163,10 +165,19 @@ async def send_message(user, item, itype='text', caption=None, markup=None, chat
                 duration=duration,
                 width=width,
                 height=height,
+                supports_streaming=streaming,
                 thumb=thumbnail,
                 reply_to_message_id=user['r_id'],
                 progress=_make_progress_cb(progress_label, file_index, total_files) if progress_reporter else None
             )
+        elif itype == 'cached':
+            # item is a Telegram file_id of an earlier upload
+            msg = await aio.send_cached_media(
+                chat_id=chat_id,
+                file_id=item,
+                caption=caption,
+                reply_to_message_id=user['r_id']
+            )
         elif itype == 'pic':
             msg = await aio.send_photo(
                 chat_id=chat_id,
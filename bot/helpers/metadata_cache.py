@@ -0,0 +1,162 @@
+import os
+import json
+import atexit
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config import Config
+from bot.logger import LOGGER
+from .download_cache import link_file
+
+
+# Seconds between writes of the persisted cache
+SAVE_INTERVAL = 60
+
+
+def file_identity(path: str) -> Optional[tuple]:
+    """(device, inode, size, mtime_ns) of a file; hardlinked copies share it."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class MetadataCache:
+    """
+    LRU cache of parsed tag metadata, keyed by file identity.
+
+    Identity is the inode plus size and mtime rather than the path, so the
+    same track hardlinked into another task (download cache) is a hit too,
+    and any rewrite of the file is a miss. Entries can be persisted to a
+    JSON file so they survive restarts; the file is written by a single
+    background thread, so saving never blocks the event loop.
+    """
+
+    def __init__(self, max_entries: int, path: str | None = None):
+        self.max_entries = max(0, max_entries)
+        self.path = path or None
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._saved = time.monotonic()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, reader: str, path: str, extract_cover: bool) -> Optional[str]:
+        identity = file_identity(path) if self.enabled else None
+        if not identity:
+            return None
+        return ":".join([reader, *(str(v) for v in identity), '1' if extract_cover else '0'])
+
+    def get(self, key: Optional[str], path: str, cover_dir: str | None = None) -> Optional[dict]:
+        """Cached metadata for path (a copy), or None."""
+        entry = self.entries.get(key) if key else None
+        if entry is None:
+            self.misses += 1
+            return None
+        metadata = dict(entry['metadata'])
+        thumbnail = metadata.get('thumbnail')
+        if thumbnail and entry['path'] != path:
+            # Covers live next to the file or in its task's cover store
+            if cover_dir:
+                local = os.path.join(cover_dir, os.path.basename(thumbnail))
+            else:
+                local = f"{os.path.splitext(path)[0]}.jpg"
+            if not os.path.exists(local):
+                try:
+                    link_file(thumbnail, local)
+                except OSError:
+                    self.misses += 1
+                    return None
+            metadata['thumbnail'] = local
+        elif thumbnail and not os.path.exists(thumbnail):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return metadata
+
+    def put(self, key: Optional[str], path: str, metadata: dict):
+        # Failed parses come back as placeholder metadata without a duration
+        if not key or not metadata.get('duration'):
+            return
+        self.entries[key] = {'path': path, 'metadata': dict(metadata)}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+        if time.monotonic() - self._saved >= SAVE_INTERVAL:
+            self.save()
+
+    def clear(self):
+        self.entries.clear()
+        self._dirty = True
+        self.save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0
+        }
+
+    def _load(self):
+        if not self.path or not self.enabled or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for key, entry in json.load(f):
+                    self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        except Exception as e:
+            LOGGER.error(f"Metadata cache: could not load {self.path}: {str(e)}")
+            self.entries.clear()
+
+    def save(self):
+        """Queue a write of the current entries; returns at once."""
+        self._saved = time.monotonic()
+        if not self.path or not self._dirty:
+            return
+        # Entries are never mutated in place, so a shallow snapshot is enough
+        snapshot = list(self.entries.items())
+        self._dirty = False
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='metadata-cache')
+        self._writer.submit(self._write, snapshot)
+
+    def _write(self, snapshot: list):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            self._dirty = True
+            LOGGER.error(f"Metadata cache: could not save {self.path}: {str(e)}")
+
+    def close(self):
+        """Finish queued writes, then save what is left in this thread (at exit)."""
+        if self._writer:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self.path and self._dirty:
+            self._dirty = False
+            self._write(list(self.entries.items()))
+
+
+# Singleton
+metadata_cache = MetadataCache(Config.METADATA_CACHE_SIZE, Config.METADATA_CACHE_FILE)
+atexit.register(metadata_cache.close)
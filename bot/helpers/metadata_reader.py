@@ -0,0 +1,235 @@
+import os
+import uuid
+import base64
+import hashlib
+import mutagen
+import mutagen.flac
+from mutagen.mp4 import MP4
+
+from bot.logger import LOGGER
+from .mp4atoms import read_mp4_info, read_cover
+from .video_probe import probe_video
+
+
+# Blocking tag readers. They import nothing from the bot beyond the logger,
+# so they can run in worker threads or in spawned worker processes.
+
+# Name of the per-task folder holding one copy of every distinct cover
+COVER_STORE = '.covers'
+
+
+def _read_mp4_fast(file_path: str, extract_cover: bool, cover_dir: str | None, video: bool) -> dict | None:
+    """Metadata from the MP4 box walker; None to fall back to mutagen."""
+    try:
+        info = read_mp4_info(file_path)
+        if not info or not info['duration']:
+            return None
+        thumbnail = None
+        if extract_cover and info['cover']:
+            thumbnail = _save_cover(read_cover(file_path, info['cover']), file_path, cover_dir)
+    except Exception as e:
+        LOGGER.debug(f"MP4 fast path failed for {file_path}: {str(e)}")
+        return None
+    metadata = {
+        'title': info['title'] or 'Unknown',
+        'artist': info['artist'] or 'Unknown Artist',
+    }
+    if video:
+        width, height = info['width'] or 1920, info['height'] or 1080
+        if info['rotation'] in (90, 270):
+            # Displayed dimensions of a rotated stream
+            width, height = height, width
+        metadata.update({
+            'duration': int(info['duration']),
+            'thumbnail': thumbnail,
+            'width': width,
+            'height': height
+        })
+    else:
+        metadata.update({
+            'album': info['album'] or 'Unknown Album',
+            'duration': int(info['duration']),
+            'thumbnail': thumbnail
+        })
+    return metadata
+
+
+def read_audio_metadata(file_path: str, extract_cover: bool = True, cover_dir: str | None = None) -> dict:
+    """
+    Extract metadata from audio files
+    Args:
+        file_path: Path to audio file
+        extract_cover: Write embedded cover art to disk
+        cover_dir: Shared cover store (default: next to the file)
+    Returns:
+        Metadata dictionary
+    """
+    try:
+        if file_path.endswith('.m4a'):
+            fast = _read_mp4_fast(file_path, extract_cover, cover_dir, video=False)
+            if fast:
+                return fast
+            audio = MP4(file_path)
+            return {
+                'title': audio.get('\xa9nam', ['Unknown'])[0],
+                'artist': audio.get('\xa9ART', ['Unknown Artist'])[0],
+                'album': audio.get('\xa9alb', ['Unknown Album'])[0],
+                'duration': int(audio.info.length),
+                'thumbnail': extract_cover_art(audio, file_path, cover_dir) if extract_cover else None
+            }
+        else:
+            # Handle other audio formats like mp3, flac, etc.
+            audio = mutagen.File(file_path)
+            return {
+                'title': audio.get('title', ['Unknown'])[0],
+                'artist': audio.get('artist', ['Unknown Artist'])[0],
+                'album': audio.get('album', ['Unknown Album'])[0],
+                'duration': int(audio.info.length),
+                'thumbnail': (extract_cover_art(audio, file_path, cover_dir) if hasattr(audio, 'pictures') and extract_cover else None)
+            }
+    except Exception as e:
+        LOGGER.error(f"Audio metadata extraction failed: {str(e)}")
+        return default_metadata(file_path)
+
+
+def read_video_metadata(file_path: str, extract_cover: bool = True, cover_dir: str | None = None) -> dict:
+    """
+    Extract metadata from video files
+    Args:
+        file_path: Path to video file
+        extract_cover: Write embedded cover art to disk
+        cover_dir: Shared cover store (default: next to the file)
+    Returns:
+        Metadata dictionary with video-specific properties
+    """
+    try:
+        if file_path.endswith(('.mp4', '.m4v', '.mov')):
+            fast = _read_mp4_fast(file_path, extract_cover, cover_dir, video=True)
+            if fast:
+                return fast
+            video = MP4(file_path)
+            # MP4 has no width/height tags; take them from the track header
+            probe = probe_video(file_path) or {}
+            return {
+                'title': video.get('\xa9nam', ['Unknown'])[0],
+                'artist': video.get('\xa9ART', ['Unknown Artist'])[0],
+                'duration': int(video.info.length),
+                'thumbnail': extract_cover_art(video, file_path, cover_dir) if extract_cover else None,
+                'width': probe.get('width', 1920),
+                'height': probe.get('height', 1080)
+            }
+        else:
+            return default_metadata(file_path)
+    except Exception as e:
+        LOGGER.error(f"Video metadata extraction failed: {str(e)}")
+        return default_metadata(file_path)
+
+
+def read_apple_metadata(file_path: str, extract_cover: bool = True, cover_dir: str | None = None) -> dict:
+    """
+    Extract metadata from Apple Music files (audio or video)
+    Args:
+        file_path: Path to media file
+        extract_cover: Write embedded cover art to disk
+        cover_dir: Shared cover store (default: next to the file)
+    Returns:
+        Metadata dictionary
+    """
+    try:
+        if file_path.endswith('.m4a'):
+            return read_audio_metadata(file_path, extract_cover, cover_dir)
+        elif file_path.endswith(('.mp4', '.m4v', '.mov')):
+            return read_video_metadata(file_path, extract_cover, cover_dir)
+        else:
+            # Handle other file types with mutagen
+            audio = mutagen.File(file_path)
+            return {
+                'title': audio.get('title', ['Unknown'])[0],
+                'artist': audio.get('artist', ['Unknown Artist'])[0],
+                'album': audio.get('album', ['Unknown Album'])[0],
+                'duration': int(audio.info.length),
+                'thumbnail': (extract_cover_art(audio, file_path, cover_dir) if hasattr(audio, 'pictures') and extract_cover else None)
+            }
+    except Exception as e:
+        LOGGER.error(f"Apple metadata extraction failed: {str(e)}")
+        return default_metadata(file_path)
+
+
+def read_apple_metadata_batch(file_paths: list, extract_cover: bool = True, cover_dirs: list | None = None) -> list:
+    """Metadata of several files in one pool submission, in order."""
+    cover_dirs = cover_dirs or [None] * len(file_paths)
+    return [read_apple_metadata(path, extract_cover, folder) for path, folder in zip(file_paths, cover_dirs)]
+
+
+def is_shared_cover(path: str | None) -> bool:
+    """Whether a thumbnail lives in a cover store (shared by several tracks)."""
+    return bool(path) and os.path.basename(os.path.dirname(path)) == COVER_STORE
+
+
+def _save_cover(data: bytes, file_path: str, cover_dir: str | None) -> str:
+    """
+    Write cover bytes and return their path.
+
+    With a cover store, covers are content addressed: every track of an
+    album embeds the same image, so only the first one is written and the
+    rest reuse it. Writes go through a temporary file and an atomic rename,
+    which keeps concurrent pool workers from seeing half-written covers.
+    """
+    if not cover_dir:
+        cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
+        with open(cover_path, 'wb') as f:
+            f.write(data)
+        return cover_path
+    cover_path = os.path.join(cover_dir, f"{hashlib.sha1(data).hexdigest()}.jpg")
+    if not os.path.exists(cover_path):
+        os.makedirs(cover_dir, exist_ok=True)
+        tmp = f"{cover_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, cover_path)
+    return cover_path
+
+
+def extract_cover_art(media, file_path, cover_dir: str | None = None):
+    """
+    Extract cover art from audio/video file
+    Args:
+        media: Mutagen file object
+        file_path: Path to media file
+        cover_dir: Shared cover store; None writes a .jpg next to the file
+    Returns:
+        Path to extracted cover art or None
+    """
+    try:
+        # Handle MP4 cover art
+        if 'covr' in media:
+            return _save_cover(bytes(media['covr'][0]), file_path, cover_dir)
+
+        # Handle ID3 tags (MP3)
+        elif hasattr(media, 'pictures') and media.pictures:
+            return _save_cover(media.pictures[0].data, file_path, cover_dir)
+
+        # Handle FLAC/Vorbis comments
+        elif 'metadata_block_picture' in media:
+            for block in media.get('metadata_block_picture', []):
+                try:
+                    data = base64.b64decode(block)
+                    pic = mutagen.flac.Picture(data)
+                    if pic.type == 3:  # Front cover
+                        return _save_cover(pic.data, file_path, cover_dir)
+                except:
+                    continue
+    except Exception as e:
+        LOGGER.error(f"Failed to extract cover art: {str(e)}")
+    return None
+
+
+def default_metadata(file_path):
+    """Return default metadata when extraction fails"""
+    return {
+        'title': os.path.splitext(os.path.basename(file_path))[0],
+        'artist': 'Unknown Artist',
+        'album': 'Unknown Album',
+        'duration': 0,
+        'thumbnail': None
+    }
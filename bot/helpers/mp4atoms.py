@@ -0,0 +1,263 @@
+import mmap
+import struct
+from typing import Iterator, Optional, Tuple
+
+
+# Boxes whose payload is a list of child boxes
+CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'udta', b'ilst'}
+# ilst items we read, by atom name
+TEXT_ITEMS = {b'\xa9nam': 'title', b'\xa9ART': 'artist', b'\xa9alb': 'album', b'aART': 'albumartist'}
+# 'data' box type indicators
+DATA_UTF8 = 1
+# Sample entry types (stsd) by codec name
+CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264', b'hvc1': 'hevc', b'hev1': 'hevc',
+    b'dvh1': 'hevc', b'dvhe': 'hevc', b'av01': 'av1', b'vp09': 'vp9',
+    b'mp4a': 'aac', b'alac': 'alac', b'ac-3': 'ac3', b'ec-3': 'eac3', b'Opus': 'opus', b'fLaC': 'flac'
+}
+
+_U32 = struct.Struct('>I')
+_U64 = struct.Struct('>Q')
+_I32 = struct.Struct('>i')
+
+
+def _boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload start, payload end) of the boxes between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        size = _U32.unpack_from(buf, pos)[0]
+        kind = bytes(buf[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = _U64.unpack_from(buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            # Box runs to the end of its parent
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find(buf, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child, payload, box_end in _boxes(buf, start, end):
+        if child == kind:
+            return payload, box_end
+    return None
+
+
+def _movie_header(buf, start: int) -> Tuple[int, int]:
+    """(timescale, duration) from an mvhd payload."""
+    if buf[start] == 1:
+        return _U32.unpack_from(buf, start + 20)[0], _U64.unpack_from(buf, start + 24)[0]
+    return _U32.unpack_from(buf, start + 12)[0], _U32.unpack_from(buf, start + 16)[0]
+
+
+def _track_header(buf, start: int) -> Tuple[int, int, int]:
+    """(width, height, rotation) from a tkhd payload."""
+    offset = start + (4 + 32 if buf[start] == 1 else 4 + 20)
+    # reserved(8) layer(2) alternate group(2) volume(2) reserved(2), then the matrix
+    matrix = offset + 16
+    a, b = _I32.unpack_from(buf, matrix)[0], _I32.unpack_from(buf, matrix + 4)[0]
+    width = _U32.unpack_from(buf, matrix + 36)[0] >> 16
+    height = _U32.unpack_from(buf, matrix + 40)[0] >> 16
+    if a == 0 and b > 0:
+        rotation = 90
+    elif a == 0 and b < 0:
+        rotation = 270
+    elif a < 0:
+        rotation = 180
+    else:
+        rotation = 0
+    return width, height, rotation
+
+
+def _handler(buf, trak: Tuple[int, int]) -> Optional[bytes]:
+    mdia = _find(buf, trak[0], trak[1], b'mdia')
+    hdlr = _find(buf, mdia[0], mdia[1], b'hdlr') if mdia else None
+    if not hdlr or hdlr[0] + 12 > hdlr[1]:
+        return None
+    return bytes(buf[hdlr[0] + 8:hdlr[0] + 12])
+
+
+def _ilst(buf, udta: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    meta = _find(buf, udta[0], udta[1], b'meta')
+    if not meta:
+        return None
+    start = meta[0]
+    # ISO meta is a full box (version/flags); QuickTime's is not
+    if start + 8 <= meta[1] and bytes(buf[start + 4:start + 8]) not in (b'hdlr', b'ilst', b'keys'):
+        start += 4
+    return _find(buf, start, meta[1], b'ilst')
+
+
+def _read_ilst(buf, ilst: Tuple[int, int], info: dict):
+    for kind, payload, end in _boxes(buf, ilst[0], ilst[1]):
+        if kind not in TEXT_ITEMS and kind != b'covr':
+            continue
+        data = _find(buf, payload, end, b'data')
+        if not data or data[0] + 8 > data[1]:
+            continue
+        value_start = data[0] + 8  # type indicator + locale
+        if kind == b'covr':
+            if info['cover'] is None and data[1] > value_start:
+                info['cover'] = (value_start, data[1] - value_start)
+        elif _U32.unpack_from(buf, data[0])[0] & 0xFFFFFF == DATA_UTF8:
+            info[TEXT_ITEMS[kind]] = bytes(buf[value_start:data[1]]).decode('utf-8', errors='replace')
+
+
+def parse_mp4(buf) -> Optional[dict]:
+    """
+    Tags and stream facts from an MP4/QuickTime buffer, or None if there is no moov.
+
+    Only box headers and the few boxes of interest are touched, so with an
+    mmap'd file the media data is never read.
+    """
+    moov = _find(buf, 0, len(buf), b'moov')
+    if not moov:
+        return None
+    info = {
+        'title': None, 'artist': None, 'album': None, 'albumartist': None,
+        'duration': 0.0, 'width': 0, 'height': 0, 'rotation': 0,
+        'video': False, 'audio': False, 'cover': None
+    }
+    mvhd = _find(buf, moov[0], moov[1], b'mvhd')
+    if mvhd:
+        timescale, duration = _movie_header(buf, mvhd[0])
+        info['duration'] = duration / timescale if timescale else 0.0
+    for kind, payload, end in _boxes(buf, moov[0], moov[1]):
+        if kind == b'trak':
+            handler = _handler(buf, (payload, end))
+            if handler == b'soun':
+                info['audio'] = True
+            elif handler == b'vide' and not info['video']:
+                tkhd = _find(buf, payload, end, b'tkhd')
+                if tkhd:
+                    info['width'], info['height'], info['rotation'] = _track_header(buf, tkhd[0])
+                info['video'] = True
+        elif kind == b'udta':
+            ilst = _ilst(buf, (payload, end))
+            if ilst:
+                _read_ilst(buf, ilst, info)
+    return info
+
+
+def _media_header(buf, start: int) -> Tuple[int, int]:
+    """(timescale, duration) from an mdhd payload."""
+    if buf[start] == 1:
+        return _U32.unpack_from(buf, start + 20)[0], _U64.unpack_from(buf, start + 24)[0]
+    return _U32.unpack_from(buf, start + 12)[0], _U32.unpack_from(buf, start + 16)[0]
+
+
+def _sample_table(buf, mdia: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    minf = _find(buf, mdia[0], mdia[1], b'minf')
+    return _find(buf, minf[0], minf[1], b'stbl') if minf else None
+
+
+def _codec(buf, stbl: Tuple[int, int]) -> Optional[str]:
+    stsd = _find(buf, stbl[0], stbl[1], b'stsd')
+    # version/flags(4) entry count(4), then the first sample entry box
+    if not stsd or stsd[0] + 16 > stsd[1]:
+        return None
+    kind = bytes(buf[stsd[0] + 12:stsd[0] + 16])
+    return CODECS.get(kind, kind.decode('latin-1').strip())
+
+
+def _sample_bytes(buf, stbl: Tuple[int, int]) -> int:
+    """Total size of a track's samples from its stsz box (0 if absent)."""
+    stsz = _find(buf, stbl[0], stbl[1], b'stsz')
+    if not stsz or stsz[0] + 12 > stsz[1]:
+        return 0
+    sample_size, count = _U32.unpack_from(buf, stsz[0] + 4)[0], _U32.unpack_from(buf, stsz[0] + 8)[0]
+    if sample_size:
+        return sample_size * count
+    count = min(count, (stsz[1] - stsz[0] - 12) // 4)
+    table = memoryview(buf)[stsz[0] + 12:stsz[0] + 12 + count * 4]
+    try:
+        return sum(size for size, in struct.iter_unpack('>I', table))
+    finally:
+        table.release()
+
+
+def parse_mp4_tracks(buf) -> Optional[dict]:
+    """
+    Stream layout of an MP4/QuickTime buffer, or None if there is no moov.
+
+    'tracks' lists each track's handler, codec, duration, sample bytes and,
+    for video, its tkhd width/height/rotation. 'faststart' is whether the
+    moov box precedes the media data (or the file is fragmented), which is
+    what players need to start before the whole file is downloaded.
+    """
+    moov = mdat = None
+    fragmented = False
+    for kind, payload, end in _boxes(buf, 0, len(buf)):
+        if kind == b'moov':
+            moov = (payload, end)
+        elif kind == b'mdat' and mdat is None:
+            mdat = payload
+        elif kind == b'moof':
+            fragmented = True
+    if not moov:
+        return None
+    result = {'duration': 0.0, 'faststart': fragmented or mdat is None or moov[0] < mdat, 'tracks': []}
+    mvhd = _find(buf, moov[0], moov[1], b'mvhd')
+    if mvhd:
+        timescale, duration = _movie_header(buf, mvhd[0])
+        result['duration'] = duration / timescale if timescale else 0.0
+    for kind, payload, end in _boxes(buf, moov[0], moov[1]):
+        if kind != b'trak':
+            continue
+        track = {'handler': _handler(buf, (payload, end)), 'codec': None, 'duration': 0.0,
+                 'bytes': 0, 'width': 0, 'height': 0, 'rotation': 0}
+        mdia = _find(buf, payload, end, b'mdia')
+        if mdia:
+            mdhd = _find(buf, mdia[0], mdia[1], b'mdhd')
+            if mdhd:
+                timescale, duration = _media_header(buf, mdhd[0])
+                track['duration'] = duration / timescale if timescale else 0.0
+            stbl = _sample_table(buf, mdia)
+            if stbl:
+                track['codec'] = _codec(buf, stbl)
+                track['bytes'] = _sample_bytes(buf, stbl)
+        if track['handler'] == b'vide':
+            tkhd = _find(buf, payload, end, b'tkhd')
+            if tkhd:
+                track['width'], track['height'], track['rotation'] = _track_header(buf, tkhd[0])
+        result['tracks'].append(track)
+    return result
+
+
+def read_mp4_tracks(path: str) -> Optional[dict]:
+    """parse_mp4_tracks over an mmap of the file; None if it cannot be parsed."""
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return parse_mp4_tracks(buf)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+
+
+def read_mp4_info(path: str) -> Optional[dict]:
+    """
+    parse_mp4 over an mmap of the file.
+
+    'cover' is (offset, length) of the first cover image in the file; use
+    read_cover() to fetch its bytes. Returns None for files that are not
+    MP4 or cannot be parsed, so callers can fall back to mutagen.
+    """
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return parse_mp4(buf)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+
+
+def read_cover(path: str, cover: Tuple[int, int]) -> bytes:
+    offset, length = cover
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
@@ -0,0 +1,305 @@
+import os
+import errno
+import struct
+import asyncio
+import ctypes
+import ctypes.util
+from typing import Dict, List, Optional, Tuple
+
+from bot.logger import LOGGER
+from .content_hash import hash_enabled, hash_executor, hash_file, digest_matches
+
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# Control files rewritten by the bot itself; not content
+NO_HASH = ('config.yaml', 'manifest.json')
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (name follows)
+_libc = None
+
+
+def _inotify():
+    """libc handle with inotify support, or None (non-Linux, no libc)."""
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        except Exception:
+            _libc = False
+    return _libc or None
+
+
+def _under(path: str, folder: str) -> bool:
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+class OutputWatcher:
+    """
+    Live manifest of the files under one task's output root.
+
+    Files are recorded when the downloader closes them (IN_CLOSE_WRITE) or
+    moves them into place, and dropped when deleted, so discovery, sizing
+    and zipping read the manifest instead of walking the tree again. Where
+    inotify is unavailable every query falls back to a fresh os.walk.
+
+    Closed files are also hashed right away on the hash threads, while the
+    downloader fetches the next track and the data is still in the page
+    cache; digests outlive deletion so uploaded files keep theirs.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.manifest: Dict[str, Tuple[int, float]] = {}
+        self.digests: Dict[str, dict] = {}
+        self._hashing: Dict[str, asyncio.Future] = {}
+        self._fd: Optional[int] = None
+        self._dirs: Dict[int, str] = {}
+        self._reader = False
+
+    @property
+    def live(self) -> bool:
+        return self._fd is not None
+
+    def start(self):
+        libc = _inotify()
+        if libc:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+            else:
+                LOGGER.debug(f"inotify unavailable ({os.strerror(ctypes.get_errno())}); scanning {self.root}")
+        self._add_tree(self.root)
+        if self._fd is not None:
+            try:
+                asyncio.get_running_loop().add_reader(self._fd, self._drain)
+                self._reader = True
+            except RuntimeError:
+                # No running loop; queries drain the queue themselves
+                pass
+
+    def stop(self):
+        if self._fd is None:
+            return
+        if self._reader:
+            try:
+                asyncio.get_running_loop().remove_reader(self._fd)
+            except Exception:
+                pass
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+        self._fd = None
+        self._dirs.clear()
+
+    def _record(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.manifest.pop(path, None)
+            return
+        self.manifest[path] = (st.st_size, st.st_mtime)
+
+    def _forget(self, folder: str):
+        for path in [p for p in self.manifest if _under(p, folder)]:
+            del self.manifest[path]
+
+    def _watch(self, folder: str):
+        if self._fd is None:
+            return
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOENT:
+                return
+            # Out of watches or similar: degrade to scanning for this task
+            LOGGER.error(f"inotify watch failed for {folder}: {os.strerror(err)}; falling back to scanning")
+            self.stop()
+            return
+        self._dirs[wd] = folder
+
+    def _add_tree(self, folder: str):
+        """Watch a directory tree and record the files already in it."""
+        for root, _, files in os.walk(folder):
+            # Watch before listing so nothing created in between is missed
+            self._watch(root)
+            for name in files:
+                self._record(os.path.join(root, name))
+
+    def _rescan(self):
+        self.manifest.clear()
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                self._record(os.path.join(root, name))
+
+    def _drain(self):
+        """Apply all queued inotify events to the manifest."""
+        while self._fd is not None:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                LOGGER.error(f"inotify read failed for {self.root}: {str(e)}")
+                self.stop()
+                return
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                offset += _EVENT.size + length
+                self._apply(wd, mask, os.fsdecode(name))
+
+    def _apply(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            LOGGER.debug(f"inotify queue overflow for {self.root}; rescanning")
+            self._rescan()
+            return
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return
+        folder = self._dirs.get(wd)
+        if folder is None or not name:
+            return
+        path = os.path.join(folder, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._forget(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self._record(path)
+            self._schedule_hash(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.manifest.pop(path, None)
+
+    def _schedule_hash(self, path: str):
+        if not hash_enabled() or path.endswith('.tmp') or os.path.basename(path) in NO_HASH:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        future = loop.run_in_executor(hash_executor(), hash_file, path)
+        self._hashing[path] = future
+        future.add_done_callback(lambda f, p=path: self._hashed(p, f))
+
+    def _hashed(self, path: str, future: asyncio.Future):
+        if self._hashing.get(path) is future:
+            del self._hashing[path]
+        if future.cancelled() or future.exception():
+            return
+        digest = future.result()
+        # A rewrite while hashing leaves a stale digest; the next close rehashes
+        if digest_matches(digest, path):
+            self.digests[path] = digest
+
+    def cached_digest(self, path: str) -> Optional[dict]:
+        """Digest computed so far for path, without reading the file."""
+        digest = self.digests.get(os.path.abspath(path))
+        return digest if digest_matches(digest, path) else None
+
+    async def digest(self, path: str) -> Optional[dict]:
+        """Digest of a file under the root, waiting for or computing it as needed."""
+        path = os.path.abspath(path)
+        self.sync()
+        pending = self._hashing.get(path)
+        if pending:
+            try:
+                await pending
+            except Exception:
+                pass
+        digest = self.cached_digest(path)
+        if digest or not os.path.exists(path):
+            return digest
+        try:
+            digest = await asyncio.get_running_loop().run_in_executor(hash_executor(), hash_file, path)
+        except OSError:
+            return None
+        self.digests[path] = digest
+        return digest
+
+    def sync(self):
+        """Bring the manifest up to date before a query."""
+        if self._fd is not None:
+            self._drain()
+        else:
+            self._rescan()
+
+    def entries(self, folder: str | None = None, extensions: tuple | None = None) -> List[Tuple[str, int]]:
+        """(path, size) of files under folder (default: the whole root), sorted by path."""
+        self.sync()
+        folder = os.path.abspath(folder) if folder else self.root
+        exts = tuple(e.lower() for e in extensions) if extensions else None
+        return sorted(
+            (path, size) for path, (size, _) in self.manifest.items()
+            if _under(path, folder) and (not exts or path.lower().endswith(exts))
+        )
+
+
+_watchers: Dict[str, OutputWatcher] = {}
+
+
+def watch_output(root: str) -> OutputWatcher:
+    """Start (or return) the watcher for a task output root."""
+    root = os.path.abspath(root)
+    watcher = _watchers.get(root)
+    if watcher is None:
+        watcher = OutputWatcher(root)
+        watcher.start()
+        _watchers[root] = watcher
+    return watcher
+
+
+def unwatch_output(root: str):
+    watcher = _watchers.pop(os.path.abspath(root), None)
+    if watcher:
+        watcher.stop()
+
+
+def find_watcher(path: str) -> Optional[OutputWatcher]:
+    """Watcher whose root contains path, if any."""
+    path = os.path.abspath(path)
+    for root, watcher in _watchers.items():
+        if _under(path, root):
+            return watcher
+    return None
+
+
+def scan_files(folder: str, extensions: tuple | None = None) -> List[Tuple[str, int]]:
+    """
+    (path, size) of every file under folder.
+
+    Served from the task's live manifest when the folder is watched,
+    otherwise from a single os.walk.
+    """
+    watcher = find_watcher(folder)
+    if watcher:
+        return watcher.entries(folder, extensions)
+    exts = tuple(e.lower() for e in extensions) if extensions else None
+    result = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if exts and not name.lower().endswith(exts):
+                continue
+            path = os.path.join(root, name)
+            try:
+                result.append((path, os.path.getsize(path)))
+            except OSError:
+                continue
+    return result
@@ -13,6 +13,8 @@ class ProgressReporter:
         self.msg = msg
         self.label = label
         self.stage: str = "Preparing"
+        # Pre-flight summary (size, duration, ETA), if the catalog was resolved
+        self.estimate: Optional[str] = None
 
         self.download_percent: int = 0
         self.tracks_done: int = 0
@@ -96,6 +98,8 @@ class ProgressReporter:
             "Done": "✅",
         }
         lines.append(f"{stage_emoji.get(self.stage, '🔄')} {self.label} • {self.stage}")
+        if self.estimate:
+            lines.append(f"📐 {self.estimate}")
 
         # Optional system stats line
         if self._show_system_stats:
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+from typing import List, Optional
+
+from bot.logger import LOGGER
+from .downloader_output import TrackManifest
+from .content_hash import file_digest
+from .lazy_metadata import LazyMetadata
+
+
+# Written into the task root next to the downloader's config.yaml
+MANIFEST_FILE = 'manifest.json'
+MEDIA_EXTENSIONS = ('.m4a', '.flac', '.alac', '.mp4', '.m4v', '.mov')
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'[\W_]+', '', text.lower())
+
+
+def _matches(title: str, path: str) -> bool:
+    """Whether a catalog title plausibly names a file (the downloader names files after songs)."""
+    title = _normalize(title)[:12]
+    return not title or title in _normalize(os.path.basename(path))
+
+
+async def build_manifest(root: str, tracks: TrackManifest, plan) -> list:
+    """
+    Manifest entries of a downloader run.
+
+    The downloader announces every track it writes ("Track n of N"), so the
+    files created while a track was current are that track's; the catalog
+    plan resolved before the download has its tags. Files whose name does
+    not match the catalog title are left out and get parsed instead. Each
+    entry also carries the content hash and CRC-32 computed while the file
+    was being written, so later consumers never re-read it for them.
+    """
+    entries = []
+    catalog = {track.number: track for track in plan.tracks} if plan else {}
+    for position, files in sorted(tracks.files.items()):
+        track = catalog.get(position)
+        if not track:
+            continue
+        for path, size in files:
+            if not path.endswith(MEDIA_EXTENSIONS) or not _matches(track.title, path):
+                continue
+            entries.append({
+                'path': os.path.relpath(path, root),
+                'size': size,
+                'position': position,
+                'title': track.title,
+                'artist': track.artist or plan.artist,
+                'album': track.album or plan.title,
+                'tracknumber': track.track_number,
+                'duration': int(track.duration)
+            })
+            digest = await file_digest(path)
+            if digest:
+                entries[-1].update({'hash': f"{digest['algo']}:{digest['hash']}", 'crc32': digest['crc32']})
+    return entries
+
+
+def write_manifest(root: str, entries: list):
+    path = os.path.join(root, MANIFEST_FILE)
+    try:
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'items': entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        LOGGER.error(f"Could not write {path}: {str(e)}")
+
+
+def load_manifest(root: str) -> Optional[list]:
+    """Entries of the task root's manifest (ours, restored from the download cache, or the downloader's)"""
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return list(json.load(f).get('items', []))
+    except (OSError, ValueError, AttributeError) as e:
+        LOGGER.error(f"Ignoring unreadable {path}: {str(e)}")
+        return None
+
+
+def manifest_items(root: str, files: List[str], entries: list, provider: str) -> list:
+    """
+    Lazy item metadata for files, in order, with tags from the manifest.
+
+    Files without a valid entry are parsed on demand like any other item.
+    Listed files of one album folder share a cover group, so at most one of
+    them is read when an upload needs the cover art.
+    """
+    by_path = {os.path.join(root, entry['path']): entry for entry in entries if entry.get('path')}
+    items = []
+    for file_path in files:
+        entry = by_path.get(file_path)
+        try:
+            valid = bool(entry) and os.path.getsize(file_path) == entry.get('size')
+        except OSError:
+            valid = False
+        if not valid:
+            items.append(LazyMetadata(file_path, provider))
+            continue
+        known = {
+            'title': entry.get('title') or 'Unknown',
+            'artist': entry.get('artist') or 'Unknown Artist',
+            'album': entry.get('album') or 'Unknown Album',
+            'tracknumber': entry.get('tracknumber', ''),
+            'duration': int(entry.get('duration') or 0)
+        }
+        items.append(LazyMetadata(file_path, provider, known, cover_group=(os.path.dirname(file_path), known['album'])))
+    listed = sum(1 for item in items if item.cover_group is not None)
+    LOGGER.info(f"Manifest: tags of {listed} of {len(files)} file(s) known without reading them")
+    return items
@@ -2,6 +2,7 @@ import asyncio
 import uuid
 from typing import Dict, Optional, List, Callable, Any, Tuple
 
+from config import Config
 from bot.logger import LOGGER
 
 
@@ -16,6 +17,9 @@ class TaskState:
         self.status: str = "running"
         # Optional progress reporter instance
         self.progress = None
+        # Downloader stall watchdog counters
+        self.stalls = 0
+        self.restarts = 0
 
 
 class TaskManager:
@@ -48,6 +52,16 @@ class TaskManager:
             if state:
                 state.subprocess = None
 
+    async def record_stall(self, task_id: str, restarted: bool):
+        """Count a downloader stall (and whether it was restarted) on the task"""
+        async with self._lock:
+            state = self._tasks.get(task_id)
+            if state:
+                state.stalls += 1
+                if restarted:
+                    state.restarts += 1
+                LOGGER.info(f"Task {task_id}: downloader stalled ({state.stalls} stall(s), {state.restarts} restart(s))")
+
     async def attach_progress(self, task_id: str, reporter):
         """Attach a progress reporter instance to a task"""
         async with self._lock:
@@ -134,7 +148,9 @@ class TaskManager:
                     except Exception:
                         pass
 
-        asyncio.get_event_loop().create_task(_worker_loop())
+        # Tasks use isolated output roots, so several queue workers can run side by side
+        for _ in range(max(1, Config.QUEUE_WORKERS)):
+            asyncio.get_event_loop().create_task(_worker_loop())
 
     async def enqueue(self, user_id: int, link: str, options: Dict[str, Any], job_coro_factory: Callable[[], Any]) -> Tuple[str, int]:
         """Enqueue a job with metadata, return (queue_id, position)."""
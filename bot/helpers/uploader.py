@@ -1,9 +1,17 @@
 import os
+import html
 import shutil
 import zipfile
 import asyncio
 from config import Config
-from bot.helpers.utils import create_apple_zip, format_string, send_message, edit_message, zip_handler, MAX_SIZE
+from bot.helpers.utils import apple_zip_name, create_apple_zip, format_string, send_message, edit_message, zip_handler, upload_limit, extract_apple_metadata, list_apple_output_files, probe_video_file
+from bot.helpers.downloader_output import DownloaderEvent, TrackManifest
+from bot.helpers.output_watcher import scan_files
+from bot.helpers.metadata_reader import is_shared_cover
+from bot.helpers.lazy_metadata import load_metadata
+from bot.helpers.delivery_cache import already_delivered, remember_upload
+from bot.helpers.zip_plan import plan_zip_parts
+from bot.helpers.zip_stream import MEMBER_OVERHEAD, ARCHIVE_OVERHEAD, StreamingZip, rclone_zip_enabled, stream_enabled, stream_zip_parts
 from bot.logger import LOGGER
 from mutagen import File
 from mutagen.mp4 import MP4
@@ -13,6 +21,20 @@ from bot.helpers.progress import ProgressReporter
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from ..helpers.state import conversation_state
 
+# Bytes per write into rclone rcat's stdin
+RCAT_CHUNK = 4 * 1024 * 1024
+
+def _upload_base_path(user: dict, path: str) -> str:
+    """Local root that remote paths are computed relative to."""
+    output_root = user.get('output_root')
+    if output_root and os.path.abspath(path).startswith(os.path.abspath(output_root)):
+        # Per-task root: remote layout stays alac/<artist>/<album>/...
+        return output_root
+    if "Apple Music" in path:
+        return os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
+    return Config.LOCAL_STORAGE
+
+
 async def track_upload(metadata, user, index: int = None, total: int = None):
     """
     Upload a single track
@@ -22,28 +44,30 @@ async def track_upload(metadata, user, index: int = None, total: int = None):
         index: Optional file index for progress display
         total: Optional total files for progress display
     """
-    # Determine base path for different providers
-    if "Apple Music" in metadata['filepath']:
-        base_path = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-    else:
-        base_path = Config.LOCAL_STORAGE
+    # Determine base path for remote (rclone) paths
+    base_path = _upload_base_path(user, metadata['filepath'])
+    # Parse only what this upload mode reads
+    await load_metadata([metadata])
     
-    if bot_set.upload_mode == 'Telegram':
+    if bot_set.upload_mode == 'Telegram' and already_delivered(user, metadata['filepath']):
+        pass  # Sent by a cache replay that failed on a later item
+    elif bot_set.upload_mode == 'Telegram':
         reporter = user.get('progress')
         if reporter:
             await reporter.set_stage("Uploading")
-        await send_message(
+        caption = await format_string(
+            "🎵 **{title}**\n👤 {artist}\n🎧 {provider}",
+            {
+                'title': metadata['title'],
+                'artist': metadata['artist'],
+                'provider': metadata.get('provider', 'Apple Music')
+            }
+        )
+        msg = await send_message(
             user,
             metadata['filepath'],
             'audio',
-            caption=await format_string(
-                "🎵 **{title}**\n👤 {artist}\n🎧 {provider}",
-                {
-                    'title': metadata['title'],
-                    'artist': metadata['artist'],
-                    'provider': metadata.get('provider', 'Apple Music')
-                }
-            ),
+            caption=caption,
             meta={
                 'duration': metadata['duration'],
                 'artist': metadata['artist'],
@@ -56,6 +80,7 @@ async def track_upload(metadata, user, index: int = None, total: int = None):
             total_files=total,
             cancel_event=user.get('cancel_event')
         )
+        remember_upload(user, msg, metadata['filepath'], caption)
     elif bot_set.upload_mode == 'RCLONE':
         rclone_link, index_link, remote_info = await rclone_upload(user, metadata['filepath'], base_path)
         text = await format_string(
@@ -72,9 +97,9 @@ async def track_upload(metadata, user, index: int = None, total: int = None):
         await send_message(user, text)
         await _post_rclone_manage_button(user, remote_info)
     
-    # Cleanup
+    # Cleanup (shared album covers go with the task folder)
     os.remove(metadata['filepath'])
-    if metadata.get('thumbnail'):
+    if metadata.get('thumbnail') and not is_shared_cover(metadata['thumbnail']):
         os.remove(metadata['thumbnail'])
 
 async def music_video_upload(metadata, user):
@@ -84,30 +109,46 @@ async def music_video_upload(metadata, user):
         metadata: Video metadata
         user: User details
     """
-    # Determine base path for different providers
-    if "Apple Music" in metadata['filepath']:
-        base_path = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-    else:
-        base_path = Config.LOCAL_STORAGE
+    # Determine base path for remote (rclone) paths
+    base_path = _upload_base_path(user, metadata['filepath'])
+    # Parse only what this upload mode reads
+    await load_metadata([metadata])
     
-    if bot_set.upload_mode == 'Telegram':
+    if bot_set.upload_mode == 'Telegram' and already_delivered(user, metadata['filepath']):
+        pass  # Sent by a cache replay that failed on a later item
+    elif bot_set.upload_mode == 'Telegram':
         reporter = user.get('progress')
         if reporter:
             await reporter.set_stage("Uploading")
         # Decide media type based on setting
         send_type = 'doc' if getattr(bot_set, 'video_as_document', False) else 'video'
-        await send_message(
+        if send_type == 'video':
+            # Real dimensions and streamability, so Telegram need not re-probe the file
+            probe = await probe_video_file(metadata['filepath'])
+            if probe:
+                metadata.update({
+                    'width': probe['width'],
+                    'height': probe['height'],
+                    'duration': probe['duration'] or metadata.get('duration', 0),
+                    'supports_streaming': probe['supports_streaming']
+                })
+                LOGGER.debug(
+                    f"Video probe {os.path.basename(metadata['filepath'])}: {probe['width']}x{probe['height']} "
+                    f"{probe['codec']}/{probe['audio_codec']} {probe['bitrate'] // 1000} kbps"
+                )
+        caption = await format_string(
+            "🎬 **{title}**\n👤 {artist}\n🎧 {provider} Music Video",
+            {
+                'title': metadata['title'],
+                'artist': metadata['artist'],
+                'provider': metadata.get('provider', 'Apple Music')
+            }
+        )
+        msg = await send_message(
             user,
             metadata['filepath'],
             send_type,
-            caption=await format_string(
-                "🎬 **{title}**\n👤 {artist}\n🎧 {provider} Music Video",
-                {
-                    'title': metadata['title'],
-                    'artist': metadata['artist'],
-                    'provider': metadata.get('provider', 'Apple Music')
-                }
-            ),
+            caption=caption,
             meta=metadata,  # PASS METADATA HERE
             progress_reporter=reporter,
             progress_label="Uploading",
@@ -115,6 +156,7 @@ async def music_video_upload(metadata, user):
             total_files=1,
             cancel_event=user.get('cancel_event')
         )
+        remember_upload(user, msg, metadata['filepath'], caption)
     elif bot_set.upload_mode == 'RCLONE':
         rclone_link, index_link, remote_info = await rclone_upload(user, metadata['filepath'], base_path)
         text = await format_string(
@@ -131,20 +173,190 @@ async def music_video_upload(metadata, user):
         await send_message(user, text)
         await _post_rclone_manage_button(user, remote_info)
     
-    # Cleanup
+    # Cleanup (shared album covers go with the task folder)
     os.remove(metadata['filepath'])
-    if metadata.get('thumbnail'):
+    if metadata.get('thumbnail') and not is_shared_cover(metadata['thumbnail']):
         os.remove(metadata['thumbnail'])
 
-def _get_folder_size(folder_path: str) -> int:
-    total_size = 0
-    for root, _, files in os.walk(folder_path):
-        for f in files:
+class TrackUploadPipeline:
+    """
+    Upload tracks of an album/playlist while the downloader is still running.
+
+    Only files of tracks the downloader reported as finished (recorded in the
+    task's TrackManifest) are queued, so a track that fails halfway is never
+    uploaded; its retry is. A single consumer reads their metadata and
+    uploads them in order, overlapping upload with the rest of the download.
+    Failed uploads do not stop the others; finish() raises them at the end.
+    """
+
+    def __init__(self, user: dict, paths: dict, provider: str = 'apple', on_file=None, on_discard=None,
+                 manifest: TrackManifest | None = None):
+        self.user = user
+        self.paths = paths
+        self.provider = provider
+        # Called with each finished file before it is uploaded (and deleted)
+        self.on_file = on_file
+        # Called with paths the downloader deleted before a retry
+        self.on_discard = on_discard
+        self.manifest = manifest
+        self.total = None
+        self.items = []
+        self.failures = []
+        self._seen = set()
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._consume())
+
+    async def on_event(self, event):
+        """run_apple_downloader event hook."""
+        if event.kind == DownloaderEvent.TOTAL:
+            self.total = event.total
+        elif event.kind == DownloaderEvent.TRACK_FINISHED:
+            self._collect()
+        elif event.kind == DownloaderEvent.FILES_DISCARDED:
+            # Deleted for a retry; the re-downloaded file at the same path is new
+            self._seen.difference_update(event.paths)
+            if self.on_discard:
+                self.on_discard(event.paths)
+
+    def _collect(self, final: bool = False):
+        """Queue new files of finished tracks"""
+        finished = {path for files in self.manifest.files.values() for path, _ in files} if self.manifest else set()
+        # No track was ever announced: after a successful run everything is complete
+        take_all = final and not finished
+        for path in sorted(list_apple_output_files(paths=self.paths)):
+            if path not in self._seen and (take_all or path in finished):
+                self._seen.add(path)
+                self._queue.put_nowait(path)
+
+    async def finish(self) -> list:
+        """
+        Queue whatever is left after a successful run and wait for the uploads
+        Returns:
+            Item metadata of the uploaded files
+        Raises:
+            RuntimeError: if any file failed to upload (the rest were still sent)
+        """
+        self._collect(final=True)
+        self._queue.put_nowait(None)
+        await self._task
+        if self.failures:
+            names = ', '.join(os.path.basename(path) for path, _ in self.failures)
+            raise RuntimeError(f"{len(self.failures)} track(s) failed to upload: {names}")
+        return self.items
+
+    async def abort(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
             try:
-                total_size += os.path.getsize(os.path.join(root, f))
-            except Exception:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _consume(self):
+        while True:
+            path = await self._queue.get()
+            if path is None:
+                break
+            if self.on_file:
+                self.on_file(path)
+            try:
+                metadata = await extract_apple_metadata(path)
+                metadata['filepath'] = path
+                metadata['provider'] = self.provider
+            except Exception as e:
+                LOGGER.error(f"Metadata extraction failed for {path}: {str(e)}")
+                self.failures.append((path, str(e)))
                 continue
-    return total_size
+            self.items.append(metadata)
+            total = max(self.total or 0, len(self._seen)) or None
+            try:
+                if path.endswith(('.mp4', '.m4v', '.mov')):
+                    await music_video_upload(metadata, self.user)
+                else:
+                    await track_upload(metadata, self.user, index=len(self.items), total=total)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.error(f"Pipelined upload failed for {path}: {str(e)}")
+                self.failures.append((path, str(e)))
+
+
+def _get_folder_size(folder_path: str) -> int:
+    return sum(size for _, size in scan_files(folder_path))
+
+
+async def _zip_streams(metadata: dict, limit=None) -> list:
+    """Streaming zip parts of a content folder, named like create_apple_zip's"""
+    folder = metadata['folderpath']
+    return await stream_zip_parts(scan_files(folder), folder, apple_zip_name(metadata), limit)
+
+
+def _zip_path(zp, metadata: dict) -> str:
+    """Path of a zip part (streams are named as if written next to the content folder)"""
+    if isinstance(zp, StreamingZip):
+        return os.path.join(os.path.dirname(metadata['folderpath']), zp.name)
+    return zp
+
+
+def _drop_zip(zp):
+    """Release a zip part: a file on disk, or a stream's open handles"""
+    if isinstance(zp, StreamingZip):
+        zp.close()
+        return
+    try:
+        os.remove(zp)
+    except Exception:
+        pass
+
+
+def _zip_uploaded(user: dict, msg, zp, metadata: dict, caption: str):
+    """Record a sent zip part and drop it"""
+    remember_upload(user, msg, _zip_path(zp, metadata), caption)
+    _drop_zip(zp)
+
+
+async def _report_oversized(user: dict, metadata: dict, limit: float):
+    """Tell the user about files too large for any zip part; the zips leave them out"""
+    folder = metadata['folderpath']
+    oversized = plan_zip_parts(scan_files(folder), folder, limit, MEMBER_OVERHEAD, ARCHIVE_OVERHEAD).oversized
+    if not oversized:
+        return
+    names = "\n".join(f"• {html.escape(os.path.relpath(path, folder))} ({size / 1024 ** 3:.2f} GB)" for path, size in oversized)
+    await send_message(user, f"⚠️ Skipped {len(oversized)} file(s) over the {limit / 1024 ** 3:.2f} GB upload limit:\n{names}")
+    recorder = user.get('delivery')
+    if recorder:
+        # Not a complete delivery; do not replay it from the file_id cache
+        recorder.failed = True
+
+
+async def _rclone_content_upload(user: dict, metadata: dict, base_path: str, zipped: bool):
+    """
+    rclone_upload of a content folder. With RCLONE_ZIP on and its zip setting
+    on, one zip is uploaded instead (streamed when ZIP_STREAM allows, else
+    written next to the folder first).
+    """
+    if not (zipped and rclone_zip_enabled()) or not scan_files(metadata['folderpath']):
+        return await rclone_upload(user, metadata['folderpath'], base_path)
+    if stream_enabled():
+        stream = (await _zip_streams(metadata))[0]
+        try:
+            return await rclone_upload(user, _zip_path(stream, metadata), base_path, stream=stream)
+        finally:
+            stream.close()
+    zip_path = await create_apple_zip(
+        metadata['folderpath'],
+        user['user_id'],
+        metadata,
+        progress=user.get('progress'),
+        cancel_event=user.get('cancel_event')
+    )
+    try:
+        return await rclone_upload(user, zip_path, base_path)
+    finally:
+        _drop_zip(zip_path)
 
 
 async def album_upload(metadata, user):
@@ -154,21 +366,24 @@ async def album_upload(metadata, user):
         metadata: Album metadata
         user: User details
     """
-    # Determine base path for different providers
-    if "Apple Music" in metadata['folderpath']:
-        base_path = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-    else:
-        base_path = Config.LOCAL_STORAGE
+    # Determine base path for remote (rclone) paths
+    base_path = _upload_base_path(user, metadata['folderpath'])
     
     if bot_set.upload_mode == 'Telegram':
         reporter = user.get('progress')
         if bot_set.album_zip:
             # Decide zipping strategy based on folder size and Telegram limits
             total_size = _get_folder_size(metadata['folderpath'])
+            # Largest part Telegram accepts from the bot
+            limit = upload_limit()
+            await _report_oversized(user, metadata, limit)
             zip_paths = []
-            if total_size > MAX_SIZE:
+            if stream_enabled():
+                # Laid out from the downloaded files; nothing is written to disk
+                zip_paths = await _zip_streams(metadata, limit)
+            elif total_size > limit:
                 # Split into multiple zips for Telegram
-                z = await zip_handler(metadata['folderpath'])
+                z = await zip_handler(metadata['folderpath'], limit)
                 zip_paths = z if isinstance(z, list) else [z]
             else:
                 # Single descriptive zip with progress
@@ -193,7 +408,10 @@ async def album_upload(metadata, user):
             
             total_parts = len(zip_paths)
             for idx, zp in enumerate(zip_paths, start=1):
-                await send_message(
+                if already_delivered(user, _zip_path(zp, metadata)):
+                    _drop_zip(zp)
+                    continue
+                msg = await send_message(
                     user,
                     zp,
                     'doc',
@@ -203,19 +421,17 @@ async def album_upload(metadata, user):
                     file_index=idx,
                     total_files=total_parts
                 )
-                # Clean up zip file after upload
-                try:
-                    os.remove(zp)
-                except Exception:
-                    pass
+                _zip_uploaded(user, msg, zp, metadata, caption)
         else:
             # Upload tracks individually
             tracks = metadata.get('tracks') or metadata.get('items', [])
             total_tracks = len(tracks)
+            # One pooled pass for the whole list instead of one per track
+            await load_metadata(tracks)
             for idx, track in enumerate(tracks, start=1):
                 await track_upload(track, user, index=idx, total=total_tracks)
     elif bot_set.upload_mode == 'RCLONE':
-        rclone_link, index_link, remote_info = await rclone_upload(user, metadata['folderpath'], base_path)
+        rclone_link, index_link, remote_info = await _rclone_content_upload(user, metadata, base_path, bot_set.album_zip)
         text = await format_string(
             "💿 **{album}**\n👤 {artist}\n🎧 {provider}\n🔗 [Direct Link]({r_link})",
             {
@@ -244,20 +460,23 @@ async def artist_upload(metadata, user):
         metadata: Artist metadata
         user: User details
     """
-    # Determine base path for different providers
-    if "Apple Music" in metadata['folderpath']:
-        base_path = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-    else:
-        base_path = Config.LOCAL_STORAGE
+    # Determine base path for remote (rclone) paths
+    base_path = _upload_base_path(user, metadata['folderpath'])
     
     if bot_set.upload_mode == 'Telegram':
         reporter = user.get('progress')
         if bot_set.artist_zip:
             # Decide zipping strategy based on size
             total_size = _get_folder_size(metadata['folderpath'])
+            # Largest part Telegram accepts from the bot
+            limit = upload_limit()
+            await _report_oversized(user, metadata, limit)
             zip_paths = []
-            if total_size > MAX_SIZE:
-                z = await zip_handler(metadata['folderpath'])
+            if stream_enabled():
+                # Laid out from the downloaded files; nothing is written to disk
+                zip_paths = await _zip_streams(metadata, limit)
+            elif total_size > limit:
+                z = await zip_handler(metadata['folderpath'], limit)
                 zip_paths = z if isinstance(z, list) else [z]
             else:
                 zip_path = await create_apple_zip(
@@ -280,7 +499,10 @@ async def artist_upload(metadata, user):
             
             total_parts = len(zip_paths)
             for idx, zp in enumerate(zip_paths, start=1):
-                await send_message(
+                if already_delivered(user, _zip_path(zp, metadata)):
+                    _drop_zip(zp)
+                    continue
+                msg = await send_message(
                     user,
                     zp,
                     'doc',
@@ -290,10 +512,7 @@ async def artist_upload(metadata, user):
                     file_index=idx,
                     total_files=total_parts
                 )
-                try:
-                    os.remove(zp)
-                except Exception:
-                    pass
+                _zip_uploaded(user, msg, zp, metadata, caption)
         else:
             # Upload albums or tracks individually
             if 'albums' in metadata:
@@ -302,10 +521,11 @@ async def artist_upload(metadata, user):
             else:
                 tracks = metadata.get('tracks') or metadata.get('items', [])
                 total_tracks = len(tracks)
+                await load_metadata(tracks)
                 for idx, track in enumerate(tracks, start=1):
                     await track_upload(track, user, index=idx, total=total_tracks)
     elif bot_set.upload_mode == 'RCLONE':
-        rclone_link, index_link, remote_info = await rclone_upload(user, metadata['folderpath'], base_path)
+        rclone_link, index_link, remote_info = await _rclone_content_upload(user, metadata, base_path, bot_set.artist_zip)
         text = await format_string(
             "🎤 **{artist}**\n🎧 {provider} Discography\n🔗 [Direct Link]({r_link})",
             {
@@ -329,20 +549,23 @@ async def playlist_upload(metadata, user):
         metadata: Playlist metadata
         user: User details
     """
-    # Determine base path for different providers
-    if "Apple Music" in metadata['folderpath']:
-        base_path = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-    else:
-        base_path = Config.LOCAL_STORAGE
+    # Determine base path for remote (rclone) paths
+    base_path = _upload_base_path(user, metadata['folderpath'])
     
     if bot_set.upload_mode == 'Telegram':
         reporter = user.get('progress')
         if bot_set.playlist_zip:
             # Decide zipping strategy based on size
             total_size = _get_folder_size(metadata['folderpath'])
+            # Largest part Telegram accepts from the bot
+            limit = upload_limit()
+            await _report_oversized(user, metadata, limit)
             zip_paths = []
-            if total_size > MAX_SIZE:
-                z = await zip_handler(metadata['folderpath'])
+            if stream_enabled():
+                # Laid out from the downloaded files; nothing is written to disk
+                zip_paths = await _zip_streams(metadata, limit)
+            elif total_size > limit:
+                z = await zip_handler(metadata['folderpath'], limit)
                 zip_paths = z if isinstance(z, list) else [z]
             else:
                 # Create descriptive zip file
@@ -367,7 +590,10 @@ async def playlist_upload(metadata, user):
             
             total_parts = len(zip_paths)
             for idx, zp in enumerate(zip_paths, start=1):
-                await send_message(
+                if already_delivered(user, _zip_path(zp, metadata)):
+                    _drop_zip(zp)
+                    continue
+                msg = await send_message(
                     user,
                     zp,
                     'doc',
@@ -377,18 +603,17 @@ async def playlist_upload(metadata, user):
                     file_index=idx,
                     total_files=total_parts
                 )
-                try:
-                    os.remove(zp)
-                except Exception:
-                    pass
+                _zip_uploaded(user, msg, zp, metadata, caption)
         else:
             # Upload tracks individually
             tracks = metadata.get('tracks') or metadata.get('items', [])
             total_tracks = len(tracks)
+            # One pooled pass for the whole list instead of one per track
+            await load_metadata(tracks)
             for idx, track in enumerate(tracks, start=1):
                 await track_upload(track, user, index=idx, total=total_tracks)
     elif bot_set.upload_mode == 'RCLONE':
-        rclone_link, index_link, remote_info = await rclone_upload(user, metadata['folderpath'], base_path)
+        rclone_link, index_link, remote_info = await _rclone_content_upload(user, metadata, base_path, bot_set.playlist_zip)
         text = await format_string(
             "🎵 **{title}**\n👤 Curated by {artist}\n🎧 {provider} Playlist\n🔗 [Direct Link]({r_link})",
             {
@@ -406,13 +631,14 @@ async def playlist_upload(metadata, user):
     # Cleanup
     shutil.rmtree(metadata['folderpath'])
 
-async def rclone_upload(user, path, base_path):
+async def rclone_upload(user, path, base_path, stream: StreamingZip | None = None):
     """
     Upload files via Rclone
     Args:
         user: User details
         path: File or folder path
         base_path: Base path used to compute relative path for remote
+        stream: Streaming zip to upload as path, which does not exist locally
     """
     # Ensure destination is configured
     dest_root = (getattr(bot_set, 'rclone_dest', None) or Config.RCLONE_DEST)
@@ -449,7 +675,11 @@ async def rclone_upload(user, path, base_path):
     scope = getattr(bot_set, 'rclone_copy_scope', 'FILE').upper()
     is_directory = os.path.isdir(abs_path)
 
-    if scope == 'FOLDER':
+    if stream is not None:
+        # A single remote file, whatever the scope
+        relative_path = _compute_relative(abs_path, base_path)
+        is_directory = False
+    elif scope == 'FOLDER':
         # Resolve the root folder we should copy
         if is_directory:
             source_for_copy = abs_path
@@ -474,20 +704,24 @@ async def rclone_upload(user, path, base_path):
             dest_path = f"{dest_root}/{parent_dir}".rstrip("/")
 
     # 1) Copy source to remote destination
-    copy_cmd = f'rclone copy --config ./rclone.conf "{source_for_copy}" "{dest_path}"'
-    copy_task = await asyncio.create_subprocess_shell(
-        copy_cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    copy_stdout, copy_stderr = await copy_task.communicate()
-    if copy_task.returncode != 0:
-        try:
-            LOGGER.debug(f"Rclone copy failed: {copy_stderr.decode().strip()}")
-        except Exception:
-            pass
-        # Even if copy fails, return None links so caller can handle gracefully
-        return None, None, None
+    if stream is not None:
+        if not await _rclone_rcat(stream, f"{dest_root}/{relative_path}"):
+            return None, None, None
+    else:
+        copy_cmd = f'rclone copy --config ./rclone.conf "{source_for_copy}" "{dest_path}"'
+        copy_task = await asyncio.create_subprocess_shell(
+            copy_cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        copy_stdout, copy_stderr = await copy_task.communicate()
+        if copy_task.returncode != 0:
+            try:
+                LOGGER.debug(f"Rclone copy failed: {copy_stderr.decode().strip()}")
+            except Exception:
+                pass
+            # Even if copy fails, return None links so caller can handle gracefully
+            return None, None, None
 
     # 2) Build links
     rclone_link = None
@@ -544,6 +778,39 @@ async def rclone_upload(user, path, base_path):
 
     return rclone_link, index_link, remote_info
 
+async def _rclone_rcat(stream: StreamingZip, dest: str) -> bool:
+    """Pipe a streaming zip into rclone rcat; the size lets rclone pick a normal (non-streamed) upload"""
+    rcat_task = await asyncio.create_subprocess_exec(
+        'rclone', 'rcat', '--config', './rclone.conf', '--size', str(stream.size), dest,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    loop = asyncio.get_running_loop()
+    stream.seek(0)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, stream.read, RCAT_CHUNK)
+            if not chunk:
+                break
+            rcat_task.stdin.write(chunk)
+            await rcat_task.stdin.drain()
+    except (OSError, ConnectionResetError) as e:
+        # A member changed on disk, or rclone exited early
+        LOGGER.error(f"Rclone rcat of {stream.name} aborted: {str(e)}")
+        rcat_task.kill()
+        await rcat_task.wait()
+        return False
+    rcat_task.stdin.close()
+    _, rcat_stderr = await rcat_task.communicate()
+    if rcat_task.returncode != 0:
+        try:
+            LOGGER.debug(f"Rclone rcat failed: {rcat_stderr.decode().strip()}")
+        except Exception:
+            pass
+        return False
+    return True
+
 async def _post_rclone_manage_button(user, remote_info: dict):
     try:
         # Seed conversation state for manage flow. Use a unique token so older buttons continue to work.
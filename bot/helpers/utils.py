@@ -7,17 +7,30 @@ import zipfile
 import re
 import subprocess
 import json
-import base64
 import time
-import mutagen
-from mutagen.mp4 import MP4
+import signal
 from pathlib import Path
 from urllib.parse import quote
 from aiohttp import ClientTimeout
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pyrogram.errors import FloodWait
-from typing import Optional
+from typing import List, Optional
 from .progress import ProgressReporter
+from .downloader_pool import downloader_pool, WorkerJob
+from .downloader_output import DownloaderOutputParser, DownloaderEvent, TrackManifest
+from .output_watcher import scan_files, unwatch_output, find_watcher
+from .metadata_cache import metadata_cache
+from .metadata_reader import (
+    read_audio_metadata, read_video_metadata, read_apple_metadata,
+    read_apple_metadata_batch, extract_cover_art, default_metadata, COVER_STORE
+)
+from .video_probe import probe_video
+from .zip_policy import CompressionPolicy
+from .zip_deflate import deflate_file
+from .zip_stream import ZIP_DEFLATED, StreamingZip, ZipMember, zip_member, MEMBER_OVERHEAD, ARCHIVE_OVERHEAD
+from .zip_plan import plan_zip_parts
 
 # Import Config for Apple Music settings
 from config import Config
@@ -30,6 +43,18 @@ from .message import send_message, edit_message
 
 MAX_SIZE = 1.9 * 1024 * 1024 * 1024  # 2GB
 
+
+def upload_limit() -> float:
+    """
+    Largest file the bot may send (bots never have premium's 4GB limit)
+    Returns:
+        Bytes; ZIP_PART_SIZE (MB) lowers it, never raises it
+    """
+    limit = MAX_SIZE
+    if Config.ZIP_PART_SIZE:
+        limit = min(limit, Config.ZIP_PART_SIZE * 1024 * 1024)
+    return limit
+
 async def download_file(url, path, retries=3, timeout=30, cancel_event: asyncio.Event | None = None):
     """
     Download a file with retry logic, timeout, and cooperative cancellation
@@ -192,69 +217,55 @@ async def create_link(path, basepath):
     return rclone_link, index_link
 
 
-async def zip_handler(folderpath):
+async def zip_handler(folderpath, limit: float | None = None):
     """
     Zip folder based on upload mode
     Args:
         folderpath: Path to folder
+        limit: Largest zip part for Telegram (default upload_limit())
     Returns:
         List of zip paths
     """
     loop = asyncio.get_running_loop()
     with ThreadPoolExecutor() as pool:
         if bot_set.upload_mode == 'Telegram':
-            zips = await loop.run_in_executor(pool, split_zip_folder, folderpath)
+            # A watcher's manifest is read here (it belongs to the event loop); otherwise
+            # the folder walk happens in the pool along with planning and zipping
+            entries = scan_files(folderpath) if find_watcher(folderpath) else None
+            zips = await loop.run_in_executor(pool, split_zip_folder, folderpath, entries, limit or upload_limit())
         else:
             zips = await loop.run_in_executor(pool, zip_folder, folderpath)
         return zips
 
 
-def split_zip_folder(folderpath) -> list:
+def split_zip_folder(folderpath, entries: list | None = None, limit: float | None = None) -> list:
     """
     Split large folders into multiple zip files
     Args:
         folderpath: Path to folder
+        entries: Optional (path, size) list from scan_files
+        limit: Largest part size (default MAX_SIZE)
     Returns:
         List of zip file paths
     """
-    zip_paths = []
-    part_num = 1
-    current_size = 0
-    current_files = []
+    entries = entries if entries is not None else scan_files(folderpath)
+    plan = plan_zip_parts(entries, folderpath, limit or MAX_SIZE, MEMBER_OVERHEAD, ARCHIVE_OVERHEAD)
+    plan.report(os.path.basename(folderpath))
 
-    def add_to_zip(zip_name, files_to_add):
-        nonlocal part_num
+    zip_paths = []
+    for part_num, files in enumerate(plan.parts, start=1):
         if part_num == 1:
-            zip_path = f"{zip_name}.zip"
+            zip_path = f"{folderpath}.zip"
         else:
-            zip_path = f"{zip_name}.part{part_num}.zip"
+            zip_path = f"{folderpath}.part{part_num}.zip"
 
+        policy = CompressionPolicy()
         with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path, arcname in files_to_add:
-                zipf.write(file_path, arcname)
+            for file_path, _ in files:
+                policy.write(zipf, file_path, os.path.relpath(file_path, folderpath))
                 os.remove(file_path)  # Delete after zipping
-        return zip_path
-
-    for root, dirs, files in os.walk(folderpath):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_size = os.path.getsize(file_path)
-            arcname = os.path.relpath(file_path, folderpath)
-
-            # Start new zip if adding would exceed max size
-            if current_size + file_size > MAX_SIZE:
-                zip_paths.append(add_to_zip(folderpath, current_files))
-                part_num += 1
-                current_files = []
-                current_size = 0
-
-            # Add to current group
-            current_files.append((file_path, arcname))
-            current_size += file_size
-
-    # Create final zip with remaining files
-    if current_files:
-        zip_paths.append(add_to_zip(folderpath, current_files))
+        policy.report(zip_path)
+        zip_paths.append(zip_path)
 
     return zip_paths
 
@@ -269,12 +280,14 @@ def zip_folder(folderpath) -> str:
     """
     zip_path = f"{folderpath}.zip"
     
+    policy = CompressionPolicy()
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root, dirs, files in os.walk(folderpath):
             for file in files:
                 file_path = os.path.join(root, file)
-                zipf.write(file_path, os.path.relpath(file_path, folderpath))
+                policy.write(zipf, file_path, os.path.relpath(file_path, folderpath))
                 os.remove(file_path)
+    policy.report(zip_path)
     
     return zip_path
 
@@ -450,15 +463,20 @@ async def cleanup(user=None, metadata=None):
     
     if user:
         try:
-            # Clean up Apple Music directory
             apple_dir = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-            if os.path.exists(apple_dir):
+            output_root = user.get('output_root')
+            if output_root:
+                # Only this task's tree; other tasks of the same user may still be running
+                unwatch_output(output_root)
+                shutil.rmtree(output_root, ignore_errors=True)
+            elif os.path.exists(apple_dir):
+                # Clean up Apple Music directory
                 shutil.rmtree(apple_dir, ignore_errors=True)
-                # Remove parent user directory if now empty
-                user_dir = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']))
+            # Remove parent directories if now empty
+            for folder in (apple_dir, os.path.dirname(apple_dir)):
                 try:
-                    if os.path.isdir(user_dir) and not os.listdir(user_dir):
-                        os.rmdir(user_dir)
+                    if os.path.isdir(folder) and not os.listdir(folder):
+                        os.rmdir(folder)
                 except Exception:
                     pass
         except Exception as e:
@@ -480,36 +498,209 @@ async def cleanup(user=None, metadata=None):
             LOGGER.info(f"Temp dir cleanup error: {str(e)}")
 
 # Apple Music specific utilities
-async def run_apple_downloader(url: str, output_dir: str, options: list = None, user: dict = None, progress=None, task_id: str | None = None, cancel_event: asyncio.Event | None = None) -> dict:
+async def run_apple_downloader(url: str, output_dir: str, options: list = None, user: dict = None, progress=None, task_id: str | None = None, cancel_event: asyncio.Event | None = None, on_event=None, manifest: TrackManifest | None = None) -> dict:
     """
-    Execute Apple Music downloader script.
+    Execute Apple Music downloader, on a pooled worker when available.
+
+    A watchdog kills the downloader's process tree when it produces no output
+    for DOWNLOADER_STALL_TIMEOUT seconds and retries with exponential backoff,
+    up to DOWNLOADER_STALL_RETRIES times. When an album/playlist run fails or
+    finishes with tracks missing, only the missing tracks are downloaded
+    again (--select), up to DOWNLOADER_TRACK_RETRIES times; finished files
+    stay in place.
 
     Args:
         url: Apple Music URL to download
-        output_dir: Unused for Apple (kept for interface compatibility)
+        output_dir: Task output root; when it holds a generated config.yaml
+            (see prepare_apple_task_dir) the downloader runs there
         options: List of command-line options
         user: User details for progress updates
         progress: Optional ProgressReporter for rich progress updates
         task_id: Optional task id to register subprocess for cancellation
         cancel_event: Optional cancellation event to cooperatively stop
+        on_event: Optional async callback receiving each DownloaderEvent
+        manifest: Optional TrackManifest of the task, updated as tracks finish
 
     Returns:
         dict: {'success': bool, 'error': str if failed}
     """
-    # Build command with options
-    cmd = [Config.DOWNLOADER_PATH]
-    if options:
-        cmd.extend(options)
-    cmd.append(url)
+    options = list(options or [])
+    manifest = manifest if manifest is not None else TrackManifest()
+    # Track selection only exists for collections and must not override the user's own
+    can_select = bool(re.search(r'/(album|playlist)/', url)) and '--select' not in options and '--song' not in options
+
+    # Run inside the task directory when it carries its own config.yaml
+    workdir = None
+    if output_dir and os.path.exists(os.path.join(output_dir, 'config.yaml')):
+        workdir = os.path.abspath(output_dir)
+
+    # Files present when the current track started are complete; anything
+    # newer is what an interrupted attempt left half-written. Files written
+    # while a track that then failed was downloading are not trusted either.
+    settled = {path for path, _ in scan_files(workdir)} if workdir else set()
+    failed_files = set()
+    track_open = False
+    track_ok = False
+
+    async def track_files(event):
+        nonlocal settled, track_open, track_ok
+        if workdir and event.kind == DownloaderEvent.TRACK_FINISHED:
+            track_ok = True
+            # Everything written since the track started belongs to it
+            position = _album_position(event.track, event.total, selection)
+            manifest.files[position] = [
+                (path, size) for path, size in scan_files(workdir)
+                if path not in settled and os.path.basename(path) != 'config.yaml'
+            ]
+            # A finished track's files are complete even if the run stalls before the next one
+            settled |= {path for path, _ in manifest.files[position]}
+        elif workdir and event.kind == DownloaderEvent.TRACK_STARTED:
+            current = {path for path, _ in scan_files(workdir)}
+            if track_open and not track_ok:
+                failed_files.update(current - settled)
+            settled = current
+            track_open, track_ok = True, False
+        if on_event:
+            await on_event(event)
+
+    stall_retries = max(0, Config.DOWNLOADER_STALL_RETRIES)
+    track_retries = max(0, Config.DOWNLOADER_TRACK_RETRIES)
+    stalls = 0
+    track_attempts = 0
+    selection = None
+    while True:
+        if selection:
+            args = options + ['--select', url]
+            LOGGER.info(f"Re-downloading track(s) {','.join(map(str, selection))} of {url}")
+        else:
+            args = options + [url]
+        result = await _run_apple_downloader_once(
+            args, workdir, user, progress, task_id, cancel_event, track_files,
+            manifest=manifest, selection=selection
+        )
+
+        if result.get('stalled'):
+            stalls += 1
+            restart = stalls <= stall_retries
+            try:
+                if task_id:
+                    from bot.helpers.tasks import task_manager
+                    await task_manager.record_stall(task_id, restarted=restart)
+            except Exception:
+                pass
+            if not restart:
+                return {'success': False, 'error': result['error']}
+            delay = Config.DOWNLOADER_STALL_BACKOFF * (2 ** (stalls - 1))
+            LOGGER.error(f"Apple downloader stalled; restarting in {delay}s (restart {stalls}/{stall_retries})")
+            stage = f"Stalled, retrying ({stalls}/{stall_retries})"
+        elif result.get('error') == 'Cancelled':
+            return result
+        else:
+            missing = manifest.missing() if can_select else []
+            if not missing or not manifest.completed or track_attempts >= track_retries:
+                if result['success'] and missing:
+                    LOGGER.error(f"Apple downloader finished without track(s) {','.join(map(str, missing))}")
+                return result
+            track_attempts += 1
+            delay = Config.DOWNLOADER_STALL_BACKOFF * (2 ** (track_attempts - 1))
+            LOGGER.error(f"Apple downloader missed {len(missing)} track(s); retrying them in {delay}s")
+            stage = f"Retrying {len(missing)} track(s)"
+
+        # Resume with just the missing tracks when the earlier run got somewhere
+        missing = manifest.missing() if can_select else []
+        selection = missing if missing and manifest.completed else None
+
+        if workdir:
+            discarded = []
+            for path, _ in scan_files(workdir):
+                if (path not in settled or path in failed_files) and os.path.basename(path) != 'config.yaml':
+                    try:
+                        os.remove(path)
+                        discarded.append(path)
+                    except OSError:
+                        pass
+            failed_files.clear()
+            settled = {path for path, _ in scan_files(workdir)}
+            if discarded and on_event:
+                # Consumers that already saw these paths must forget them
+                try:
+                    await on_event(DownloaderEvent(DownloaderEvent.FILES_DISCARDED, paths=discarded))
+                except Exception as e:
+                    LOGGER.error(f"Downloader event handler failed: {str(e)}")
+        track_open = False
+        try:
+            if progress:
+                await progress.set_stage(stage)
+        except Exception:
+            pass
+        if cancel_event:
+            try:
+                await asyncio.wait_for(cancel_event.wait(), timeout=delay)
+                return {'success': False, 'error': 'Cancelled'}
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(delay)
 
-    LOGGER.info(f"Running Apple downloader: {' '.join(cmd)}")
 
-    # Run the command
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
+def _album_position(track: int, total: int | None, selection: list | None) -> int:
+    """Map a track number of a --select run back to its album position."""
+    # The downloader may number selected tracks 1..len(selection) or keep album positions
+    if selection and total == len(selection) and 1 <= track <= len(selection):
+        return selection[track - 1]
+    return track
+
+
+def _kill_process_tree(process):
+    """SIGKILL the downloader's process group (direct spawns and pooled jobs run in their own session)."""
+    if isinstance(process, WorkerJob):
+        process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except Exception:
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+async def _run_apple_downloader_once(args: list, workdir: str | None, user: dict, progress, task_id: str | None, cancel_event: asyncio.Event | None, on_event, manifest: TrackManifest, selection: list | None = None) -> dict:
+    """
+    One downloader run; the result carries 'stalled' when the watchdog fired.
+
+    With a selection the downloader's track prompt is answered on stdin, and
+    finished tracks are mapped back to their album positions in the manifest.
+    """
+    stdin_data = ",".join(map(str, selection)) if selection else None
+    # Prefer a persistent pooled worker; fall back to spawning the script
+    process = None
+    if downloader_pool.enabled:
+        try:
+            process = await downloader_pool.submit(args, cwd=workdir, cancel_event=cancel_event, stdin=stdin_data)
+            if process is None:
+                return {'success': False, 'error': 'Cancelled'}
+            LOGGER.info(f"Running Apple downloader on pooled worker: {' '.join(args)}")
+        except Exception as e:
+            LOGGER.error(f"Downloader pool unavailable, spawning directly: {str(e)}")
+            process = None
+
+    if process is None:
+        cmd = [Config.DOWNLOADER_PATH] + args
+        LOGGER.info(f"Running Apple downloader: {' '.join(cmd)}")
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if stdin_data else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=dict(os.environ, AM_WORK_DIR=workdir) if workdir else None,
+            # Own process group so a stalled run can be killed as a whole
+            start_new_session=True
+        )
+        if stdin_data:
+            process.stdin.write((stdin_data + "\n").encode())
+            await process.stdin.drain()
+            process.stdin.close()
 
     # Register subprocess for external cancellation
     try:
@@ -519,75 +710,117 @@ async def run_apple_downloader(url: str, output_dir: str, options: list = None,
     except Exception:
         pass
 
-    # Read output in chunks to avoid buffer overrun
-    stdout_chunks = []
+    parser = DownloaderOutputParser()
     stage_set = False
-    while True:
-        # Early cancel check
-        if cancel_event and cancel_event.is_set():
-            try:
-                process.terminate()
-            except Exception:
-                pass
-            try:
-                await asyncio.wait_for(process.wait(), timeout=3)
-            except Exception:
+    loop = asyncio.get_running_loop()
+    last_activity = loop.time()
+    stall_timeout = Config.DOWNLOADER_STALL_TIMEOUT
+
+    async def handle(events):
+        nonlocal stage_set
+        for event in events:
+            if event.kind == DownloaderEvent.TOTAL and not selection:
+                manifest.total = event.total
+            elif event.kind == DownloaderEvent.TRACK_FINISHED:
+                manifest.completed.add(_album_position(event.track, event.total, selection))
+            if on_event:
                 try:
-                    process.kill()
-                except Exception:
-                    pass
-            return {'success': False, 'error': 'Cancelled'}
-        chunk = await process.stdout.read(4096)  # Read 4KB chunks
-        if not chunk:
-            break
-        stdout_chunks.append(chunk)
-
-        # Process chunk for progress updates
-        chunk_str = chunk.decode(errors='ignore')
-        if progress:
-            # Look for X/Y total pattern
-            try:
-                xy = re.search(r"(\d+)\s*/\s*(\d+)", chunk_str)
-                if xy:
-                    total = int(xy.group(2))
-                    await progress.set_total_tracks(total)
-            except Exception:
-                pass
-
-            # Look for percent
-            pct_match = re.search(r'(\d+)%', chunk_str)
-            if pct_match:
+                    await on_event(event)
+                except Exception as e:
+                    LOGGER.error(f"Downloader event handler failed: {str(e)}")
+            if event.kind == DownloaderEvent.LOG:
+                LOGGER.debug(f"Apple Downloader: {event.text}")
+            elif progress:
                 try:
-                    pct = int(pct_match.group(1))
-                    if not stage_set:
-                        await progress.set_stage("Downloading")
-                        stage_set = True
-                    await progress.update_download(percent=pct)
+                    if event.kind == DownloaderEvent.TOTAL:
+                        if not selection:
+                            await progress.set_total_tracks(event.total)
+                    elif event.kind in (DownloaderEvent.TRACK_STARTED, DownloaderEvent.PERCENT):
+                        if not stage_set:
+                            await progress.set_stage("Downloading")
+                            stage_set = True
+                        if event.kind == DownloaderEvent.PERCENT:
+                            await progress.update_download(percent=event.percent)
+                    elif event.kind == DownloaderEvent.TRACK_FINISHED:
+                        await progress.update_download(tracks_done=len(manifest.completed))
                 except Exception:
                     pass
-        elif user and 'bot_msg' in user:
-            progress_match = re.search(r'(\d+)%', chunk_str)
-            if progress_match:
+            elif event.kind == DownloaderEvent.PERCENT and user and 'bot_msg' in user:
                 try:
-                    pct = int(progress_match.group(1))
                     await edit_message(
                         user['bot_msg'],
-                        f"Apple Music Download: {pct}%"
+                        f"Apple Music Download: {event.percent}%"
                     )
                 except Exception:
                     pass
 
-    # Combine all chunks
-    stdout_output = b''.join(stdout_chunks).decode(errors='ignore')
-    stdout_lines = stdout_output.splitlines()
+    async def drain(stream, name):
+        nonlocal last_activity
+        # Read in chunks to avoid buffer overrun; the parser reassembles lines
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            last_activity = loop.time()
+            await handle(parser.feed(chunk, name))
+
+    async def watchdog():
+        # Any output (progress frames included) counts as activity
+        while loop.time() - last_activity < stall_timeout:
+            await asyncio.sleep(min(5, stall_timeout))
+
+    drains = asyncio.gather(drain(process.stdout, 'stdout'), drain(process.stderr, 'stderr'))
+    waiters = {drains}
+    stall_waiter = asyncio.ensure_future(watchdog()) if stall_timeout > 0 else None
+    if stall_waiter:
+        waiters.add(stall_waiter)
+    if cancel_event:
+        waiters.add(asyncio.ensure_future(cancel_event.wait()))
+    done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in waiters - {drains}:
+        waiter.cancel()
+
+    if stall_waiter in done and not drains.done():
+        LOGGER.error(f"Apple downloader produced no output for {stall_timeout}s; killing it")
+        _kill_process_tree(process)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except Exception:
+            pass
+        drains.cancel()
+        try:
+            if task_id:
+                from bot.helpers.tasks import task_manager
+                await task_manager.clear_subprocess(task_id)
+        except Exception:
+            pass
+        return {'success': False, 'stalled': True, 'error': f"Downloader stalled (no output for {stall_timeout}s)"}
 
-    # Log all output lines
-    for line in stdout_lines:
-        LOGGER.debug(f"Apple Downloader: {line}")
+    if not drains.done():
+        # Cancelled while the downloader was still running
+        try:
+            process.terminate()
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), timeout=3)
+        except Exception:
+            try:
+                process.kill()
+            except Exception:
+                pass
+        drains.cancel()
+        try:
+            if task_id:
+                from bot.helpers.tasks import task_manager
+                await task_manager.clear_subprocess(task_id)
+        except Exception:
+            pass
+        return {'success': False, 'error': 'Cancelled'}
 
     # Wait for process to finish
-    stderr = await process.stderr.read()
-    stderr = stderr.decode().strip()
+    await process.wait()
+    await handle(parser.close(success=process.returncode == 0))
 
     # Clear subprocess registration
     try:
@@ -606,13 +839,70 @@ async def run_apple_downloader(url: str, output_dir: str, options: list = None,
 
     # Check return code
     if process.returncode != 0:
-        error = stderr or "\n".join(stdout_lines)
+        error = parser.error_text() or f"Downloader exited with code {process.returncode}"
         LOGGER.error(f"Apple downloader failed: {error}")
         return {'success': False, 'error': error}
 
     return {'success': True}
 
 
+_metadata_pool = None
+# Copy size when writing an assembled zip
+ZIP_WRITE_CHUNK = 1024 * 1024
+
+
+def metadata_workers() -> int:
+    """Worker count of the metadata pool"""
+    return Config.METADATA_WORKERS or min(8, os.cpu_count() or 1)
+
+
+def _get_metadata_pool():
+    """Shared pool for blocking tag parsing (processes unless METADATA_POOL=thread)"""
+    global _metadata_pool
+    if _metadata_pool is None:
+        workers = metadata_workers()
+        if Config.METADATA_POOL.lower() == 'process':
+            # Spawned workers only import the light metadata_reader module
+            _metadata_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            _metadata_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='metadata')
+    return _metadata_pool
+
+
+async def run_metadata(func, *args):
+    """Run a function of a light module (metadata_reader, video_probe, zip_deflate...) in the pool, off the event loop"""
+    global _metadata_pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_metadata_pool(), func, *args)
+    except BrokenProcessPool as e:
+        LOGGER.error(f"Metadata process pool failed ({str(e)}); using threads")
+        _metadata_pool = ThreadPoolExecutor(max_workers=metadata_workers(), thread_name_prefix='metadata')
+        return await loop.run_in_executor(_metadata_pool, func, *args)
+
+
+def _extract_cover_enabled() -> bool:
+    return bool(getattr(bot_set, 'extract_embedded_cover', True))
+
+
+def cover_store_dir(file_path: str) -> Optional[str]:
+    """Shared cover folder of the task that owns file_path (None outside task roots)"""
+    watcher = find_watcher(file_path)
+    return os.path.join(watcher.root, COVER_STORE) if watcher else None
+
+
+async def _cached_metadata(func, file_path: str) -> dict:
+    """Metadata from the file identity cache, parsing in the pool on a miss"""
+    cover = _extract_cover_enabled()
+    cover_dir = cover_store_dir(file_path)
+    key = metadata_cache.key(func.__name__, file_path, cover)
+    metadata = metadata_cache.get(key, file_path, cover_dir)
+    if metadata is None:
+        metadata = await run_metadata(func, file_path, cover, cover_dir)
+        metadata_cache.put(key, file_path, metadata)
+    return metadata
+
+
 async def extract_audio_metadata(file_path: str) -> dict:
     """
     Extract metadata from audio files
@@ -621,29 +911,7 @@ async def extract_audio_metadata(file_path: str) -> dict:
     Returns:
         Metadata dictionary
     """
-    try:
-        if file_path.endswith('.m4a'):
-            audio = MP4(file_path)
-            return {
-                'title': audio.get('\xa9nam', ['Unknown'])[0],
-                'artist': audio.get('\xa9ART', ['Unknown Artist'])[0],
-                'album': audio.get('\xa9alb', ['Unknown Album'])[0],
-                'duration': int(audio.info.length),
-                'thumbnail': extract_cover_art(audio, file_path) if getattr(bot_set, 'extract_embedded_cover', True) else None
-            }
-        else:
-            # Handle other audio formats like mp3, flac, etc.
-            audio = mutagen.File(file_path)
-            return {
-                'title': audio.get('title', ['Unknown'])[0],
-                'artist': audio.get('artist', ['Unknown Artist'])[0],
-                'album': audio.get('album', ['Unknown Album'])[0],
-                'duration': int(audio.info.length),
-                'thumbnail': (extract_cover_art(audio, file_path) if hasattr(audio, 'pictures') and getattr(bot_set, 'extract_embedded_cover', True) else None)
-            }
-    except Exception as e:
-        LOGGER.error(f"Audio metadata extraction failed: {str(e)}")
-        return default_metadata(file_path)
+    return await _cached_metadata(read_audio_metadata, file_path)
 
 
 async def extract_video_metadata(file_path: str) -> dict:
@@ -654,22 +922,24 @@ async def extract_video_metadata(file_path: str) -> dict:
     Returns:
         Metadata dictionary with video-specific properties
     """
-    try:
-        if file_path.endswith(('.mp4', '.m4v', '.mov')):
-            video = MP4(file_path)
-            return {
-                'title': video.get('\xa9nam', ['Unknown'])[0],
-                'artist': video.get('\xa9ART', ['Unknown Artist'])[0],
-                'duration': int(video.info.length),
-                'thumbnail': extract_cover_art(video, file_path) if getattr(bot_set, 'extract_embedded_cover', True) else None,
-                'width': video.get('width', [1920])[0],
-                'height': video.get('height', [1080])[0]
-            }
-        else:
-            return default_metadata(file_path)
-    except Exception as e:
-        LOGGER.error(f"Video metadata extraction failed: {str(e)}")
-        return default_metadata(file_path)
+    return await _cached_metadata(read_video_metadata, file_path)
+
+
+async def probe_video_file(file_path: str) -> Optional[dict]:
+    """
+    Probe a video's real stream facts (cached by file identity)
+    Args:
+        file_path: Path to video file
+    Returns:
+        probe_video() result, or None if the file could not be probed
+    """
+    key = metadata_cache.key(probe_video.__name__, file_path, False)
+    info = metadata_cache.get(key, file_path)
+    if info is None:
+        info = await run_metadata(probe_video, file_path)
+        if info:
+            metadata_cache.put(key, file_path, info)
+    return info
 
 
 async def extract_apple_metadata(file_path: str) -> dict:
@@ -680,116 +950,164 @@ async def extract_apple_metadata(file_path: str) -> dict:
     Returns:
         Metadata dictionary
     """
-    try:
-        if file_path.endswith('.m4a'):
-            return await extract_audio_metadata(file_path)
-        elif file_path.endswith(('.mp4', '.m4v', '.mov')):
-            return await extract_video_metadata(file_path)
-        else:
-            # Handle other file types with mutagen
-            audio = mutagen.File(file_path)
-            return {
-                'title': audio.get('title', ['Unknown'])[0],
-                'artist': audio.get('artist', ['Unknown Artist'])[0],
-                'album': audio.get('album', ['Unknown Album'])[0],
-                'duration': int(audio.info.length),
-                'thumbnail': (extract_cover_art(audio, file_path) if hasattr(audio, 'pictures') and getattr(bot_set, 'extract_embedded_cover', True) else None)
-            }
-    except Exception as e:
-        LOGGER.error(f"Apple metadata extraction failed: {str(e)}")
-        return default_metadata(file_path)
+    return await _cached_metadata(read_apple_metadata, file_path)
 
 
-def extract_cover_art(media, file_path):
+async def extract_apple_metadata_batch(file_paths: list, extract_cover: bool | None = None) -> list:
     """
-    Extract cover art from audio/video file
+    Extract metadata for many files in parallel
     Args:
-        media: Mutagen file object
-        file_path: Path to media file
+        file_paths: Paths of media files
+        extract_cover: Write cover art (default: the extract_embedded_cover setting)
     Returns:
-        Path to extracted cover art or None
+        Metadata dictionaries in the same order as file_paths
     """
-    try:
-        # Handle MP4 cover art
-        if 'covr' in media:
-            cover_data = media['covr'][0]
-            cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-            with open(cover_path, 'wb') as f:
-                f.write(cover_data)
-            return cover_path
-        
-        # Handle ID3 tags (MP3)
-        elif hasattr(media, 'pictures') and media.pictures:
-            cover_data = media.pictures[0].data
-            cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-            with open(cover_path, 'wb') as f:
-                f.write(cover_data)
-            return cover_path
-        
-        # Handle FLAC/Vorbis comments
-        elif 'metadata_block_picture' in media:
-            for block in media.get('metadata_block_picture', []):
-                try:
-                    data = base64.b64decode(block)
-                    pic = mutagen.flac.Picture(data)
-                    if pic.type == 3:  # Front cover
-                        cover_path = f"{os.path.splitext(file_path)[0]}.jpg"
-                        with open(cover_path, 'wb') as f:
-                            f.write(pic.data)
-                        return cover_path
-                except:
-                    continue
-    except Exception as e:
-        LOGGER.error(f"Failed to extract cover art: {str(e)}")
-    return None
-
-
-def default_metadata(file_path):
-    """Return default metadata when extraction fails"""
-    return {
-        'title': os.path.splitext(os.path.basename(file_path))[0],
-        'artist': 'Unknown Artist',
-        'album': 'Unknown Album',
-        'duration': 0,
-        'thumbnail': None
-    }
+    cover = _extract_cover_enabled() if extract_cover is None else extract_cover and _extract_cover_enabled()
+    cover_dirs = [cover_store_dir(path) for path in file_paths]
+    keys = [metadata_cache.key(read_apple_metadata.__name__, path, cover) for path in file_paths]
+    results = [metadata_cache.get(key, path, folder) for key, path, folder in zip(keys, file_paths, cover_dirs)]
+    missing = [i for i, metadata in enumerate(results) if metadata is None]
+    if not missing:
+        return results
+    workers = metadata_workers()
+    # A few chunks per worker: balanced load without one submission per file
+    size = max(1, min(16, math.ceil(len(missing) / (workers * 4))))
+    chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+    parsed = await asyncio.gather(*(
+        run_metadata(read_apple_metadata_batch, [file_paths[i] for i in chunk], cover, [cover_dirs[i] for i in chunk])
+        for chunk in chunks
+    ))
+    for chunk, chunk_results in zip(chunks, parsed):
+        for i, metadata in zip(chunk, chunk_results):
+            results[i] = metadata
+            metadata_cache.put(keys[i], file_paths[i], metadata)
+    return results
+
+
+def _write_archive(archive: StreamingZip, zip_path: str):
+    with open(zip_path, 'wb') as f:
+        shutil.copyfileobj(archive, f, ZIP_WRITE_CHUNK)
+    archive.close()
+
+
+async def _build_zip(entries: list, directory: str, zip_path: str, policy: CompressionPolicy, progress: Optional[ProgressReporter] = None, cancel_event: asyncio.Event | None = None):
+    """
+    Write a zip whose deflated members are compressed in parallel.
+
+    Members the policy deflates are compressed concurrently in the metadata
+    pool, each into its own raw deflate stream in a scratch folder next to
+    the zip; stored members only need their CRC-32 (usually known from
+    content hashing). The archive is then written in entry order, central
+    directory last. Progress counts prepared members.
+
+    At most one member per pool worker is in flight, and cancel_event is
+    checked before each is submitted and as each finishes. Pool jobs cannot
+    be cancelled once running, so the scratch folder is only removed after
+    the in-flight ones have finished writing to it.
+    Args:
+        entries: (path, size) of the files, in archive order
+        directory: Folder the archive names are relative to
+        zip_path: Zip file to create
+        policy: Decides stored/deflated per member
+    """
+    scratch = f"{zip_path}.parts"
+    os.makedirs(scratch, exist_ok=True)
+    total_files = len(entries)
+    window = metadata_workers()
+    members: List[Optional[ZipMember]] = [None] * total_files
+    pending = set()
+    done_files = 0
 
+    async def _prepare(index: int, file_path: str, arcname: str, file_size: int, level: Optional[int]) -> tuple:
+        if level is None:
+            return index, await zip_member(file_path, arcname, file_size)
+        data_path = os.path.join(scratch, f"{index}.deflate")
+        result = await run_metadata(deflate_file, file_path, data_path, level)
+        if result['compress_size'] >= result['size']:
+            # Did not shrink; store it (the deflate pass already gave the CRC)
+            return index, ZipMember(file_path, arcname, result['size'], result['crc32'], result['mtime'])
+        return index, ZipMember(file_path, arcname, result['size'], result['crc32'], result['mtime'], ZIP_DEFLATED, data_path, result['compress_size'])
+
+    async def _settle():
+        """Wait for the next member to be prepared"""
+        nonlocal pending, done_files
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, member = task.result()
+            members[index] = member
+        if cancel_event and cancel_event.is_set():
+            raise asyncio.CancelledError()
+        done_files += len(done)
+        if progress:
+            await progress.update_zip(done_files, total_files)
 
-async def create_apple_zip(directory: str, user_id: int, metadata: dict, progress: Optional[ProgressReporter] = None, cancel_event: asyncio.Event | None = None) -> str:
+    try:
+        for index, (file_path, file_size) in enumerate(entries):
+            if len(pending) >= window:
+                await _settle()
+            if cancel_event and cancel_event.is_set():
+                raise asyncio.CancelledError()
+            arcname = os.path.relpath(file_path, directory)
+            # Decided here so the policy's log keeps archive order
+            compress_type, level = policy.choose(file_path, arcname, file_size)
+            level = level if compress_type == zipfile.ZIP_DEFLATED else None
+            pending.add(asyncio.ensure_future(_prepare(index, file_path, arcname, file_size, level)))
+        while pending:
+            await _settle()
+        archive = StreamingZip(members, os.path.basename(zip_path))
+        await asyncio.get_running_loop().run_in_executor(None, _write_archive, archive, zip_path)
+    finally:
+        if pending:
+            # Their pool jobs keep running either way; let them finish writing into scratch
+            await asyncio.gather(*pending, return_exceptions=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def apple_zip_name(metadata: dict) -> str:
     """
-    Create zip file with descriptive name for downloads
+    Descriptive zip name (without .zip) for content
     Args:
-        directory: Path to the content directory
-        user_id: Telegram user ID
         metadata: Content metadata dictionary
     Returns:
-        Path to the created zip file
+        Name like "[Apple Music] Title (Playlist)"
     """
     # Determine content type and name
     content_type = metadata.get('type', 'album').capitalize()
     content_name = metadata.get('title', 'Unknown')
     provider = metadata.get('provider', 'Apple Music')
-    
+
     # Sanitize the content name for filesystem safety
     safe_name = re.sub(r'[\\/*?:"<>|]', "", content_name)
     safe_name = safe_name.replace(' ', '_')[:100]  # Limit length
-    
+
     # If name is empty after sanitization, use fallback
     if not safe_name.strip():
         safe_name = f"Apple_Music_{int(time.time())}"
         LOGGER.warning(f"Empty content name after sanitization, using fallback: {safe_name}")
-    
+
     # Create descriptive filename based on content type
     if content_type.lower() == 'album':
-        zip_name = f"[{provider}] {safe_name}"
+        return f"[{provider}] {safe_name}"
     elif content_type.lower() == 'playlist':
-        zip_name = f"[{provider}] {safe_name} (Playlist)"
+        return f"[{provider}] {safe_name} (Playlist)"
     elif content_type.lower() == 'artist':
-        zip_name = f"[{provider}] {safe_name} (Artist)"
+        return f"[{provider}] {safe_name} (Artist)"
     elif content_type.lower() == 'video':
-        zip_name = f"[{provider}] {safe_name} (Video)"
-    else:
-        zip_name = f"[{provider}] {safe_name}"
+        return f"[{provider}] {safe_name} (Video)"
+    return f"[{provider}] {safe_name}"
+
+
+async def create_apple_zip(directory: str, user_id: int, metadata: dict, progress: Optional[ProgressReporter] = None, cancel_event: asyncio.Event | None = None) -> str:
+    """
+    Create zip file with descriptive name for downloads
+    Args:
+        directory: Path to the content directory
+        user_id: Telegram user ID
+        metadata: Content metadata dictionary
+    Returns:
+        Path to the created zip file
+    """
+    zip_name = apple_zip_name(metadata)
     
     # Create zip path in the content's directory
     zip_dir = os.path.dirname(directory)
@@ -805,38 +1123,25 @@ async def create_apple_zip(directory: str, user_id: int, metadata: dict, progres
     if progress:
         await progress.set_stage("Zipping")
     
-    # Count total files to zip
-    total_files = 0
-    for root, _, files in os.walk(directory):
-        total_files += len(files)
+    # Files to zip (from the task's live manifest when watched)
+    entries = scan_files(directory)
+    total_files = len(entries)
     if progress and total_files:
         await progress.update_zip(0, total_files)
     
     # Create the zip file
-    done_files = 0
-    cancelled = False
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if cancel_event and cancel_event.is_set():
-                    cancelled = True
-                    break
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, directory)
-                zipf.write(file_path, arcname)
-                done_files += 1
-                if progress:
-                    await progress.update_zip(done_files, total_files)
-            if cancelled:
-                break
-    if cancelled:
+    policy = CompressionPolicy()
+    try:
+        await _build_zip(entries, directory, zip_path, policy, progress, cancel_event)
+    except asyncio.CancelledError:
         try:
             if os.path.exists(zip_path):
                 os.remove(zip_path)
         except Exception:
             pass
-        raise asyncio.CancelledError()
+        raise
     
+    policy.report(zip_path)
     LOGGER.info(f"Created descriptive zip: {zip_path}")
     return zip_path
 
@@ -873,19 +1178,73 @@ def _read_apple_config_paths(config_path: str | None = None) -> dict:
         return {}
 
 
-def list_apple_output_files(extensions: tuple[str, ...] | None = None) -> list[str]:
-    """List files from global Apple Music output directories defined in config.yaml."""
+APPLE_SAVE_FOLDER_KEYS = {
+    'alac': 'alac-save-folder',
+    'atmos': 'atmos-save-folder',
+    'aac': 'aac-save-folder',
+}
+
+
+def prepare_apple_task_dir(task_dir: str, base_config: str | None = None) -> dict:
+    """Give a task its own output root.
+
+    Writes task_dir/config.yaml as a copy of the downloader config with the
+    alac/atmos/aac save folders pointed inside task_dir, so concurrent tasks
+    never share output folders. Returns the folder map (same shape as
+    _read_apple_config_paths) or {} if the base config is missing.
+    """
+    cfg_path = base_config or Config.APPLE_CONFIG_YAML_PATH
+    if not os.path.exists(cfg_path):
+        LOGGER.error(f"Apple config not found at {cfg_path}; using shared output folders")
+        return {}
+    try:
+        # Absolute: the downloader resolves these from inside task_dir
+        task_dir = os.path.abspath(task_dir)
+        paths = {key: os.path.join(task_dir, key) for key in APPLE_SAVE_FOLDER_KEYS}
+        with open(cfg_path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.readlines()
+        pending = dict(APPLE_SAVE_FOLDER_KEYS)
+        out = []
+        for line in lines:
+            stripped = line.strip().lower()
+            for key, yaml_key in list(pending.items()):
+                if stripped.startswith(f"{yaml_key}:"):
+                    line = f"{yaml_key}: {paths[key]}\n"
+                    del pending[key]
+                    break
+            out.append(line)
+        if out and not out[-1].endswith('\n'):
+            out[-1] += '\n'
+        for key, yaml_key in pending.items():
+            out.append(f"{yaml_key}: {paths[key]}\n")
+        for folder in paths.values():
+            os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(task_dir, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.writelines(out)
+        return paths
+    except Exception as e:
+        LOGGER.error(f"Failed to prepare Apple task directory: {str(e)}")
+        return {}
+
+
+def list_apple_output_files(extensions: tuple[str, ...] | None = None, paths: dict | None = None) -> list[str]:
+    """List files from Apple Music output directories.
+
+    Args:
+        extensions: File extensions to include
+        paths: Folder map of one task (from prepare_apple_task_dir); defaults
+            to the global folders defined in config.yaml
+    """
     exts = extensions or ('.m4a', '.flac', '.alac', '.mp4', '.m4v', '.mov')
-    paths = _read_apple_config_paths()
+    paths = paths or _read_apple_config_paths()
     files: list[str] = []
+    seen = set()
     for key in ('alac', 'atmos', 'aac'):
         base = paths.get(key)
-        if not base:
+        if not base or base in seen:
             continue
-        for root, _, filenames in os.walk(base):
-            for file in filenames:
-                if file.lower().endswith(exts):
-                    files.append(os.path.join(root, file))
+        seen.add(base)
+        files.extend(path for path, _ in scan_files(base, exts))
     return files
 
 
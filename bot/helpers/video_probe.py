@@ -0,0 +1,47 @@
+import os
+from typing import Optional
+
+from .mp4atoms import read_mp4_tracks
+
+
+# Blocking like metadata_reader, and just as light, so it can run in the
+# metadata pool's spawned workers.
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+def probe_video(file_path: str) -> Optional[dict]:
+    """
+    Stream facts of a video file from its MP4 track headers
+    Args:
+        file_path: Path to video file
+    Returns:
+        Dictionary with displayed width/height, rotation, duration, video and
+        audio codec, overall bitrate and whether it can be streamed, or None
+        when the file is not an MP4 or has no video track
+    """
+    if not file_path.lower().endswith(VIDEO_EXTENSIONS):
+        return None
+    layout = read_mp4_tracks(file_path)
+    if not layout:
+        return None
+    video = next((t for t in layout['tracks'] if t['handler'] == b'vide'), None)
+    if not video or not video['width'] or not video['height']:
+        return None
+    audio = next((t for t in layout['tracks'] if t['handler'] == b'soun'), None)
+    duration = layout['duration'] or video['duration']
+    width, height = video['width'], video['height']
+    if video['rotation'] in (90, 270):
+        # Displayed dimensions of a rotated stream
+        width, height = height, width
+    size = sum(t['bytes'] for t in layout['tracks']) or os.path.getsize(file_path)
+    return {
+        'width': width,
+        'height': height,
+        'rotation': video['rotation'],
+        'duration': int(duration),
+        'codec': video['codec'],
+        'audio_codec': audio['codec'] if audio else None,
+        'bitrate': int(size * 8 / duration) if duration else 0,
+        'supports_streaming': layout['faststart']
+    }
@@ -0,0 +1,38 @@
+import os
+import zlib
+
+
+# Read size per compress call; zlib releases the GIL on blocks this large
+CHUNK_SIZE = 1024 * 1024
+
+
+def deflate_file(path: str, dest: str, level: int) -> dict:
+    """
+    Compress a file into a raw deflate stream, as stored in a zip member.
+
+    Runs in the metadata pool (this module only needs the standard library,
+    so spawned workers import it cheaply). One read computes the CRC-32 too.
+    Args:
+        path: File to compress
+        dest: Where to write the deflate stream
+        level: zlib level, 1-9
+    Returns:
+        {'crc32', 'size', 'compress_size', 'mtime'}
+    """
+    st = os.stat(path)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc = size = written = 0
+    with open(path, 'rb') as src, open(dest, 'wb') as out:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data = compressor.compress(chunk)
+            out.write(data)
+            written += len(data)
+        data = compressor.flush()
+        out.write(data)
+        written += len(data)
+    return {'crc32': crc & 0xFFFFFFFF, 'size': size, 'compress_size': written, 'mtime': st.st_mtime}
@@ -0,0 +1,89 @@
+import os
+from typing import List, Tuple
+
+from bot.logger import LOGGER
+
+
+class ZipPlan:
+    """
+    Which files go into which zip part, decided before anything is written.
+
+    parts are in upload order and each lists its files in archive order.
+    Files that cannot fit a part on their own are left out of every part
+    and listed in oversized instead; the client would reject them, so the
+    caller tells the user they were skipped.
+    """
+
+    def __init__(self, parts: List[List[Tuple[str, int]]], oversized: List[Tuple[str, int]], limit: float):
+        self.parts = parts
+        self.oversized = oversized
+        self.limit = limit
+
+    def summary(self) -> str:
+        line = f"{len(self.parts)} part(s) of at most {self.limit / 1024 ** 3:.2f} GB"
+        if self.oversized:
+            line += f", {len(self.oversized)} file(s) over the limit"
+        return line
+
+    def report(self, name: str):
+        LOGGER.info(f"Zip plan for {name}: {self.summary()}")
+        for path, size in self.oversized:
+            LOGGER.error(f"Zip plan for {name}: {os.path.basename(path)} ({size} bytes) exceeds the part limit; skipped")
+
+
+def plan_zip_parts(entries: List[Tuple[str, int]], base: str, limit: float, member_overhead: int = 0, part_overhead: int = 0) -> ZipPlan:
+    """
+    Bin-pack files into as few zip parts as fit in limit
+    Args:
+        entries: (path, size) of the files, in archive order
+        base: Folder the archive names are relative to
+        limit: Largest part size for the uploading client
+        member_overhead: Header bytes a member adds besides its name and data
+        part_overhead: Bytes every part adds (end records)
+    Returns:
+        ZipPlan
+
+    Files of one folder (an album, a disc) are packed as a unit so they end
+    up in the same part; a folder too large for one part is packed file by
+    file. Units are placed first-fit in order of decreasing size, which
+    never needs more than 11/9 of the optimal number of parts (plus one),
+    where filling parts in walk order can waste most of each part.
+    """
+    capacity = limit - part_overhead
+    index = {path: position for position, (path, _) in enumerate(entries)}
+
+    def cost(path: str, size: int) -> int:
+        name = os.path.relpath(path, base) if base else path
+        return size + member_overhead + 2 * len(name.encode('utf-8'))
+
+    folders = {}
+    oversized = []
+    for path, size in entries:
+        if cost(path, size) > capacity:
+            oversized.append((path, size))
+            continue
+        folders.setdefault(os.path.dirname(path), []).append((path, size))
+
+    units = []
+    for files in folders.values():
+        total = sum(cost(path, size) for path, size in files)
+        if total <= capacity:
+            units.append((total, files))
+        else:
+            units.extend((cost(path, size), [(path, size)]) for path, size in files)
+    # Largest first; ties keep archive order
+    units.sort(key=lambda unit: (-unit[0], index[unit[1][0][0]]))
+
+    bins: List[List] = []
+    for total, files in units:
+        for part in bins:
+            if part[0] + total <= capacity:
+                part[0] += total
+                part[1].extend(files)
+                break
+        else:
+            bins.append([total, list(files)])
+
+    parts = [sorted(files, key=lambda entry: index[entry[0]]) for _, files in bins]
+    parts.sort(key=lambda files: index[files[0][0]])
+    return ZipPlan(parts, oversized, limit)
@@ -0,0 +1,104 @@
+import os
+import zlib
+import zipfile
+from typing import List, Optional, Tuple
+
+from config import Config
+from bot.logger import LOGGER
+
+
+# Already compressed payloads: deflating them costs a core for a 0-1% win
+STORE_EXTENSIONS = (
+    '.m4a', '.mp4', '.m4v', '.mov', '.flac', '.alac', '.mp3', '.aac', '.ogg', '.opus', '.ec3', '.ac3',
+    '.jpg', '.jpeg', '.png', '.webp', '.gif', '.zip', '.gz', '.7z', '.rar'
+)
+# Text sidecars that shrink well
+DEFLATE_EXTENSIONS = ('.lrc', '.ttml', '.txt', '.json', '.yaml', '.yml', '.cue', '.log', '.nfo', '.xml', '.m3u', '.m3u8')
+
+MODES = ('auto', 'store', 'deflate')
+LEVELS = (1, 6, 9)
+# Unknown files: compress a few slices with the fastest level and store if it saves less than this
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_MIN_SAVING = 0.03
+# Not worth sampling; deflate is instant at this size
+SMALL_FILE = 16 * 1024
+
+
+def compression_settings() -> Tuple[str, int]:
+    """(mode, deflate level) from /settings, falling back to the env defaults."""
+    from bot.settings import bot_set
+    mode = str(getattr(bot_set, 'zip_compression', Config.ZIP_COMPRESSION)).lower()
+    level = int(getattr(bot_set, 'zip_level', Config.ZIP_DEFLATE_LEVEL))
+    return (mode if mode in MODES else 'auto'), min(9, max(1, level))
+
+
+def _sample_saving(path: str, size: int) -> float:
+    """Fraction saved by deflating slices from the start, middle and end of a file."""
+    offsets = sorted({0, max(0, size // 2 - SAMPLE_SIZE // 2), max(0, size - SAMPLE_SIZE)})
+    raw = packed = 0
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            data = f.read(SAMPLE_SIZE)
+            raw += len(data)
+            packed += len(zlib.compress(data, 1))
+    return max(0.0, 1 - packed / raw) if raw else 0.0
+
+
+class CompressionPolicy:
+    """
+    Picks ZIP_STORED or ZIP_DEFLATED (and the level) for each archive member.
+
+    In auto mode known media and image extensions are stored, known text
+    sidecars are deflated, and anything else is decided by test-compressing
+    a few slices of it. Every decision is kept so the archive's makeup can
+    be reported once it is written.
+    """
+
+    def __init__(self, mode: Optional[str] = None, level: Optional[int] = None):
+        default_mode, default_level = compression_settings()
+        self.mode = mode or default_mode
+        self.level = level or default_level
+        self.decisions: List[Tuple[str, str, str]] = []
+
+    def choose(self, path: str, arcname: str | None = None, size: int | None = None) -> Tuple[int, Optional[int]]:
+        """(compress_type, compresslevel) for ZipFile.write"""
+        if self.mode == 'store':
+            stored, reason = True, 'setting'
+        elif self.mode == 'deflate':
+            stored, reason = False, 'setting'
+        else:
+            stored, reason = self._auto(path, size)
+        self.decisions.append((arcname or os.path.basename(path), 'stored' if stored else f'deflate-{self.level}', reason))
+        if stored:
+            return zipfile.ZIP_STORED, None
+        return zipfile.ZIP_DEFLATED, self.level
+
+    def _auto(self, path: str, size: int | None) -> Tuple[bool, str]:
+        lower = path.lower()
+        if lower.endswith(STORE_EXTENSIONS):
+            return True, 'extension'
+        if lower.endswith(DEFLATE_EXTENSIONS):
+            return False, 'extension'
+        try:
+            size = os.path.getsize(path) if size is None else size
+            if size <= SMALL_FILE:
+                return False, 'small'
+            saving = _sample_saving(path, size)
+        except OSError:
+            return False, 'unreadable'
+        return saving < SAMPLE_MIN_SAVING, f'sampled {saving:.0%}'
+
+    def write(self, zipf: zipfile.ZipFile, path: str, arcname: str, size: int | None = None):
+        compress_type, level = self.choose(path, arcname, size)
+        zipf.write(path, arcname, compress_type=compress_type, compresslevel=level)
+
+    def summary(self) -> str:
+        stored = sum(1 for _, choice, _ in self.decisions if choice == 'stored')
+        deflated = len(self.decisions) - stored
+        return f"{stored} stored, {deflated} deflated (level {self.level}, mode {self.mode})"
+
+    def report(self, zip_path: str):
+        for arcname, choice, reason in self.decisions:
+            LOGGER.debug(f"Zip {os.path.basename(zip_path)}: {arcname} -> {choice} ({reason})")
+        LOGGER.info(f"Zip {os.path.basename(zip_path)}: {self.summary()}")
@@ -0,0 +1,251 @@
+import io
+import os
+import time
+import zlib
+import struct
+import asyncio
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from config import Config
+from bot.logger import LOGGER
+from .content_hash import file_digest, hash_executor, hash_file
+from .zip_policy import compression_settings
+from .zip_plan import plan_zip_parts
+
+
+# Header fields at or above this need zip64 records
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# What such a field holds instead, pointing readers to the zip64 record
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+# UTF-8 file names
+FLAG_UTF8 = 0x0800
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_LOCAL = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END = struct.Struct('<IHHHHIIH')
+_END64 = struct.Struct('<IQHHIIQQQQ')
+_LOCATOR64 = struct.Struct('<IIQI')
+
+# Worst-case bytes a member adds besides its data (zip64 extras included)
+MEMBER_OVERHEAD = _LOCAL.size + 20 + _CENTRAL.size + 28
+ARCHIVE_OVERHEAD = _END.size + _END64.size + _LOCATOR64.size
+
+
+def stream_enabled() -> bool:
+    """Whether zips are streamed; deflated members cannot be laid out in advance."""
+    return Config.ZIP_STREAM.lower() == 'true' and compression_settings()[0] != 'deflate'
+
+
+def rclone_zip_enabled() -> bool:
+    """Whether the zip settings also apply to RCLONE uploads (else the folder is copied)"""
+    return Config.RCLONE_ZIP.lower() == 'true'
+
+
+def _dos_time(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipMember:
+    """
+    One file of a StreamingZip. Stored members are read from path; deflated
+    ones from data_path, which holds their raw deflate stream.
+    """
+
+    def __init__(self, path: str, arcname: str, size: int, crc32: int, mtime: float,
+                 method: int = ZIP_STORED, data_path: str | None = None, compress_size: int | None = None):
+        self.path = path
+        self.arcname = arcname.replace(os.sep, '/')
+        self.size = size
+        self.crc32 = crc32
+        self.mtime = mtime
+        self.method = method
+        self.data_path = data_path or path
+        self.compress_size = size if compress_size is None else compress_size
+
+
+class StreamingZip(io.RawIOBase):
+    """
+    A zip archive of files on disk, served as a read-only seekable file.
+
+    Every byte is known up front (sizes from the file list, CRC-32s from
+    the content hashes), so nothing is written to disk: Pyrogram can seek
+    to the end for the size and read parts from anywhere, and rclone rcat
+    can read it as a pipe. Sequential reads re-check each stored member's
+    CRC-32 and fail the read if a file changed since the layout was made.
+    Deflated members must be compressed beforehand (see zip_deflate).
+    """
+
+    def __init__(self, members: List[ZipMember], name: str):
+        super().__init__()
+        self.name = name
+        self.members = members
+        self._segments: List[Tuple[int, int, object]] = []
+        self._starts: List[int] = []
+        self._pos = 0
+        self._file = None
+        self._file_index = None
+        self._crc = None
+        self._layout()
+
+    # Layout
+
+    def _add(self, payload):
+        start = self._segments[-1][1] if self._segments else 0
+        length = len(payload) if isinstance(payload, bytes) else self.members[payload].compress_size
+        self._segments.append((start, start + length, payload))
+        self._starts.append(start)
+
+    def _layout(self):
+        central = []
+        for index, member in enumerate(self.members):
+            offset = self._segments[-1][1] if self._segments else 0
+            name = member.arcname.encode('utf-8')
+            mod_time, mod_date = _dos_time(member.mtime)
+            big = max(member.size, member.compress_size) >= ZIP64_LIMIT
+            local_extra = struct.pack('<HHQQ', 1, 16, member.size, member.compress_size) if big else b''
+            size, compress_size = (ZIP64_MARKER, ZIP64_MARKER) if big else (member.size, member.compress_size)
+            version = 45 if big or offset >= ZIP64_LIMIT else 20
+            self._add(_LOCAL.pack(
+                0x04034b50, version, FLAG_UTF8, member.method, mod_time, mod_date,
+                member.crc32, compress_size, size, len(name), len(local_extra)
+            ) + name + local_extra)
+            self._add(index)
+            fields = [member.size, member.compress_size] if big else []
+            if offset >= ZIP64_LIMIT:
+                fields.append(offset)
+            central_extra = struct.pack(f'<HH{len(fields)}Q', 1, 8 * len(fields), *fields) if fields else b''
+            central.append(_CENTRAL.pack(
+                0x02014b50, version | (3 << 8), version, FLAG_UTF8, member.method, mod_time, mod_date,
+                member.crc32, compress_size, size, len(name), len(central_extra), 0, 0, 0,
+                0o100644 << 16, ZIP64_MARKER if offset >= ZIP64_LIMIT else offset
+            ) + name + central_extra)
+        cd_offset = self._segments[-1][1] if self._segments else 0
+        directory = b''.join(central)
+        count = len(self.members)
+        tail = b''
+        if count >= ZIP64_COUNT_LIMIT or len(directory) >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+            end64_offset = cd_offset + len(directory)
+            tail += _END64.pack(0x06064b50, _END64.size - 12, 45, 45, 0, 0, count, count, len(directory), cd_offset)
+            tail += _LOCATOR64.pack(0x07064b50, 0, end64_offset, 1)
+        entries = ZIP64_COUNT_MARKER if count >= ZIP64_COUNT_LIMIT else count
+        tail += _END.pack(
+            0x06054b50, 0, 0, entries, entries,
+            ZIP64_MARKER if len(directory) >= ZIP64_LIMIT else len(directory),
+            ZIP64_MARKER if cd_offset >= ZIP64_LIMIT else cd_offset, 0
+        )
+        self._add(directory + tail)
+
+    @property
+    def size(self) -> int:
+        return self._segments[-1][1] if self._segments else 0
+
+    # File interface
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        done = 0
+        while done < len(view) and self._pos < self.size:
+            start, end, payload = self._segments[bisect_right(self._starts, self._pos) - 1]
+            count = min(len(view) - done, end - self._pos)
+            inner = self._pos - start
+            if isinstance(payload, bytes):
+                view[done:done + count] = payload[inner:inner + count]
+            else:
+                count = self._read_member(payload, inner, view[done:done + count])
+            done += count
+            self._pos += count
+        return done
+
+    def _read_member(self, index: int, offset: int, target) -> int:
+        member = self.members[index]
+        if self._file_index != index:
+            self._close_file()
+            self._file = open(member.data_path, 'rb')
+            self._file_index = index
+        if offset == 0:
+            # Deflated data is checked by the zip reader instead
+            self._crc = (0, 0) if member.method == ZIP_STORED else None
+        self._file.seek(offset)
+        count = self._file.readinto(target)
+        if count != len(target):
+            raise IOError(f"{member.path} shrank while being zipped")
+        if self._crc and self._crc[1] == offset:
+            crc = zlib.crc32(target[:count], self._crc[0])
+            self._crc = (crc, offset + count)
+            if offset + count == member.size and crc != member.crc32:
+                raise IOError(f"{member.path} changed while being zipped (CRC mismatch)")
+        else:
+            # Random access (a resumed part); nothing to verify against
+            self._crc = None
+        return count
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._file_index = None
+
+    def close(self):
+        self._close_file()
+        super().close()
+
+
+async def zip_member(path: str, arcname: str, size: int) -> ZipMember:
+    digest = await file_digest(path)
+    if not digest or digest['size'] != size:
+        # Hashing is off or the file was never seen by a watcher
+        digest = await asyncio.get_running_loop().run_in_executor(hash_executor(), hash_file, path)
+    return ZipMember(path, arcname, digest['size'], digest['crc32'], digest['mtime_ns'] / 1e9)
+
+
+async def stream_zip_parts(entries: List[Tuple[str, int]], base: str, name: str, limit: Optional[float] = None) -> List[StreamingZip]:
+    """
+    Streaming archives of files, split so that each fits in limit bytes
+    Args:
+        entries: (path, size) of the files, in archive order
+        base: Folder the archive names are relative to
+        name: Archive name without .zip; later parts get .partN
+        limit: Largest archive size (None: one archive)
+    Returns:
+        StreamingZip objects, ready to upload
+    """
+    if limit:
+        plan = plan_zip_parts(entries, base, limit, MEMBER_OVERHEAD, ARCHIVE_OVERHEAD)
+        plan.report(name)
+        groups = plan.parts
+    else:
+        groups = [entries] if entries else []
+    parts = []
+    for number, group in enumerate(groups, start=1):
+        members = await asyncio.gather(*(zip_member(path, os.path.relpath(path, base), size) for path, size in group))
+        part_name = f"{name}.zip" if number == 1 else f"{name}.part{number}.zip"
+        parts.append(StreamingZip(list(members), part_name))
+    LOGGER.info(f"Streaming zip {name}: {len(entries)} file(s) in {len(parts)} part(s), {sum(p.size for p in parts)} bytes")
+    return parts
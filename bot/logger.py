@@ -48,6 +48,11 @@ class Logger:
     def info(self, message):
         self.logger.info(message)
 
+    def warning(self, message):
+        caller_frame = inspect.currentframe().f_back
+        caller_filename = os.path.basename(caller_frame.f_globals['__file__'])
+        self.logger.warning(f'{caller_filename} - {message}')
+
     def error(self, message):
         caller_frame = inspect.currentframe().f_back
         caller_filename = os.path.basename(caller_frame.f_globals['__file__'])
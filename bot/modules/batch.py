@@ -0,0 +1,130 @@
+import asyncio
+from pyrogram import Client, filters
+from pyrogram.types import Message
+
+from bot import CMD
+from bot.logger import LOGGER
+
+from ..helpers.batch import (
+    BatchItem, BatchProgress, BatchStatusMessage,
+    extract_links, plan_batch, batch_concurrency
+)
+from ..helpers.tasks import task_manager
+from ..helpers.utils import cleanup
+from ..helpers.message import send_message, antiSpam, check_user, fetch_user_details
+from .download import parse_options, start_link
+
+
+# Larger text files are not link lists
+MAX_LINK_FILE_SIZE = 1024 * 1024
+
+
+async def _read_links(c: Client, msg: Message) -> list:
+    """Links from the command text, a replied-to message, and an attached or replied-to .txt file."""
+    text = msg.text or msg.caption or ""
+    links = extract_links(text)
+    sources = [msg]
+    if msg.reply_to_message:
+        reply = msg.reply_to_message
+        links += extract_links(reply.text or reply.caption or "")
+        sources.append(reply)
+    for source in sources:
+        doc = getattr(source, 'document', None)
+        if not doc or (doc.file_size or 0) > MAX_LINK_FILE_SIZE:
+            continue
+        if not (doc.file_name or '').lower().endswith('.txt') and doc.mime_type != 'text/plain':
+            continue
+        try:
+            data = await c.download_media(source, in_memory=True)
+            links += extract_links(bytes(data.getbuffer()).decode('utf-8', errors='ignore'))
+        except Exception as e:
+            LOGGER.error(f"Batch: could not read link file: {e}")
+    return links
+
+
+@Client.on_message(filters.command(CMD.BATCH))
+async def batch_download(c: Client, msg: Message):
+    if not await check_user(msg=msg):
+        return
+    text = msg.text or msg.caption or ""
+    # Links are not option values
+    options = parse_options([part for part in text.split()[1:] if '://' not in part])
+    links, duplicates, unsupported = plan_batch(await _read_links(c, msg))
+    if not links:
+        return await send_message(msg, "Send /batch with Apple Music links in the message, in a reply, or in a .txt file")
+
+    spam = await antiSpam(msg.from_user.id, msg.chat.id)
+    if spam:
+        return
+    user = await fetch_user_details(msg)
+    notes = [f"📦 {len(links)} link(s) accepted"]
+    if duplicates:
+        notes.append(f"{duplicates} duplicate(s) skipped")
+    if unsupported:
+        notes.append(f"{len(unsupported)} unsupported link(s) skipped")
+
+    from bot.settings import bot_set
+    if getattr(bot_set, 'queue_mode', False):
+        # The whole batch is one queue job
+        async def _job():
+            await run_batch(c, msg, user, links, options)
+        qid, pos = await task_manager.enqueue(user['user_id'], f"Batch of {len(links)} links", options, _job)
+        return await send_message(user, f"{', '.join(notes)}\n✅ Added to queue. ID: <code>{qid}</code>\nPosition: {pos}")
+
+    await send_message(user, ", ".join(notes))
+    await run_batch(c, msg, user, links, options)
+
+
+async def run_batch(c: Client, msg: Message, user: dict, links: list, options: dict):
+    """Download links with bounded concurrency, reporting in one status message."""
+    state = await task_manager.create(user, label="Batch")
+    items = [BatchItem(i, link) for i, link in enumerate(links, start=1)]
+    status_msg = await send_message(user, f"📦 Batch of {len(items)} link(s) starting…")
+    view = BatchProgress(user, status_msg, items, state.task_id)
+    semaphore = asyncio.Semaphore(batch_concurrency())
+
+    async def _run_item(item: BatchItem):
+        async with semaphore:
+            if state.cancel_event.is_set():
+                item.state = BatchItem.CANCELLED
+                return
+            item_state = await task_manager.create(user, label=f"Batch {item.index}/{len(items)}")
+            item.task_id = item_state.task_id
+            item.state = BatchItem.RUNNING
+            u = dict(user)
+            u['link'] = item.link
+            u['task_id'] = item_state.task_id
+            u['cancel_event'] = item_state.cancel_event
+            u['bot_msg'] = BatchStatusMessage(view, item)
+            await view.refresh(force=True)
+            try:
+                await start_link(item.link, u, dict(options))
+                if item_state.cancel_event.is_set():
+                    item.state = BatchItem.CANCELLED
+                else:
+                    item.state = BatchItem.FAILED if item.error else BatchItem.DONE
+            except asyncio.CancelledError:
+                item.state = BatchItem.CANCELLED
+            except Exception as e:
+                LOGGER.error(f"Batch item {item.link} failed: {e}")
+                item.error = str(e)
+                item.state = BatchItem.FAILED
+            await cleanup(u)
+            await task_manager.finish(item_state.task_id, status=item.state)
+            await view.refresh(force=True)
+
+    async def _watch_cancel():
+        # Cancelling the batch cancels its running items; queued ones are skipped
+        await state.cancel_event.wait()
+        for item in items:
+            if item.state == BatchItem.RUNNING and item.task_id:
+                await task_manager.cancel(item.task_id)
+
+    watcher = asyncio.create_task(_watch_cancel())
+    try:
+        await asyncio.gather(*(_run_item(item) for item in items))
+    finally:
+        watcher.cancel()
+        await view.refresh(force=True, final=True)
+        await task_manager.finish(state.task_id, status="cancelled" if state.cancel_event.is_set() else "done")
+        await antiSpam(msg.from_user.id, msg.chat.id, True)
@@ -0,0 +1,46 @@
+from pyrogram import Client, filters
+from pyrogram.types import Message
+
+from bot import CMD
+from bot.helpers.download_cache import download_cache
+from bot.helpers.metadata_cache import metadata_cache
+from bot.helpers.message import send_message, check_user
+
+
+def _gb(size: int) -> str:
+    return f"{size / (1024 ** 3):.2f} GB"
+
+
+@Client.on_message(filters.command(CMD.CACHE))
+async def cache_stats(client:Client, msg:Message):
+    """/cache shows download and metadata cache statistics, /cache clear empties them (admins only)"""
+    if not await check_user(msg.from_user.id, restricted=True):
+        return
+    parts = (msg.text or "").split()
+    if len(parts) > 1 and parts[1].lower() == 'clear':
+        download_cache.clear()
+        metadata_cache.clear()
+        return await send_message(msg, "🧹 Download and metadata caches cleared")
+
+    stats = download_cache.stats()
+    if not stats['enabled']:
+        text = "Download cache is disabled (set DOWNLOAD_CACHE_SIZE_GB)"
+    else:
+        text = (
+            "🗄️ **Download Cache**\n\n"
+            f"Hits: {stats['hits']}\n"
+            f"Misses: {stats['misses']}\n"
+            f"Hit rate: {stats['hit_rate'] * 100:.1f}%\n"
+            f"Entries: {stats['entries']}\n"
+            f"Size: {_gb(stats['size'])} / {_gb(stats['budget'])}"
+        )
+    meta = metadata_cache.stats()
+    if meta['enabled']:
+        text += (
+            "\n\n🏷️ **Metadata Cache**\n\n"
+            f"Hits: {meta['hits']}\n"
+            f"Misses: {meta['misses']}\n"
+            f"Hit rate: {meta['hit_rate'] * 100:.1f}%\n"
+            f"Entries: {meta['entries']}"
+        )
+    await send_message(msg, text)
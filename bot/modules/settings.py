@@ -10,6 +10,7 @@ from ..helpers.buttons.settings import *
 from ..helpers.database.pg_impl import set_db
 from ..helpers.message import send_message, edit_message, check_user, fetch_user_details
 from ..helpers.state import conversation_state
+from ..helpers.zip_policy import MODES as ZIP_MODES, LEVELS as ZIP_LEVELS
 
 
 
@@ -445,6 +446,45 @@ async def toggle_extract_cover_cb(client, cb:CallbackQuery):
         except:
             pass
 
+
+@Client.on_callback_query(filters.regex(pattern=r"^togglePipelineUpload$"))
+async def toggle_pipeline_upload_cb(client, cb:CallbackQuery):
+    if await check_user(cb.from_user.id, restricted=True):
+        try:
+            bot_set.pipeline_upload = not bool(getattr(bot_set, 'pipeline_upload', True))
+            set_db.set_variable('PIPELINE_UPLOAD', bot_set.pipeline_upload)
+        except Exception:
+            pass
+        try:
+            await core_cb(client, cb)
+        except:
+            pass
+
+@Client.on_callback_query(filters.regex(pattern=r"^zipCompression$"))
+async def zip_compression_cb(client, cb:CallbackQuery):
+    if await check_user(cb.from_user.id, restricted=True):
+        modes = list(ZIP_MODES)
+        current = modes.index(bot_set.zip_compression) if bot_set.zip_compression in modes else 0
+        bot_set.zip_compression = modes[(current + 1) % len(modes)]
+        set_db.set_variable('ZIP_COMPRESSION', bot_set.zip_compression)
+        try:
+            await core_cb(client, cb)
+        except:
+            pass
+
+
+@Client.on_callback_query(filters.regex(pattern=r"^zipLevel$"))
+async def zip_level_cb(client, cb:CallbackQuery):
+    if await check_user(cb.from_user.id, restricted=True):
+        levels = list(ZIP_LEVELS)
+        current = levels.index(bot_set.zip_level) if bot_set.zip_level in levels else -1
+        bot_set.zip_level = levels[(current + 1) % len(levels)]
+        set_db.set_variable('ZIP_DEFLATE_LEVEL', bot_set.zip_level)
+        try:
+            await core_cb(client, cb)
+        except:
+            pass
+
 @Client.on_callback_query(filters.regex(pattern=r"^linkOption"))
 async def link_option_cb(client, cb:CallbackQuery):
     if await check_user(cb.from_user.id, restricted=True):
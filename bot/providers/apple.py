@@ -1,20 +1,31 @@
 import os
 import re
+import time
+import uuid
 import asyncio
 import logging
 import shutil
 from bot.helpers.utils import (
     run_apple_downloader,
-    extract_apple_metadata,
     send_message,
     edit_message,
     format_string,
     cleanup,
     list_apple_output_files,
-    cleanup_apple_global
+    cleanup_apple_global,
+    prepare_apple_task_dir
 )
-from bot.helpers.uploader import track_upload, album_upload, music_video_upload, artist_upload, playlist_upload
+from bot.helpers.uploader import track_upload, album_upload, music_video_upload, artist_upload, playlist_upload, TrackUploadPipeline
+from bot.settings import bot_set
 from bot.helpers.database.pg_impl import download_history
+from bot.helpers.output_watcher import watch_output, unwatch_output, scan_files
+from bot.helpers.downloader_output import TrackManifest
+from bot.helpers.run_manifest import build_manifest, write_manifest, load_manifest, manifest_items
+from bot.helpers.lazy_metadata import LazyMetadata, load_metadata, TAG_FIELDS
+from bot.helpers.download_cache import download_cache, request_identity
+from bot.helpers.delivery_cache import DeliveryRecorder, replay_delivery
+from bot.helpers.catalog import resolve_catalog, disk_reservations, throughput
+from bot.helpers.zip_stream import rclone_zip_enabled
 from config import Config
 from bot.logger import LOGGER
 
@@ -31,6 +42,58 @@ class AppleMusicProvider:
             url
         ))
     
+    def use_pipeline(self, url: str, isolated: bool) -> bool:
+        """Whether tracks can be uploaded one by one while the download runs"""
+        if not isolated or bot_set.upload_mode != 'Telegram' or not bot_set.pipeline_upload:
+            return False
+        if '/album/' in url:
+            return not bot_set.album_zip
+        if '/playlist/' in url:
+            return not bot_set.playlist_zip
+        return False
+
+    def delivery_mode(self, url: str) -> str:
+        """
+        How Telegram receives this link: 'zip' archives or individual
+        'tracks' ('tracks:doc' when videos go out as documents)
+        """
+        if (('/album/' in url and bot_set.album_zip) or ('/playlist/' in url and bot_set.playlist_zip)
+                or ('/artist/' in url and bot_set.artist_zip)):
+            return 'zip'
+        if getattr(bot_set, 'video_as_document', False):
+            return 'tracks:doc'
+        return 'tracks'
+
+    async def preflight(self, url: str, user: dict, options: dict = None) -> str | None:
+        """
+        Resolve the catalog and reserve disk space before downloading.
+
+        Returns an error message if the job must be refused. The plan is
+        kept in user['preflight']; the reservation is released by
+        start_apple when the task ends.
+        """
+        if not Config.PREFLIGHT_CHECK.lower() == 'true':
+            return None
+        plan = await resolve_catalog(url, options)
+        if not plan or not plan.tracks:
+            return None
+        # Telegram zips in parts; RCLONE uploads one archive only with RCLONE_ZIP
+        zipping = self.delivery_mode(url) == 'zip' and (
+            bot_set.upload_mode == 'Telegram' or (bot_set.upload_mode == 'RCLONE' and rclone_zip_enabled())
+        )
+        limit = int(Config.MAX_DOWNLOAD_SIZE_GB * 1024 ** 3)
+        if limit and plan.total_bytes > limit:
+            return f"Estimated size {plan.summary()} exceeds the {Config.MAX_DOWNLOAD_SIZE_GB:g} GB limit"
+        task_id = user.get('task_id') or url
+        # The folder process() downloads into, so written bytes stop counting as reserved
+        task_dir = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music", user['task_id']) if user.get('task_id') else None
+        if not await disk_reservations.admit(task_id, plan.reserve_bytes(zipping), user.get('cancel_event'), task_dir):
+            return f"Not enough disk space for {plan.summary()}"
+        user['preflight'] = plan
+        user['preflight_summary'] = plan.summary(zipping and bot_set.upload_mode == 'Telegram')
+        LOGGER.info(f"Pre-flight {url}: {user['preflight_summary']}")
+        return None
+
     def extract_content_id(self, url: str) -> str:
         """Extract Apple Music content ID from URL"""
         match = re.search(r'/(album|song|playlist|music-video|artist)/[^/]+/(\d+)', url)
@@ -38,55 +101,138 @@ class AppleMusicProvider:
     
     async def process(self, url: str, user: dict, options: dict = None) -> dict:
         """Process Apple Music URL with options"""
-        # Create user-specific directory
+        # Create a task-specific output root so concurrent tasks never share files
         user_dir = os.path.join(Config.LOCAL_STORAGE, str(user['user_id']), "Apple Music")
-        os.makedirs(user_dir, exist_ok=True)
-        LOGGER.info(f"Created Apple Music directory: {user_dir}")
+        task_dir = os.path.join(user_dir, user.get('task_id') or uuid.uuid4().hex[:8])
+        os.makedirs(task_dir, exist_ok=True)
+        user['output_root'] = task_dir
+        if user.get('delivery'):
+            # file_id cache entries are keyed by path inside the task root
+            user['delivery'].root = task_dir
+        output_paths = prepare_apple_task_dir(task_dir)
+        user['apple_isolated'] = bool(output_paths)
+        LOGGER.info(f"Created Apple Music task directory: {task_dir}")
         
         # Process options
         cmd_options = self.build_options(options)
 
+        # Shared download cache (needs the per-task layout to restore into)
+        cache_key = download_cache.key(url, self.extract_content_id(url), options) if output_paths else None
+        cache_hit = bool(cache_key) and download_cache.restore(cache_key, task_dir)
+        if cache_hit:
+            LOGGER.info(f"Download cache hit for {url}")
+        cache_writer = download_cache.writer(cache_key, task_dir) if cache_key and not cache_hit else None
+
+        # Track files as the downloader closes them instead of rescanning
+        watch_output(task_dir)
+        try:
+            result = await self._download(url, user, options, task_dir, output_paths, cmd_options, cache_hit, cache_writer)
+        except BaseException:
+            unwatch_output(task_dir)
+            raise
+        if not result['success']:
+            # Nothing will be uploaded; the watcher must not outlive the task
+            unwatch_output(task_dir)
+        return result
+
+    async def _download(self, url: str, user: dict, options: dict, task_dir: str, output_paths, cmd_options: list, cache_hit: bool, cache_writer) -> dict:
+        """Download into the watched task folder and collect the items; process() unwatches on failure"""
+        # Finished tracks survive downloader reruns; retries fetch only the rest
+        user['track_manifest'] = TrackManifest()
+
         # Initialize progress reporter
         from bot.helpers.progress import ProgressReporter
         label = f"Apple Music • ID: {user.get('task_id','?')}"
         reporter = ProgressReporter(user['bot_msg'], label=label)
         user['progress'] = reporter
+        reporter.estimate = user.get('preflight_summary')
         await reporter.set_stage("Preparing")
+
+        # Upload finished tracks while the downloader keeps fetching the rest
+        pipeline = None
+        if not cache_hit and self.use_pipeline(url, bool(output_paths)):
+            pipeline = TrackUploadPipeline(
+                user, output_paths, provider=self.name,
+                on_file=cache_writer.add if cache_writer else None,
+                on_discard=cache_writer.remove if cache_writer else None,
+                manifest=user['track_manifest']
+            )
+            pipeline.start()
         
-        # Download content
-        result = await run_apple_downloader(
-            url,
-            user_dir,
-            cmd_options,
-            user,
-            progress=reporter,
-            task_id=user.get('task_id'),
-            cancel_event=user.get('cancel_event')
-        )
-        if not result['success']:
-            LOGGER.error(f"Apple downloader failed: {result['error']}")
-            return result
+        # Download content (a cache hit already filled the task directory)
+        if not cache_hit:
+            started = time.monotonic()
+            try:
+                result = await run_apple_downloader(
+                    url,
+                    task_dir,
+                    cmd_options,
+                    user,
+                    progress=reporter,
+                    task_id=user.get('task_id'),
+                    cancel_event=user.get('cancel_event'),
+                    on_event=pipeline.on_event if pipeline else None,
+                    manifest=user['track_manifest']
+                )
+            except BaseException:
+                if pipeline:
+                    await pipeline.abort()
+                if cache_writer:
+                    cache_writer.discard()
+                raise
+            if not result['success']:
+                if pipeline:
+                    await pipeline.abort()
+                if cache_writer:
+                    cache_writer.discard()
+                LOGGER.error(f"Apple downloader failed: {result['error']}")
+                return result
+            # Download speed for pre-flight ETAs
+            throughput.record(sum(size for _, size in scan_files(task_dir)), time.monotonic() - started)
         
-        # Find downloaded files from global Apple folders (alac/atmos/aac)
-        files = list_apple_output_files()
+        if pipeline:
+            # Remaining tracks are queued and uploaded before we continue
+            try:
+                items = await pipeline.finish()
+            except BaseException:
+                # Some tracks never reached the user; fail the task like the non-pipelined path
+                if cache_writer:
+                    cache_writer.discard()
+                raise
+            files = [i['filepath'] for i in items]
+        else:
+            # Find downloaded files in this task's folders (global ones if not isolated)
+            files = list_apple_output_files(paths=output_paths or None)
+        # What the downloader wrote, recorded once and kept with the download cache
+        manifest_entries = load_manifest(task_dir) if output_paths else None
+        if manifest_entries is None and output_paths and user.get('preflight') and not cache_hit:
+            manifest_entries = await build_manifest(task_dir, user['track_manifest'], user['preflight'])
+            if manifest_entries:
+                write_manifest(task_dir, manifest_entries)
+        if cache_writer:
+            cache_writer.add_tree()
+            cache_writer.commit(url)
         
         if not files:
-            LOGGER.error("No files found in global Apple output folders")
+            LOGGER.error("No files found in Apple output folders")
             return {'success': False, 'error': "No files downloaded"}
         
-        LOGGER.info(f"Found {len(files)} files in global Apple output folders")
+        LOGGER.info(f"Found {len(files)} files in Apple output folders")
         
         # Extract metadata
-        items = []
-        for file_path in files:
+        if not pipeline:
+            # Read on demand: uploaders load only the fields their upload mode uses
+            if manifest_entries:
+                items = manifest_items(task_dir, files, manifest_entries, self.name)
+            else:
+                items = [LazyMetadata(file_path, self.name) for file_path in files]
             try:
-                metadata = await extract_apple_metadata(file_path)
-                metadata['filepath'] = file_path
-                metadata['provider'] = self.name
-                items.append(metadata)
-                LOGGER.info(f"Processed file: {file_path}")
+                # Title and artist for the history record and collection captions
+                await load_metadata(items[:1], TAG_FIELDS)
             except Exception as e:
-                LOGGER.error(f"Metadata extraction failed for {file_path}: {str(e)}")
+                LOGGER.error(f"Metadata extraction failed: {str(e)}")
+                items = []
+            LOGGER.info(f"Processed {len(items)} file(s)")
         
         # Handle case where no metadata was extracted
         if not items:
@@ -148,7 +294,9 @@ class AppleMusicProvider:
             'folderpath': folder_path,
             'title': album_title,
             'artist': items[0]['artist'],
-            'poster_msg': user['bot_msg']
+            'poster_msg': user['bot_msg'],
+            # Items were already uploaded by the pipeline
+            'uploaded': pipeline is not None
         }
     
     def build_options(self, options: dict) -> list:
@@ -188,6 +336,21 @@ async def start_apple(link: str, user: dict, options: dict = None):
             await edit_message(user['bot_msg'], "❌ Invalid Apple Music URL")
             return
         
+        # Already delivered once? Re-send by Telegram file_id and stop here
+        identity = request_identity(link, provider.extract_content_id(link), options)
+        if identity and bot_set.upload_mode == 'Telegram':
+            recorder = DeliveryRecorder(*identity, provider.delivery_mode(link))
+            if await replay_delivery(user, recorder):
+                await edit_message(user['bot_msg'], "✅ Apple Music download completed! (sent from cache)")
+                return
+            user['delivery'] = recorder
+
+        # Resolve the track list and reserve disk space up front
+        refused = await provider.preflight(link, user, options)
+        if refused:
+            await edit_message(user['bot_msg'], f"❌ {refused}")
+            return
+
         # Process content with options
         result = await provider.process(link, user, options)
         if not result['success']:
@@ -195,7 +358,9 @@ async def start_apple(link: str, user: dict, options: dict = None):
             return
         
         # Process and upload content based on type
-        if result['type'] == 'track':
+        if result.get('uploaded'):
+            pass
+        elif result['type'] == 'track':
             await track_upload(result['items'][0], user)
         elif result['type'] == 'video':
             # Update label to show video emoji
@@ -213,14 +378,18 @@ async def start_apple(link: str, user: dict, options: dict = None):
             await edit_message(user['bot_msg'], f"❌ Unsupported content type: {result['type']}")
             return
         
-        # Final cleanup
+        # Remember what was sent for instant re-delivery
+        if user.get('delivery'):
+            user['delivery'].commit()
+
+        # Final cleanup (the task folder goes in finally)
         try:
             await user['progress'].set_stage("Finalizing")
         except Exception:
             pass
-        await cleanup(user)
-        # Clean only the contents of global Apple output folders
-        cleanup_apple_global()
+        # Shared global folders are only used when the task could not be isolated
+        if not user.get('apple_isolated'):
+            cleanup_apple_global()
         try:
             await user['progress'].set_stage("Done")
         except Exception:
@@ -231,7 +400,6 @@ async def start_apple(link: str, user: dict, options: dict = None):
             await edit_message(user['bot_msg'], "⏹️ Task cancelled. Cleaning up…")
         except Exception:
             pass
-        await cleanup(user)
         raise
     except Exception as e:
         logger.error(f"Apple Music error: {str(e)}", exc_info=True)
@@ -239,4 +407,8 @@ async def start_apple(link: str, user: dict, options: dict = None):
             await user.get('progress', None).set_stage("Done")
         except Exception:
             await edit_message(user['bot_msg'], f"❌ Error: {str(e)}")
-        await cleanup(user)
+    finally:
+        # Every exit, including failed or empty downloads, drops this task's folder
+        if user.get('output_root'):
+            await cleanup(user)
+        disk_reservations.release(user.get('task_id') or link)
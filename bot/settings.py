@@ -106,6 +106,14 @@ class BotSettings:
         self.album_zip = _to_bool(__getvalue__('ALBUM_ZIP'))
         self.playlist_zip = _to_bool(__getvalue__('PLAYLIST_ZIP'))
         self.artist_zip = _to_bool(__getvalue__('ARTIST_ZIP'))
+        # Archive compression: auto (store media, deflate text), store or deflate
+        zip_mode, _ = set_db.get_variable('ZIP_COMPRESSION')
+        self.zip_compression = (zip_mode or Config.ZIP_COMPRESSION).lower()
+        zip_level, _ = set_db.get_variable('ZIP_DEFLATE_LEVEL')
+        try:
+            self.zip_level = int(zip_level or Config.ZIP_DEFLATE_LEVEL)
+        except (TypeError, ValueError):
+            self.zip_level = Config.ZIP_DEFLATE_LEVEL
 
         # New: telegram video upload type
         video_doc, _ = set_db.get_variable('VIDEO_AS_DOCUMENT')
@@ -118,6 +126,14 @@ class BotSettings:
             val = Config.EXTRACT_EMBEDDED_COVER
         self.extract_embedded_cover = _to_bool(val)
 
+        # Upload finished tracks while the downloader is still running
+        try:
+            val, _ = set_db.get_variable('PIPELINE_UPLOAD')
+        except Exception:
+            val = None
+        # A stored False must win over the env default
+        self.pipeline_upload = _to_bool(Config.PIPELINE_UPLOAD if val is None else val)
+
         self.clients = []
         self.download_history = download_history
 
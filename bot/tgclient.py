@@ -43,6 +43,11 @@ class Bot(Client):
 
     async def stop(self, *args):
         await super().stop()
+        try:
+            from .helpers.downloader_pool import downloader_pool
+            await downloader_pool.shutdown()
+        except Exception:
+            pass
         for client in bot_set.clients:
             await client.session.close()
         LOGGER.info('BOT : Exited Successfully!')
@@ -49,17 +49,47 @@ class Config:
 
     # Concurrent Workers
     MAX_WORKERS      = int(getenv("MAX_WORKERS", 5))                       # Number of threads (int)
+    QUEUE_WORKERS    = int(getenv("QUEUE_WORKERS", 1))                     # Queue jobs run in parallel (int)
+    METADATA_WORKERS = int(getenv("METADATA_WORKERS", 0))                  # Tag parsing workers (0 = CPU count, max 8)
+    METADATA_POOL    = getenv("METADATA_POOL", "process")                  # process or thread
+    METADATA_CACHE_SIZE = int(getenv("METADATA_CACHE_SIZE", 5000))        # Parsed files kept in memory (0 = disabled)
+    METADATA_CACHE_FILE = getenv("METADATA_CACHE_FILE", "")                # Persist the cache to this JSON file (optional)
+    CONTENT_HASH     = getenv("CONTENT_HASH", "True")                      # Hash downloaded files as they are written
+    CONTENT_HASH_ALGO = getenv("CONTENT_HASH_ALGO", "auto")                # auto, blake3, xxh3 or blake2b
+    BATCH_CONCURRENCY = int(getenv("BATCH_CONCURRENCY", 0))                # /batch links run in parallel (0 = downloader workers)
 
     # Apple Music Configuration
     DOWNLOADER_PATH   = getenv("DOWNLOADER_PATH", "/usr/src/app/downloader/am_downloader.sh")  
                                                                             # Downloader script path
     INSTALLER_PATH    = getenv("INSTALLER_PATH", "/usr/src/app/downloader/install_am_downloader.sh")  
                                                                             # Installer script path
+    DOWNLOADER_WORKER_PATH = getenv("DOWNLOADER_WORKER_PATH", "/usr/src/app/downloader/am_worker.sh")
+                                                                            # Persistent worker script path
+    DOWNLOADER_WORKERS     = int(getenv("DOWNLOADER_WORKERS", 2))          # Pooled downloader workers (0 = spawn per job)
+    DOWNLOADER_WORKER_MAX_JOBS = int(getenv("DOWNLOADER_WORKER_MAX_JOBS", 50))
+                                                                            # Recycle a worker after this many jobs
+    DOWNLOADER_WORKER_HEALTH_INTERVAL = int(getenv("DOWNLOADER_WORKER_HEALTH_INTERVAL", 60))
+                                                                            # Seconds between idle worker health checks
+    DOWNLOADER_WORKER_START_TIMEOUT = int(getenv("DOWNLOADER_WORKER_START_TIMEOUT", 300))
+                                                                            # Seconds to wait for a worker (and binary build)
+    DOWNLOADER_STALL_TIMEOUT = int(getenv("DOWNLOADER_STALL_TIMEOUT", 300)) # Kill a run silent for this many seconds (0 = off)
+    DOWNLOADER_STALL_RETRIES = int(getenv("DOWNLOADER_STALL_RETRIES", 2))   # Restarts after a stall before failing
+    DOWNLOADER_STALL_BACKOFF = int(getenv("DOWNLOADER_STALL_BACKOFF", 10))  # First restart delay in seconds (doubles)
+    DOWNLOADER_TRACK_RETRIES = int(getenv("DOWNLOADER_TRACK_RETRIES", 2))   # Reruns for missing album/playlist tracks only
     APPLE_DEFAULT_FORMAT = getenv("APPLE_DEFAULT_FORMAT", "alac")          # alac or atmos
     APPLE_ALAC_QUALITY    = int(getenv("APPLE_ALAC_QUALITY", 192000))     # 192000, 256000, 320000
     APPLE_ATMOS_QUALITY   = int(getenv("APPLE_ATMOS_QUALITY", 2768))      # Only 2768 for Atmos
     # Path to Apple Music downloader YAML config
     APPLE_CONFIG_YAML_PATH = getenv("APPLE_CONFIG_YAML_PATH", "/root/amalac/config.yaml")
+    # Shared cache of finished downloads (hardlinked into tasks on a hit)
+    DOWNLOAD_CACHE_DIR    = getenv("DOWNLOAD_CACHE_DIR", os.path.join(LOCAL_STORAGE, ".cache"))
+                                                                            # Cache folder (same filesystem as LOCAL_STORAGE)
+    DOWNLOAD_CACHE_SIZE_GB = float(getenv("DOWNLOAD_CACHE_SIZE_GB", 0))   # Disk budget in GB (0 = disabled)
+    # Pre-flight catalog lookup (size estimate, disk reservation, ETA)
+    PREFLIGHT_CHECK       = getenv("PREFLIGHT_CHECK", "True")              # True or False
+    PREFLIGHT_TIMEOUT     = int(getenv("PREFLIGHT_TIMEOUT", 10))           # Catalog API timeout in seconds
+    MAX_DOWNLOAD_SIZE_GB  = float(getenv("MAX_DOWNLOAD_SIZE_GB", 0))       # Refuse larger jobs (0 = no limit)
+    DISK_FREE_MARGIN_GB   = float(getenv("DISK_FREE_MARGIN_GB", 1))        # Free space kept in reserve
     
     # Optional Settings (via /settings)
     BOT_PUBLIC            = getenv("BOT_PUBLIC", "False")                 # True or False
@@ -72,9 +102,18 @@ class Config:
     ALBUM_ZIP             = getenv("ALBUM_ZIP", "False")                  # True or False
     PLAYLIST_ZIP          = getenv("PLAYLIST_ZIP", "False")               # True or False
     ARTIST_ZIP            = getenv("ARTIST_ZIP", "False")                 # True or False
+    ZIP_COMPRESSION       = getenv("ZIP_COMPRESSION", "auto")             # auto, store or deflate
+    ZIP_DEFLATE_LEVEL     = int(getenv("ZIP_DEFLATE_LEVEL", 6))           # 1 (fast) to 9 (small)
+    ZIP_STREAM            = getenv("ZIP_STREAM", "True")                  # Build zips while uploading, never on disk
+    ZIP_PART_SIZE         = int(getenv("ZIP_PART_SIZE", 0))               # Max zip part in MB (0 = upload limit)
+    RCLONE_ZIP            = getenv("RCLONE_ZIP", "False")                 # Zip toggles also apply to RCLONE uploads
     RCLONE_LINK_OPTIONS   = getenv("RCLONE_LINK_OPTIONS", "Index")        # False, Index, RCLONE, or Both
     # New: control whether to extract embedded cover art from files
     EXTRACT_EMBEDDED_COVER = getenv("EXTRACT_EMBEDDED_COVER", "True")      # True or False
+    # Upload album/playlist tracks while the rest are still downloading
+    PIPELINE_UPLOAD       = getenv("PIPELINE_UPLOAD", "True")             # True or False
+    # Re-send already uploaded content by Telegram file_id
+    FILE_ID_CACHE         = getenv("FILE_ID_CACHE", "True")               # True or False
 
     # Apple Wrapper Scripts
     APPLE_WRAPPER_SETUP_PATH = getenv("APPLE_WRAPPER_SETUP_PATH", "/usr/src/app/downloader/setup_wrapper.sh")
@@ -1,22 +1,72 @@
 #!/bin/bash
-# Apple Music Downloader - Simplified Version
+# Apple Music Downloader - Cached binary version
+#
+# The Go downloader is compiled once per source revision and the cached
+# binary is executed directly, so jobs no longer pay for `go run`.
+#
+# Usage:
+#   am_downloader.sh [downloader options] <url>   Run a download
+#   am_downloader.sh --build-only                 Build (if needed) and exit
+#   am_downloader.sh --print-bin                  Build (if needed) and print binary path
 set -e
 
 # Explicitly add Go to PATH
 export PATH="$PATH:/usr/local/go/bin"
 
-# Change to Go project directory
-cd "$HOME/amalac"
+# Go project directory and binary cache location (overridable)
+SRC_DIR="${AM_SRC_DIR:-$HOME/amalac}"
+BIN_DIR="${AM_BIN_DIR:-$SRC_DIR/.bin}"
 
-# Build the download command
-cmd=(
-    go run main.go
-    "$@"
-)
+# Hash of every Go source and module file; any change triggers a rebuild
+source_hash() {
+    (
+        cd "$SRC_DIR"
+        find . -path ./.bin -prune -o -type f \( -name '*.go' -o -name 'go.mod' -o -name 'go.sum' \) -print0 \
+            | sort -z \
+            | xargs -0 sha256sum
+    ) | sha256sum | cut -c1-16
+}
+
+# Build the binary for the current source hash unless it is already cached
+ensure_binary() {
+    local hash bin tmp
+    hash="$(source_hash)"
+    bin="$BIN_DIR/am_downloader-$hash"
+    if [ ! -x "$bin" ]; then
+        mkdir -p "$BIN_DIR"
+        (
+            # Serialize concurrent builds; the second caller reuses the first build
+            flock 9
+            if [ ! -x "$bin" ]; then
+                echo "Building Apple Music downloader ($hash)..." >&2
+                tmp="$bin.tmp.$$"
+                (cd "$SRC_DIR" && go build -o "$tmp" .)
+                mv -f "$tmp" "$bin"
+                # Drop binaries built from older source revisions
+                find "$BIN_DIR" -maxdepth 1 -type f -name 'am_downloader-*' ! -name "am_downloader-$hash" -delete
+            fi
+        ) 9>"$BIN_DIR/.build.lock"
+    fi
+    echo "$bin"
+}
+
+case "$1" in
+    --build-only)
+        ensure_binary > /dev/null
+        exit 0
+        ;;
+    --print-bin)
+        ensure_binary
+        exit 0
+        ;;
+esac
+
+BIN="$(ensure_binary)"
+
+# The downloader reads config.yaml from its working directory; the bot points
+# AM_WORK_DIR at a per-task directory holding a generated config.yaml
+cd "${AM_WORK_DIR:-$SRC_DIR}"
 
 # Execute download
 echo "Starting Apple Music download..."
-"${cmd[@]}"
-
-# Output success message
-echo "Download completed successfully!"
+exec "$BIN" "$@"
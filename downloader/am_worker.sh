@@ -0,0 +1,84 @@
+#!/bin/bash
+# Apple Music Downloader - Persistent worker
+#
+# Long-lived process fed by the bot's downloader pool. Jobs arrive on stdin,
+# one per line, tab separated. Every control line written by the worker
+# starts with the per-worker marker in $AM_WORKER_MARK so it can never be
+# confused with downloader output, which shares the same pipes.
+#
+#   bot -> worker                       worker -> bot
+#   PING                                <MARK> PONG
+#   JOB <id> <b64 cwd> <b64 stdin>      <MARK> START <id>
+#       <b64 arg>...
+#                                       <MARK> PID <id> <pid>
+#                                       <MARK> END <id> <rc>   (on stdout and stderr)
+#   QUIT                                (exits)
+#
+# The working directory, stdin text and arguments are base64 encoded; a lone
+# "-" stands for an empty value. An empty working directory means the Go
+# project dir, otherwise it must hold the config.yaml the downloader should
+# use. Stdin text (e.g. the answer to the --select prompt) is fed to the
+# downloader; without it stdin is /dev/null.
+set -u
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+SRC_DIR="${AM_SRC_DIR:-$HOME/amalac}"
+MARK="${AM_WORKER_MARK:?AM_WORKER_MARK is required}"
+
+export PATH="$PATH:/usr/local/go/bin"
+
+# Resolve (and build if needed) the cached downloader binary
+resolve_bin() {
+    BIN="$(bash "$SCRIPT_DIR/am_downloader.sh" --print-bin)"
+}
+
+# Decode one protocol field ("-" is the empty string)
+decode() {
+    if [ "$1" = "-" ]; then
+        printf ''
+    else
+        printf '%s' "$1" | base64 -d
+    fi
+}
+
+if ! resolve_bin; then
+    echo "$MARK FAILED"
+    exit 1
+fi
+echo "$MARK READY $$"
+
+while IFS=$'\t' read -r -a fields; do
+    case "${fields[0]:-}" in
+        PING)
+            echo "$MARK PONG"
+            ;;
+        QUIT)
+            exit 0
+            ;;
+        JOB)
+            id="${fields[1]}"
+            cwd="$(decode "${fields[2]:--}")"
+            [ -n "$cwd" ] || cwd="$SRC_DIR"
+            input="$(decode "${fields[3]:--}")"
+            args=()
+            for enc in "${fields[@]:4}"; do
+                args+=("$(decode "$enc")")
+            done
+            # A newer source revision may have replaced the cached binary
+            [ -x "$BIN" ] || resolve_bin
+            echo "$MARK START $id"
+            # Own process group so the bot can signal the whole job tree
+            if [ -n "$input" ]; then
+                ( cd "$cwd" && exec setsid "$BIN" "${args[@]}" <<<"$input" ) &
+            else
+                ( cd "$cwd" && exec setsid "$BIN" "${args[@]}" </dev/null ) &
+            fi
+            pid=$!
+            echo "$MARK PID $id $pid"
+            wait "$pid"
+            rc=$?
+            echo "$MARK END $id $rc"
+            echo "$MARK END $id $rc" >&2
+            ;;
+    esac
+done
@@ -2,6 +2,9 @@
 # Apple Music Downloader Installer (Fixed Version)
 set -e
 
+# Directory holding this installer and am_downloader.sh
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 echo "=== Apple Music Downloader Installation ==="
 echo "This script will install all required dependencies for downloading"
 echo "Apple Music tracks in ALAC and Atmos formats with cloud sync capability"
@@ -161,6 +164,8 @@ cd "$HOME/amalac"
 /usr/local/go/bin/go clean -modcache
 /usr/local/go/bin/go get -u ./...
 /usr/local/go/bin/go mod tidy
+# Compile once into the binary cache used by am_downloader.sh
+bash "$SCRIPT_DIR/am_downloader.sh" --build-only
 echo "Application built successfully!"
 
 # 9. Create default config for downloader